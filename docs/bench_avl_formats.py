@@ -0,0 +1,120 @@
+"""
+Compares the St. John's AVL feed in `f=json` and `f=pbf` encodings:
+bytes transferred per poll and time to get from raw bytes to parsed
+vehicles/positions.
+
+Record fixtures from the live endpoint first, then benchmark them:
+    uv run python docs/bench_avl_formats.py --record fixtures/ [--samples 10]
+    uv run python docs/bench_avl_formats.py fixtures/ [--repeat 200]
+
+Each recorded sample is a pair of files, NNN.json and NNN.pbf, fetched
+back to back so both describe the same fleet state.
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import httpx
+
+from where_the_plow.client import _AVL_OUT_FIELDS, parse_avl_batch
+from where_the_plow.config import settings
+from where_the_plow.pbf import decode_feature_collection
+
+
+def record(directory: Path, samples: int, interval: float):
+    directory.mkdir(parents=True, exist_ok=True)
+    headers = {"Referer": settings.avl_referer}
+    with httpx.Client(headers=headers, timeout=10) as client:
+        for i in range(samples):
+            for fmt in ("json", "pbf"):
+                resp = client.get(
+                    settings.avl_api_url,
+                    params={
+                        "f": fmt,
+                        "outFields": _AVL_OUT_FIELDS,
+                        "outSR": "4326",
+                        "returnGeometry": "true",
+                        "where": "1=1",
+                    },
+                )
+                resp.raise_for_status()
+                (directory / f"{i:03d}.{fmt}").write_bytes(resp.content)
+            print(f"recorded sample {i + 1}/{samples}")
+            if i + 1 < samples:
+                time.sleep(interval)
+
+
+def time_parse(fn, payload: bytes, repeat: int) -> float:
+    """Median milliseconds to parse payload with fn."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(payload)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def parse_json(payload: bytes):
+    return parse_avl_batch(json.loads(payload))
+
+
+def parse_pbf(payload: bytes):
+    return parse_avl_batch(decode_feature_collection(payload))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AVL JSON vs PBF")
+    parser.add_argument("directory", type=Path, help="Fixture directory")
+    parser.add_argument("--record", action="store_true", help="Record fixtures")
+    parser.add_argument("--samples", type=int, default=10, help="Samples to record")
+    parser.add_argument(
+        "--interval", type=float, default=6, help="Seconds between recordings"
+    )
+    parser.add_argument("--repeat", type=int, default=200, help="Parses per fixture")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.directory, args.samples, args.interval)
+        return
+
+    pairs = sorted(args.directory.glob("*.json"))
+    if not pairs:
+        print(f"No fixtures in {args.directory}; record some with --record")
+        return
+
+    print(
+        f"{'sample':<8} {'vehicles':>8} {'json B':>9} {'pbf B':>9} "
+        f"{'json ms':>9} {'pbf ms':>9}"
+    )
+    print("-" * 58)
+    totals = {"json_b": 0, "pbf_b": 0, "json_ms": 0.0, "pbf_ms": 0.0}
+    for json_path in pairs:
+        pbf_path = json_path.with_suffix(".pbf")
+        if not pbf_path.exists():
+            continue
+        json_bytes = json_path.read_bytes()
+        pbf_bytes = pbf_path.read_bytes()
+        vehicles, _ = parse_pbf(pbf_bytes)
+        json_ms = time_parse(parse_json, json_bytes, args.repeat)
+        pbf_ms = time_parse(parse_pbf, pbf_bytes, args.repeat)
+        totals["json_b"] += len(json_bytes)
+        totals["pbf_b"] += len(pbf_bytes)
+        totals["json_ms"] += json_ms
+        totals["pbf_ms"] += pbf_ms
+        print(
+            f"{json_path.stem:<8} {len(vehicles):>8} {len(json_bytes):>9,} "
+            f"{len(pbf_bytes):>9,} {json_ms:>9.3f} {pbf_ms:>9.3f}"
+        )
+
+    print("-" * 58)
+    print(
+        f"PBF is {totals['pbf_b'] / totals['json_b']:.1%} of JSON bytes, "
+        f"parse time {totals['pbf_ms'] / totals['json_ms']:.2f}x JSON"
+    )
+
+
+if __name__ == "__main__":
+    main()
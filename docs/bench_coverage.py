@@ -0,0 +1,232 @@
+"""
+Measures /coverage query time: the coverage_points rollup against the
+previous query, which re-derived gaps, segments and 30 s buckets from raw
+positions on every call.
+
+Synthetic history (--fleet vehicles reporting every 6 s for --hours, each
+going quiet for 5 minutes once an hour) is generated in SQL and rolled up
+by the same backfill Database.init() runs on an existing database.
+
+Usage (from the repo root):
+    uv run python docs/bench_coverage.py [--fleet 200] [--hours 48]
+                                         [--repeat 5]
+
+Output:
+    - History size and rollup size
+    - Per window (1 h, 6 h, 24 h): median ms for the legacy query and for
+      Database.get_coverage_trails, and the number of trails returned
+    - CoverageChunks for --windows overlapping 6 h windows at random
+      offsets: mean ms against the rollup query, starting from a cold cache
+    - LiveCoverage for the last 24 h: the first (full) load, then the
+      median request after each new poll is ingested
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+from where_the_plow.cache import CoverageChunks, LiveCoverage
+from where_the_plow.db import Database
+
+LEGACY_QUERY = """
+    WITH with_gap AS (
+        SELECT
+            p.vehicle_id,
+            p.timestamp,
+            p.longitude,
+            p.latitude,
+            v.description,
+            v.vehicle_type,
+            EPOCH(p.timestamp - LAG(p.timestamp) OVER (
+                PARTITION BY p.vehicle_id ORDER BY p.timestamp
+            )) AS gap_s
+        FROM positions p
+        JOIN vehicles v ON p.vehicle_id = v.vehicle_id
+        WHERE p.timestamp >= $1
+        AND p.timestamp <= $2
+    ),
+    with_segment AS (
+        SELECT *,
+            SUM(CASE WHEN gap_s IS NULL OR gap_s > 120 THEN 1 ELSE 0 END)
+                OVER (PARTITION BY vehicle_id ORDER BY timestamp) AS segment_id
+        FROM with_gap
+    ),
+    bucketed AS (
+        SELECT *,
+            ROW_NUMBER() OVER (
+                PARTITION BY vehicle_id, segment_id,
+                    time_bucket(INTERVAL '30 seconds', timestamp)
+                ORDER BY timestamp
+            ) AS bucket_rn
+        FROM with_segment
+    )
+    SELECT vehicle_id, segment_id, timestamp, longitude, latitude,
+           description, vehicle_type
+    FROM bucketed
+    WHERE bucket_rn = 1
+    ORDER BY vehicle_id, segment_id, timestamp
+"""
+
+
+def legacy_trails(db: Database, since: datetime, until: datetime) -> int:
+    rows = db.conn.execute(LEGACY_QUERY, [since, until]).fetchall()
+    trails = 0
+    for _, group in groupby(rows, key=lambda r: (r[0], r[1])):
+        points = list(group)
+        if len(points) >= 2:
+            # Same per-trail work as get_coverage_trails
+            [[p[3], p[4]] for p in points]
+            [p[2].isoformat() for p in points]
+            trails += 1
+    return trails
+
+
+def seed(path: str, fleet: int, hours: int, end: datetime):
+    db = Database(path)
+    db.init()
+    start = end - timedelta(hours=hours)
+    db.conn.execute(
+        """
+        INSERT INTO vehicles
+        SELECT 'v' || i, i || ' SA PLOW TRUCK', 'SA PLOW TRUCK', $1, $1, 'st_johns'
+        FROM range($2) t(i)
+        """,
+        [start, fleet],
+    )
+    # Reports every 6 s; each vehicle is quiet for 50 reports (5 min) an hour.
+    db.conn.execute(
+        """
+        INSERT INTO positions
+            (vehicle_id, timestamp, collected_at, longitude, latitude, geom,
+             bearing, speed, is_driving, city)
+        SELECT 'v' || v, ts, ts, lon, lat, ST_Point(lon, lat), 0, 10.0, 'maybe',
+               'st_johns'
+        FROM (
+            SELECT v, $1::TIMESTAMPTZ + to_seconds(n * 6) AS ts,
+                   -52.8 + v * 0.0005 + (n % 600) * 0.00002 AS lon,
+                   47.5 + (n % 600) * 0.00001 AS lat, n
+            FROM range($2) a(v), range($3) b(n)
+        )
+        WHERE (n + v * 7) % 600 >= 50
+        ORDER BY ts
+        """,
+        [start, fleet, hours * 600],
+    )
+    db.close()
+    # Reopening runs the same backfill an upgraded database gets.
+    db = Database(path)
+    db.init()
+    return db
+
+
+def time_ms(fn, repeat: int) -> tuple[float, int]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /coverage queries")
+    parser.add_argument("--fleet", type=int, default=200, help="Vehicles")
+    parser.add_argument("--hours", type=int, default=48, help="Hours of history")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query")
+    parser.add_argument(
+        "--windows", type=int, default=20, help="Overlapping windows for chunks"
+    )
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    t0 = time.perf_counter()
+    db = seed(path, args.fleet, args.hours, end)
+    positions = db.conn.execute("SELECT count(*) FROM positions").fetchone()[0]
+    points = db.conn.execute("SELECT count(*) FROM coverage_points").fetchone()[0]
+    print(
+        f"{positions:,} positions -> {points:,} coverage points "
+        f"(seed + backfill {time.perf_counter() - t0:.1f}s)"
+    )
+    print(f"{'window':>7} {'legacy ms':>10} {'rollup ms':>10} {'trails':>7}")
+    print("-" * 37)
+    try:
+        for hours in (1, 6, 24):
+            since = end - timedelta(hours=hours)
+            legacy_ms, legacy_count = time_ms(
+                lambda: legacy_trails(db, since, end), args.repeat
+            )
+            rollup_ms, trails = time_ms(
+                lambda: db.get_coverage_trails(since, end), args.repeat
+            )
+            print(
+                f"{hours:>6}h {legacy_ms:>10.1f} {rollup_ms:>10.1f} "
+                f"{len(trails):>7}"
+                + ("" if len(trails) == legacy_count else f" (legacy {legacy_count})")
+            )
+        rng = random.Random(1)
+        windows = []
+        for _ in range(args.windows):
+            until = end - timedelta(hours=1, minutes=rng.randrange(0, 12 * 60))
+            windows.append((until - timedelta(hours=6), until))
+        chunks = CoverageChunks()
+        query_ms = chunk_ms = 0.0
+        for since, until in windows:
+            t0 = time.perf_counter()
+            db.get_coverage_trails(since, until)
+            t1 = time.perf_counter()
+            chunks.trails(db, since, until)
+            t2 = time.perf_counter()
+            query_ms += (t1 - t0) * 1000
+            chunk_ms += (t2 - t1) * 1000
+        n = args.windows
+        print(
+            f"\n{n} overlapping 6h windows: rollup query {query_ms / n:.1f} ms, "
+            f"chunks {chunk_ms / n:.1f} ms per request "
+            f"({chunks.fetched_hours} hours fetched)"
+        )
+
+        live = LiveCoverage()
+        since = end - timedelta(hours=24)
+        t0 = time.perf_counter()
+        live.trails(db, since, end)
+        print(f"Live 24h: first load {(time.perf_counter() - t0) * 1000:.1f} ms")
+        samples = []
+        for tick in range(1, 21):
+            ts = end + timedelta(seconds=tick * 6)
+            poll = [
+                {
+                    "vehicle_id": f"v{v}",
+                    "timestamp": ts,
+                    "longitude": -52.8 + v * 0.0005,
+                    "latitude": 47.5 + tick * 0.00001,
+                    "bearing": 0,
+                    "speed": 10.0,
+                    "is_driving": "maybe",
+                }
+                for v in range(args.fleet)
+            ]
+            db.insert_positions(poll, ts, "st_johns")
+            t0 = time.perf_counter()
+            trails = live.trails(db, since, ts)
+            samples.append((time.perf_counter() - t0) * 1000)
+        print(
+            f"Live 24h after each poll: median {statistics.median(samples):.1f} ms "
+            f"({len(trails)} trails)"
+        )
+        full_ms, _ = time_ms(lambda: db.get_coverage_trails(since, ts), args.repeat)
+        print(f"Rollup query for the same window: {full_ms:.1f} ms")
+    finally:
+        db.close()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
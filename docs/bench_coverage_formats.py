@@ -0,0 +1,106 @@
+"""
+Compares /coverage response encodings: GeoJSON, encoded polylines and the
+columnar binary layout, on the same synthetic history bench_coverage.py
+generates.  Also times /coverage/tiles vector tiles for the last 24 h.
+
+Usage (from the repo root):
+    uv run python docs/bench_coverage_formats.py [--fleet 200] [--hours 24]
+                                                 [--precision 5] [--repeat 3]
+
+Output, per window (1 h, 6 h, 24 h) and encoding:
+    - Body size, bytes per point and gzip -6 size
+    - Median ms to encode the trails into a response body
+    - Per zoom (10, 12, 14): tiles covering the fleet, their total size and
+      mean ms to encode one tile
+"""
+
+import argparse
+import gzip
+import math
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from bench_coverage import seed
+
+from where_the_plow.coverage_format import encode_binary, encode_polyline
+from where_the_plow.mvt import encode_tile
+from where_the_plow.routes import _coverage_geojson
+
+
+def tile_range(trails: list[dict], z: int) -> list[tuple[int, int]]:
+    """Tiles covering the bounding box of all trails."""
+    lngs = [c[0] for t in trails for c in t["coordinates"]]
+    lats = [c[1] for t in trails for c in t["coordinates"]]
+    n = 2**z
+
+    def tile(lng: float, lat: float) -> tuple[int, int]:
+        s = math.sin(math.radians(lat))
+        y = (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * n
+        return int((lng + 180) / 360 * n), int(y)
+
+    x0, y0 = tile(min(lngs), max(lats))
+    x1, y1 = tile(max(lngs), min(lats))
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /coverage encodings")
+    parser.add_argument("--fleet", type=int, default=200, help="Vehicles")
+    parser.add_argument("--hours", type=int, default=24, help="Hours of history")
+    parser.add_argument("--precision", type=int, default=5, help="Decimal digits")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per encoding")
+    args = parser.parse_args()
+
+    encoders = {
+        "geojson": _coverage_geojson,
+        "polyline": lambda trails: encode_polyline(trails, args.precision),
+        "binary": lambda trails: encode_binary(trails, args.precision),
+    }
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    db = seed(path, args.fleet, args.hours, end)
+    try:
+        print(
+            f"{'window':>7} {'format':>9} {'bytes':>12} {'B/pt':>6} "
+            f"{'gzip':>11} {'encode ms':>10}"
+        )
+        print("-" * 60)
+        for hours in (1, 6, 24):
+            if hours > args.hours:
+                break
+            trails = db.get_coverage_trails(end - timedelta(hours=hours), end)
+            points = sum(len(t["coordinates"]) for t in trails)
+            for name, encode in encoders.items():
+                samples = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    body = encode(trails)
+                    samples.append((time.perf_counter() - t0) * 1000)
+                packed = len(gzip.compress(body, compresslevel=6))
+                print(
+                    f"{hours:>6}h {name:>9} {len(body):>12,} "
+                    f"{len(body) / points:>6.1f} {packed:>11,} "
+                    f"{statistics.median(samples):>10.1f}"
+                )
+
+        trails = db.get_coverage_trails(end - timedelta(hours=24), end)
+        print(f"\n{'zoom':>4} {'tiles':>6} {'bytes':>12} {'ms/tile':>8}")
+        print("-" * 33)
+        for z in (10, 12, 14):
+            tiles = tile_range(trails, z)
+            t0 = time.perf_counter()
+            size = sum(len(encode_tile(trails, z, x, y)) for x, y in tiles)
+            ms = (time.perf_counter() - t0) * 1000 / len(tiles)
+            print(f"{z:>4} {len(tiles):>6} {size:>12,} {ms:>8.1f}")
+    finally:
+        db.close()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Measures poll-to-commit latency of Database.insert_positions as the
+positions table grows.  Synthetic history is bulk-loaded in steps and, at
+each step, a handful of poll-sized batches are ingested and timed.
+
+Usage (from the repo root):
+    uv run python docs/bench_ingest.py [--steps 5] [--step-rows 2000000]
+                                       [--fleet 300] [--polls 20]
+
+Output:
+    - One line per step: table size and p50/p95/max insert latency
+    - With --legacy, the same numbers for the old row-at-a-time INSERT loop
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from where_the_plow.db import Database
+
+BASE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def grow_history(db: Database, start: int, rows: int, fleet: int):
+    """Append `rows` synthetic historical positions using a single SQL statement."""
+    db.conn.execute(
+        """
+        INSERT INTO positions
+            (vehicle_id, timestamp, collected_at, longitude, latitude, geom,
+             bearing, speed, is_driving, city)
+        SELECT
+            'hist-' || (i % $3)::VARCHAR,
+            $4::TIMESTAMPTZ + to_seconds(i // $3 * 6),
+            $4::TIMESTAMPTZ + to_seconds(i // $3 * 6),
+            -52.7 + (i % 1000) * 0.0001,
+            47.5 + (i % 997) * 0.0001,
+            ST_Point(-52.7 + (i % 1000) * 0.0001, 47.5 + (i % 997) * 0.0001),
+            (i % 360)::INTEGER,
+            (i % 60)::DOUBLE,
+            'maybe',
+            'st_johns'
+        FROM range($1, $1 + $2) t(i)
+        """,
+        [start, rows, fleet, BASE],
+    )
+
+
+def make_poll(tick: int, fleet: int) -> list[dict]:
+    ts = datetime.now(timezone.utc) + timedelta(seconds=tick * 6)
+    return [
+        {
+            "vehicle_id": f"live-{v}",
+            "timestamp": ts,
+            "longitude": -52.71 + v * 0.0001,
+            "latitude": 47.56 + tick * 0.0001,
+            "bearing": 90,
+            "speed": 12.5,
+            "is_driving": "maybe",
+        }
+        for v in range(fleet)
+    ]
+
+
+def legacy_insert(db: Database, positions: list[dict], collected_at: datetime):
+    """The previous implementation: count(*), one INSERT per row, count(*)."""
+    cur = db._cursor()
+    before = cur.execute("SELECT count(*) FROM positions").fetchone()[0]
+    for p in positions:
+        cur.execute(
+            """
+            INSERT OR IGNORE INTO positions
+                (vehicle_id, timestamp, collected_at, longitude, latitude, geom, bearing, speed, is_driving, city)
+            VALUES (?, ?, ?, ?, ?, ST_Point(?, ?), ?, ?, ?, ?)
+            """,
+            [
+                p["vehicle_id"],
+                p["timestamp"],
+                collected_at,
+                p["longitude"],
+                p["latitude"],
+                p["longitude"],
+                p["latitude"],
+                p["bearing"],
+                p["speed"],
+                p["is_driving"],
+                "st_johns",
+            ],
+        )
+    after = cur.execute("SELECT count(*) FROM positions").fetchone()[0]
+    return after - before
+
+
+def time_polls(db: Database, first_tick: int, args, legacy: bool) -> list[float]:
+    samples = []
+    for tick in range(first_tick, first_tick + args.polls):
+        poll = make_poll(tick, args.fleet)
+        now = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+        if legacy:
+            legacy_insert(db, poll, now)
+        else:
+            db.insert_positions(poll, now, "st_johns")
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def fmt(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return (
+        f"p50 {statistics.median(ordered):8.2f} ms  "
+        f"p95 {p95:8.2f} ms  max {ordered[-1]:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark position ingest latency")
+    parser.add_argument("--steps", type=int, default=5, help="Growth steps")
+    parser.add_argument(
+        "--step-rows",
+        type=int,
+        default=2_000_000,
+        help="Historical rows added per step (default: 2,000,000)",
+    )
+    parser.add_argument("--fleet", type=int, default=300, help="Vehicles per poll")
+    parser.add_argument("--polls", type=int, default=20, help="Polls timed per step")
+    parser.add_argument(
+        "--legacy", action="store_true", help="Also time the row-at-a-time path"
+    )
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    db = Database(path)
+    db.init()
+
+    print(
+        f"fleet={args.fleet} polls/step={args.polls} "
+        f"rows/step={args.step_rows:,} steps={args.steps}"
+    )
+    print("-" * 78)
+
+    tick = 0
+    try:
+        for step in range(args.steps + 1):
+            if step:
+                grow_history(db, (step - 1) * args.step_rows, args.step_rows, 5000)
+            total = db.conn.execute("SELECT count(*) FROM positions").fetchone()[0]
+
+            print(
+                f"{total:>14,} rows | bulk   | {fmt(time_polls(db, tick, args, False))}"
+            )
+            tick += args.polls
+            if args.legacy:
+                print(f"{'':>14} | legacy | {fmt(time_polls(db, tick, args, True))}")
+                tick += args.polls
+    finally:
+        db.close()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
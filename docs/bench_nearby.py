@@ -0,0 +1,169 @@
+"""
+Compares /vehicles/nearby and /vehicles/nearest lookups: the DuckDB query
+over vehicle_latest against the in-memory VehicleIndex the live snapshot
+maintains.  Also reports how far the old single-factor degree radius
+strayed from the true metric radius at St. John's latitude.
+
+Usage (from the repo root):
+    uv run python docs/bench_nearby.py [--fleet 300] [--queries 500]
+                                       [--radius 2000] [--k 5]
+
+Output:
+    - Index build time (paid once per published snapshot)
+    - Mean and p95 microseconds per query for each backend
+    - Vehicles the legacy ST_DWithin radius would have included wrongly
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from where_the_plow.db import Database
+from where_the_plow.spatial import VehicleIndex, haversine_m
+
+TS = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def seed(db: Database, fleet: int, rng: random.Random):
+    now = datetime.now(timezone.utc)
+    vehicles = []
+    positions = []
+    for v in range(fleet):
+        vehicles.append(
+            {
+                "vehicle_id": f"v{v}",
+                "description": f"{v} SA PLOW TRUCK",
+                "vehicle_type": "SA PLOW TRUCK",
+            }
+        )
+        positions.append(
+            {
+                "vehicle_id": f"v{v}",
+                "timestamp": TS + timedelta(seconds=v),
+                "longitude": -52.85 + rng.random() * 0.25,
+                "latitude": 47.45 + rng.random() * 0.2,
+                "bearing": 0,
+                "speed": 10.0,
+                "is_driving": "maybe",
+            }
+        )
+    db.upsert_vehicles(vehicles, now, "st_johns")
+    db.insert_positions(positions, now, "st_johns")
+
+
+def sql_nearest(db: Database, lat: float, lng: float, k: int) -> list[str]:
+    """k-NN straight from DuckDB, for comparison with VehicleIndex.nearest."""
+    rows = db.conn.execute(
+        """
+        SELECT vehicle_id FROM vehicle_latest
+        ORDER BY 2 * 6371008.8 * asin(sqrt(
+            pow(sin(radians(latitude - $1) / 2), 2)
+            + cos(radians($1)) * cos(radians(latitude))
+              * pow(sin(radians(longitude - $2) / 2), 2)
+        ))
+        LIMIT $3
+        """,
+        [lat, lng, k],
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def legacy_nearby(db: Database, lat: float, lng: float, radius_m: float) -> set:
+    rows = db.conn.execute(
+        "SELECT vehicle_id FROM vehicle_latest "
+        "WHERE ST_DWithin(geom, ST_Point($1, $2), $3)",
+        [lng, lat, radius_m / 111320.0],
+    ).fetchall()
+    return {r[0] for r in rows}
+
+
+def timed(fn, queries) -> list[float]:
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(*q)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return samples
+
+
+def report(name: str, samples: list[float]):
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<28} {statistics.mean(samples):>10.1f} {p95:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nearby/nearest lookups")
+    parser.add_argument("--fleet", type=int, default=300, help="Vehicles")
+    parser.add_argument("--queries", type=int, default=500, help="Queries per run")
+    parser.add_argument("--radius", type=float, default=2000, help="Radius (m)")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours for nearest")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    db = Database(path)
+    db.init()
+    try:
+        seed(db, args.fleet, rng)
+        rows = db.get_latest_positions(limit=args.fleet)
+
+        t0 = time.perf_counter()
+        for _ in range(100):
+            index = VehicleIndex(rows)
+        build_us = (time.perf_counter() - t0) / 100 * 1e6
+        print(f"Index build for {len(rows)} vehicles: {build_us:.0f} µs\n")
+
+        queries = [
+            (47.45 + rng.random() * 0.2, -52.85 + rng.random() * 0.25)
+            for _ in range(args.queries)
+        ]
+        print(f"{'query':<28} {'mean µs':>10} {'p95 µs':>10}")
+        print("-" * 50)
+        report(
+            "nearby  duckdb",
+            timed(
+                lambda lat, lng: db.get_nearby_vehicles(lat, lng, args.radius),
+                queries,
+            ),
+        )
+        report(
+            "nearby  index",
+            timed(lambda lat, lng: index.nearby(lat, lng, args.radius), queries),
+        )
+        report(
+            "nearest duckdb",
+            timed(lambda lat, lng: sql_nearest(db, lat, lng, args.k), queries),
+        )
+        report(
+            "nearest index",
+            timed(lambda lat, lng: index.nearest(lat, lng, args.k), queries),
+        )
+
+        wrong = checked = 0
+        for lat, lng in queries:
+            truth = {
+                r["vehicle_id"]
+                for r in rows
+                if haversine_m(lat, lng, r["latitude"], r["longitude"]) <= args.radius
+            }
+            legacy = legacy_nearby(db, lat, lng, args.radius)
+            wrong += len(legacy ^ truth)
+            checked += len(truth)
+        print(
+            f"\nLegacy degree radius: {wrong} wrong results against "
+            f"{checked} true matches over {len(queries)} queries"
+        )
+    finally:
+        db.close()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
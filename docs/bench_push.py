@@ -0,0 +1,214 @@
+"""
+Load test for the /vehicles/stream push channel: how many concurrent SSE
+subscribers one server process can feed, how long a fan-out takes, and
+whether slow consumers get evicted instead of backing up the rest.
+
+A server process runs the real router with a synthetic fleet and
+publishes a new version every --interval seconds, the way the collector
+does after a poll.  This process opens --clients raw HTTP connections to
+/vehicles/stream; --slow of them connect and never read.
+
+Usage (from the repo root):
+    uv run python docs/bench_push.py [--clients 5000] [--slow 50]
+                                     [--fleet 300] [--moving 40]
+                                     [--interval 2] [--events 10]
+                                     [--buffer 16]
+
+Output:
+    - Connect time for all subscribers
+    - Per version: subscribers reached and fan-out spread (first to last
+      delivery), plus p50/p95 delivery delay after the first
+    - Server-side broadcaster stats, including evictions
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import socket
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+from where_the_plow.broadcast import SUBSCRIBER_BUFFER
+
+PORT = 8765
+
+
+def serve(fleet: int, moving: int, interval: float, buffer: int, ready):
+    import uvicorn
+    from fastapi import FastAPI
+
+    from where_the_plow.broadcast import Broadcaster
+    from where_the_plow.routes import router
+    from where_the_plow.snapshot import RealtimeSnapshots
+
+    app = FastAPI()
+    app.include_router(router)
+    realtime = RealtimeSnapshots()
+    broadcaster = Broadcaster(maxsize=buffer)
+    app.state.store = {"realtime": realtime, "broadcaster": broadcaster}
+
+    @app.get("/bench/stats")
+    def stats():
+        return broadcaster.stats()
+
+    def snapshot(tick: int) -> dict:
+        features = []
+        for v in range(fleet):
+            step = tick if v < moving else 0
+            lon, lat = -52.71 + v * 0.0001 + step * 0.0002, 47.56 + step * 0.0001
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                    "properties": {
+                        "vehicle_id": f"v{v}",
+                        "description": f"{v} SA PLOW TRUCK",
+                        "vehicle_type": "SA PLOW TRUCK",
+                        "speed": 20.0,
+                        "bearing": 90,
+                        "is_driving": "maybe",
+                        "timestamp": f"2026-02-19T12:00:{tick % 60:02d}+00:00",
+                        "trail": [[lon, lat]] * 6,
+                        "city": "st_johns",
+                    },
+                }
+            )
+        return {"type": "FeatureCollection", "features": features}
+
+    async def publisher():
+        tick = 0
+        while True:
+            await asyncio.sleep(interval)
+            tick += 1
+            if realtime.publish("st_johns", snapshot(tick)):
+                broadcaster.publish(realtime, "st_johns", realtime.version - 1)
+
+    realtime.publish("st_johns", snapshot(0))
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        task = asyncio.create_task(publisher())
+        ready.set()
+        yield
+        task.cancel()
+
+    app.router.lifespan_context = lifespan
+    uvicorn.run(app, host="127.0.0.1", port=PORT, log_level="warning", backlog=8192)
+
+
+async def subscriber(received: dict, slow: bool, version_id: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    if slow:
+        sock = writer.get_extra_info("socket")
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    # Like the frontend: it already holds the version /vehicles reported.
+    writer.write(
+        f"GET /vehicles/stream?since_version={version_id} HTTP/1.1\r\n"
+        "Host: bench\r\n\r\n".encode()
+    )
+    await writer.drain()
+    if slow:
+        await asyncio.Event().wait()
+    tail = b""
+    try:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return
+            now = time.perf_counter()
+            data = tail + chunk
+            start = 0
+            while (i := data.find(b"\nid: ", start)) != -1:
+                end = data.find(b"\n", i + 5)
+                if end == -1:
+                    break
+                version = int(data[i + 5 : end].rpartition(b".")[2])
+                received.setdefault(version, []).append(now)
+                start = end
+            tail = data[max(start, len(data) - 16) :]
+    except asyncio.CancelledError:
+        writer.close()
+        raise
+
+
+async def run(args):
+    import httpx
+
+    received: dict[int, list[float]] = {}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}") as client:
+        resp = await client.get("/vehicles")
+        await measure(args, received, resp.headers["x-snapshot-version"])
+        stats = (await client.get("/bench/stats")).json()
+    print("Broadcaster:", stats)
+
+
+async def measure(args, received: dict, version_id: str):
+    t0 = time.perf_counter()
+    tasks = []
+    for i in range(args.clients + args.slow):
+        slow = i >= args.clients
+        tasks.append(asyncio.create_task(subscriber(received, slow, version_id)))
+        if i % 200 == 199:
+            await asyncio.sleep(0.05)
+    print(f"Opened {len(tasks)} connections in {time.perf_counter() - t0:.1f}s")
+
+    await asyncio.sleep(args.interval * (args.events + 1))
+    failed = [t.exception() for t in tasks if t.done() and not t.cancelled()]
+    failed = [e for e in failed if e is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if failed:
+        print(f"{len(failed)} subscribers failed, e.g. {failed[0]!r}")
+
+    print(
+        f"{'version':>7} {'reached':>8} {'spread ms':>10} {'p50 ms':>8} {'p95 ms':>8}"
+    )
+    print("-" * 46)
+    for version in sorted(received):
+        times = sorted(received[version])
+        delays = [(t - times[0]) * 1000 for t in times]
+        p95 = delays[int(len(delays) * 0.95) - 1] if len(delays) > 1 else 0.0
+        print(
+            f"{version:>7} {len(times):>8} {delays[-1]:>10.1f} "
+            f"{statistics.median(delays):>8.1f} {p95:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /vehicles/stream")
+    parser.add_argument("--clients", type=int, default=5000, help="Reading clients")
+    parser.add_argument("--slow", type=int, default=50, help="Clients that never read")
+    parser.add_argument("--fleet", type=int, default=300, help="Vehicles in snapshot")
+    parser.add_argument("--moving", type=int, default=40, help="Vehicles per delta")
+    parser.add_argument("--interval", type=float, default=2, help="Seconds per version")
+    parser.add_argument("--events", type=int, default=10, help="Versions to observe")
+    parser.add_argument(
+        "--buffer",
+        type=int,
+        default=SUBSCRIBER_BUFFER,
+        help="Events a subscriber may fall behind before eviction",
+    )
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(args.fleet, args.moving, args.interval, args.buffer, ready),
+        daemon=True,
+    )
+    server.start()
+    ready.wait(30)
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Reports what Douglas-Peucker simplification (?zoom= on /coverage) saves
+per zoom level.  bench_coverage.py's synthetic trucks drive dead straight,
+which would flatter any simplifier, so trails here are generated in
+Python instead: 30 s points from a random walk on a street grid with GPS
+noise, 8-12 m/s runs between turns and idle stretches where the truck
+sits in place.
+
+Usage (from the repo root):
+    uv run python docs/bench_simplify.py [--fleet 200] [--hours 24]
+                                         [--noise 3] [--repeat 3]
+
+Output, per zoom level (none, 10, 12, 14, 16, 18):
+    - Tolerance in metres (one 256 px pixel at 47.5°N)
+    - Points kept and the share of the original
+    - GeoJSON and polyline body sizes
+    - Median ms to simplify all trails
+"""
+
+import argparse
+import math
+import random
+import statistics
+import time
+
+from where_the_plow.coverage_format import encode_polyline
+from where_the_plow.routes import _coverage_geojson
+from where_the_plow.simplify import simplify_trails, zoom_tolerance_m
+
+M_PER_DEG = 111_195.0
+BASE_LNG, BASE_LAT = -52.75, 47.55
+
+
+def make_trail(rng: random.Random, vid: int, points: int, noise: float) -> dict:
+    kx = M_PER_DEG * math.cos(math.radians(BASE_LAT))
+    x = rng.uniform(-3000, 3000)
+    y = rng.uniform(-3000, 3000)
+    heading = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+    idle = 0
+    coords, times = [], []
+    t0 = 1_790_000_000
+    for i in range(points):
+        if idle:
+            idle -= 1
+        elif rng.random() < 0.02:
+            idle = rng.randrange(5, 40)
+        else:
+            if rng.random() < 0.15:
+                heading = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+            speed = rng.uniform(8, 12) * 30
+            x += heading[0] * speed
+            y += heading[1] * speed
+        nx = x + rng.gauss(0, noise)
+        ny = y + rng.gauss(0, noise)
+        coords.append([BASE_LNG + nx / kx, BASE_LAT + ny / M_PER_DEG])
+        times.append((t0 + i * 30) * 1_000_000)
+    return {
+        "vehicle_id": f"v{vid}",
+        "description": f"{vid} SA PLOW TRUCK",
+        "vehicle_type": "SA PLOW TRUCK",
+        "coordinates": coords,
+        "timestamps": [f"{t // 1_000_000}" for t in times],
+        "times_us": times,
+        "city": "st_johns",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trail simplification")
+    parser.add_argument("--fleet", type=int, default=200, help="Vehicles")
+    parser.add_argument("--hours", type=int, default=24, help="Hours per trail")
+    parser.add_argument("--noise", type=float, default=3.0, help="GPS noise (m)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per zoom")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    points_per_trail = args.hours * 120
+    trails = [
+        make_trail(rng, v, points_per_trail, args.noise) for v in range(args.fleet)
+    ]
+    total = args.fleet * points_per_trail
+    print(
+        f"{'zoom':>5} {'tol m':>7} {'points':>10} {'kept':>6} "
+        f"{'geojson':>12} {'polyline':>11} {'ms':>8}"
+    )
+    print("-" * 65)
+    for zoom in (None, 10, 12, 14, 16, 18):
+        tolerance = 0.0 if zoom is None else zoom_tolerance_m(zoom)
+        samples = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            simplified = simplify_trails(trails, tolerance)
+            samples.append((time.perf_counter() - t0) * 1000)
+        points = sum(len(t["coordinates"]) for t in simplified)
+        print(
+            f"{'-' if zoom is None else zoom:>5} {tolerance:>7.1f} {points:>10,} "
+            f"{points / total:>6.1%} {len(_coverage_geojson(simplified)):>12,} "
+            f"{len(encode_polyline(simplified)):>11,} "
+            f"{statistics.median(samples):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# src/where_the_plow/batch.py
+"""Struct-of-arrays form of one poll's vehicles and positions.
+
+Parsing a poll into a dict per vehicle and a dict per position, then
+unpacking those dicts again in the DB layer, costs several Python objects
+per row.  A PositionBatch keeps each field in one typed column instead:
+
+- timestamps are int64 epoch values exactly as the source reports them,
+  with the unit and any clock correction held once for the whole batch
+  and applied by DuckDB when the batch is loaded;
+- coordinates and speeds are float64 arrays;
+- low-cardinality strings (vehicle type, driving status) are dictionary
+  encoded as a list of distinct values plus an array of codes.
+"""
+
+import json
+import math
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def epoch_us(ts: datetime) -> int:
+    """Microseconds since the Unix epoch for an aware datetime."""
+    delta = ts - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_epoch_us(us: int) -> datetime:
+    """UTC datetime for microseconds since the Unix epoch."""
+    return _EPOCH + timedelta(microseconds=us)
+
+
+class DictionaryColumn:
+    """A string column stored as distinct values plus per-row codes."""
+
+    def __init__(self):
+        self.values: list[str] = []
+        self.codes = array("l")
+        self._lookup: dict[str, int] = {}
+
+    def append(self, value: str):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, i: int) -> str:
+        return self.values[self.codes[i]]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def take(self, indices: list[int]) -> "DictionaryColumn":
+        out = DictionaryColumn()
+        out.values = self.values
+        out._lookup = self._lookup
+        out.codes = array("l", (self.codes[i] for i in indices))
+        return out
+
+
+@dataclass
+class PositionBatch:
+    # Timestamps are `epoch * epoch_unit_us + offset_us` microseconds.
+    epoch_unit_us: int = 1
+    offset_us: int = 0
+    vehicle_id: list[str] = field(default_factory=list)
+    description: list[str] = field(default_factory=list)
+    vehicle_type: DictionaryColumn = field(default_factory=DictionaryColumn)
+    epoch: array = field(default_factory=lambda: array("q"))
+    longitude: array = field(default_factory=lambda: array("d"))
+    latitude: array = field(default_factory=lambda: array("d"))
+    bearing: array = field(default_factory=lambda: array("l"))
+    # None when the source does not report speed at all.
+    speed: array | None = field(default_factory=lambda: array("d"))
+    is_driving: DictionaryColumn = field(default_factory=DictionaryColumn)
+
+    def __len__(self) -> int:
+        return len(self.vehicle_id)
+
+    def timestamp_us(self, i: int) -> int:
+        return self.epoch[i] * self.epoch_unit_us + self.offset_us
+
+    def take(self, indices: list[int]) -> "PositionBatch":
+        """Return a new batch holding only the given rows."""
+        return PositionBatch(
+            epoch_unit_us=self.epoch_unit_us,
+            offset_us=self.offset_us,
+            vehicle_id=[self.vehicle_id[i] for i in indices],
+            description=[self.description[i] for i in indices],
+            vehicle_type=self.vehicle_type.take(indices),
+            epoch=array("q", (self.epoch[i] for i in indices)),
+            longitude=array("d", (self.longitude[i] for i in indices)),
+            latitude=array("d", (self.latitude[i] for i in indices)),
+            bearing=array("l", (self.bearing[i] for i in indices)),
+            speed=(
+                array("d", (self.speed[i] for i in indices))
+                if self.speed is not None
+                else None
+            ),
+            is_driving=self.is_driving.take(indices),
+        )
+
+    @classmethod
+    def from_positions(cls, positions: list[dict]) -> "PositionBatch":
+        """Build a batch from row dicts with datetime timestamps."""
+        batch = cls(speed=array("d") if positions else None)
+        has_speed = False
+        for p in positions:
+            batch.vehicle_id.append(p["vehicle_id"])
+            batch.description.append(p.get("description", ""))
+            batch.vehicle_type.append(p.get("vehicle_type", ""))
+            batch.epoch.append(epoch_us(p["timestamp"]))
+            batch.longitude.append(p["longitude"])
+            batch.latitude.append(p["latitude"])
+            batch.bearing.append(p["bearing"] or 0)
+            speed = p["speed"]
+            has_speed = has_speed or speed is not None
+            batch.speed.append(float("nan") if speed is None else speed)
+            batch.is_driving.append(p["is_driving"])
+        if not has_speed:
+            batch.speed = None
+        return batch
+
+    def finite(self) -> "PositionBatch":
+        """This batch without rows whose coordinates are NaN or infinite."""
+        isfinite = math.isfinite
+        bad = [
+            i
+            for i, (lng, lat) in enumerate(zip(self.longitude, self.latitude))
+            if not (isfinite(lng) and isfinite(lat))
+        ]
+        if not bad:
+            return self
+        drop = set(bad)
+        return self.take([i for i in range(len(self)) if i not in drop])
+
+    def to_json(self) -> str:
+        """Serialise the position columns for DuckDB's from_json().
+
+        Missing speeds are NaN in the array; they, and any other
+        non-finite speed, are written as null.  Coordinates must already
+        be finite (see finite()): strict JSON has no NaN.
+        """
+        speed = None
+        if self.speed is not None:
+            isfinite = math.isfinite
+            speed = [v if isfinite(v) else None for v in self.speed]
+        return json.dumps(
+            {
+                "vehicle_id": self.vehicle_id,
+                "epoch": self.epoch.tolist(),
+                "longitude": self.longitude.tolist(),
+                "latitude": self.latitude.tolist(),
+                "bearing": self.bearing.tolist(),
+                "speed": speed,
+                "is_driving": self.is_driving.values,
+                "is_driving_code": self.is_driving.codes.tolist(),
+            },
+            allow_nan=False,
+        )
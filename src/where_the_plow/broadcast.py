@@ -0,0 +1,123 @@
+# src/where_the_plow/broadcast.py
+"""Fan-out of realtime vehicle changes to Server-Sent Events subscribers.
+
+Without a push channel every open browser polls /vehicles every few
+seconds whether or not anything changed.  The collector instead hands
+each newly published version to the Broadcaster, which encodes it as one
+SSE event per city filter and puts the same bytes on every subscriber's
+queue.  Nothing is serialised per client.
+
+Each subscriber's queue is bounded.  A client that falls `maxsize`
+events behind is evicted: its queue is replaced by an end-of-stream
+marker, the HTTP response finishes, and the browser's EventSource
+reconnects with Last-Event-ID to pick up the missed changes in one
+delta from /vehicles/changes' history.
+"""
+
+import asyncio
+import logging
+
+from where_the_plow.snapshot import RealtimeSnapshots
+
+logger = logging.getLogger(__name__)
+
+# Events a subscriber may fall behind before it is evicted.
+SUBSCRIBER_BUFFER = 16
+# Seconds between keepalive comments on an idle stream.
+KEEPALIVE_S = 15.0
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+def encode_event(version_id: str, data: bytes, event: str = "changes") -> bytes:
+    """Format one SSE event; data must be single-line JSON."""
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+        version_id.encode(),
+        event.encode(),
+        data,
+    )
+
+
+class Subscription:
+    def __init__(self, city: str | None, maxsize: int):
+        self.city = city
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize)
+        self.evicted = False
+
+    async def events(self, keepalive: float = KEEPALIVE_S):
+        """Yield encoded events until the subscriber is evicted."""
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), keepalive)
+            except TimeoutError:
+                yield KEEPALIVE
+                continue
+            if event is None:
+                return
+            yield event
+
+
+class Broadcaster:
+    """Subscribers grouped by city filter, fed from the event loop.
+
+    All methods must be called on the event loop thread.
+    """
+
+    def __init__(self, maxsize: int = SUBSCRIBER_BUFFER):
+        self.maxsize = maxsize
+        self._subscribers: dict[str | None, set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return sum(len(subs) for subs in list(self._subscribers.values()))
+
+    def subscribe(self, city: str | None = None) -> Subscription:
+        sub = Subscription(city, self.maxsize)
+        self._subscribers.setdefault(city, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subscribers.get(sub.city)
+        if subs is not None:
+            subs.discard(sub)
+
+    def publish(self, realtime: RealtimeSnapshots, city: str, since_version: int):
+        """Send everything published after `since_version`.
+
+        Called once per collector publish of `city`: subscribers to all
+        cities and to `city` get the delta; subscribers to other cities
+        are not affected by it.
+        """
+        self.published += 1
+        for key in (None, city):
+            subs = self._subscribers.get(key)
+            if not subs:
+                continue
+            changes = realtime.changes(since_version, key)
+            event = encode_event(changes.version_id, changes.body)
+            for sub in list(subs):
+                self._send(sub, event)
+
+    def _send(self, sub: Subscription, event: bytes):
+        try:
+            sub.queue.put_nowait(event)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            self.unsubscribe(sub)
+            sub.evicted = True
+            self.evicted += 1
+            # Drop the backlog; the client resumes from Last-Event-ID.
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(None)
+            logger.info("Evicted slow subscriber (city=%s)", sub.city)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+        }
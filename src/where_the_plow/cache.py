@@ -1,32 +1,148 @@
 # src/where_the_plow/cache.py
-"""Simple file-based cache for coverage trail responses.
+"""Two-tier cache for serialised coverage responses.
 
-Stores JSON in /tmp/where-the-plow-cache/ keyed by a hash of the
-(since, until) time range.  Only caches queries whose `until` is
-before today (i.e. fully historical, immutable data).  Uses LRU
-eviction by file access time when total cache size exceeds a budget.
+Entries are keyed by (since, until, city, resolution, encoding) and hold
+the response body exactly as /coverage sends it, so a hit skips the query,
+the JSON decode and the Pydantic rebuild.  Only queries whose `until` is
+before today (i.e. fully historical, immutable data) are cached.
+
+The first tier is an in-process LRU capped at MAX_MEMORY_BYTES.  Behind
+it, files in /tmp/where-the-plow-cache/ (.json, or .bin for the binary
+format) survive restarts; those use LRU eviction by file access time when
+total size exceeds MAX_CACHE_BYTES, and a file hit is promoted into
+memory.  Vector tiles are many, small and cheap to re-cut from a shared
+trail index, so they stay in the memory tier only.
+
+Windows reaching into today are still changing, so LiveCoverage keeps
+the trails of the last LIVE_HOURS instead and brings them up to date on
+each request from the rows appended since its watermark.
+
+Any other window is assembled by CoverageChunks from hour-aligned
+chunks cached independently, so overlapping ranges share work.
 """
 
 import hashlib
-import json
 import logging
 import os
 import tempfile
-from datetime import datetime, timezone
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+from where_the_plow import coverage_format
+from where_the_plow.batch import epoch_us, from_epoch_us
+from where_the_plow.db import Database
+
 logger = logging.getLogger(__name__)
 
 CACHE_DIR = Path(tempfile.gettempdir()) / "where-the-plow-cache"
 MAX_CACHE_BYTES = 200 * 1024 * 1024  # 200 MB
+MAX_MEMORY_BYTES = 64 * 1024 * 1024  # 64 MB
+# The 24 h preset plus slack for client clocks and today's date preset.
+LIVE_HOURS = 25
+TRIM_EVERY = timedelta(minutes=1)
+CHUNK_US = 3600 * 1_000_000  # one hour
+# An hour that ended less than this long ago may still get late rows.
+CHUNK_SETTLE = timedelta(minutes=15)
+MAX_CHUNK_BYTES = 128 * 1024 * 1024  # 128 MB
+# A busy 25 h window is ~750k points; shed the oldest past this.
+MAX_LIVE_BYTES = 128 * 1024 * 1024  # 128 MB
+# Rough in-memory size of one cached point: an int, a str and a pair.
+_POINT_BYTES = 200
+# Trail indexes shared by the tiles of one /coverage/tiles window.
+MAX_TILE_WINDOW_BYTES = 128 * 1024 * 1024  # 128 MB
+# A window reaching into today is re-read after this many seconds.
+TILE_WINDOW_TTL = 10
+# Coverage levels chosen for historical windows; each entry is tiny.
+MAX_LEVEL_BYTES = 1024 * 1024  # 1 MB
+LEVEL_ENTRY_BYTES = 200
+
+
+class MemoryLRU:
+    """Size-capped least-recently-used map.
+
+    Values are response bodies by default, sized by len(); other values
+    are put with an explicit size estimate.  Thread-safe: /coverage runs
+    in FastAPI's worker threads.
+    """
+
+    def __init__(self, max_bytes: int = MAX_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[object, tuple[object, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size: int | None = None):
+        if size is None:
+            size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
 
 
-def _cache_key(since: datetime, until: datetime) -> str:
-    raw = f"{since.isoformat()}|{until.isoformat()}"
+memory = MemoryLRU()
+# (level, points) per historical window, so a cached /coverage body is
+# served without first counting the window's rollup rows again.
+levels = MemoryLRU(MAX_LEVEL_BYTES)
+disk_hits = 0
+
+
+def _cache_key(
+    since: datetime,
+    until: datetime,
+    city: str | None,
+    resolution: int,
+    encoding: str,
+) -> str:
+    raw = (
+        f"{since.isoformat()}|{until.isoformat()}|{city or '*'}|{resolution}|{encoding}"
+    )
     return hashlib.sha256(raw.encode()).hexdigest()[:16]
 
 
-def _is_cacheable(until: datetime) -> bool:
+def is_cacheable(until: datetime) -> bool:
     """Only cache if the entire window is in the past (before today UTC)."""
     today_start = datetime.now(timezone.utc).replace(
         hour=0, minute=0, second=0, microsecond=0
@@ -35,6 +151,11 @@ def _is_cacheable(until: datetime) -> bool:
     return until_utc < today_start
 
 
+def _path(key: str, encoding: str) -> Path:
+    suffix = ".bin" if encoding.startswith(coverage_format.BINARY) else ".json"
+    return CACHE_DIR / f"{key}{suffix}"
+
+
 def _ensure_dir():
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -42,7 +163,7 @@ def _ensure_dir():
 def _evict_if_needed():
     """Delete oldest-accessed files until total size is under budget."""
     try:
-        files = list(CACHE_DIR.glob("*.json"))
+        files = [f for f in CACHE_DIR.iterdir() if f.suffix in (".json", ".bin")]
         if not files:
             return
         total = sum(f.stat().st_size for f in files)
@@ -61,32 +182,330 @@ def _evict_if_needed():
         pass
 
 
-def get(since: datetime, until: datetime) -> list[dict] | None:
-    """Return cached trails or None if not cached."""
-    if not _is_cacheable(until):
+def get(
+    since: datetime,
+    until: datetime,
+    city: str | None,
+    resolution: int,
+    encoding: str = "geojson",
+    disk: bool = True,
+) -> bytes | None:
+    """Return a cached response body or None if not cached.
+
+    With disk=False only the memory tier is consulted.
+    """
+    global disk_hits
+    if not is_cacheable(until):
         return None
-    path = CACHE_DIR / f"{_cache_key(since, until)}.json"
+    key = _cache_key(since, until, city, resolution, encoding)
+    body = memory.get(key)
+    if body is not None or not disk:
+        return body
+    path = _path(key, encoding)
     if not path.exists():
         return None
     try:
         # Touch access time for LRU
         os.utime(path)
-        data = json.loads(path.read_text())
-        logger.debug("cache hit: %s", path.name)
-        return data
-    except (OSError, json.JSONDecodeError):
+        body = path.read_bytes()
+    except OSError:
         return None
+    logger.debug("cache hit: %s", path.name)
+    disk_hits += 1
+    memory.put(key, body)
+    return body
 
 
-def put(since: datetime, until: datetime, trails: list[dict]):
-    """Store trails in cache if the query is cacheable."""
-    if not _is_cacheable(until):
+def put(
+    since: datetime,
+    until: datetime,
+    city: str | None,
+    resolution: int,
+    body: bytes,
+    encoding: str = "geojson",
+    disk: bool = True,
+):
+    """Store a response body if the query is cacheable.
+
+    Bodies go in both tiers, or in memory only with disk=False.
+    """
+    if not is_cacheable(until):
+        return
+    key = _cache_key(since, until, city, resolution, encoding)
+    memory.put(key, body)
+    if not disk:
         return
     _ensure_dir()
     _evict_if_needed()
-    path = CACHE_DIR / f"{_cache_key(since, until)}.json"
+    path = _path(key, encoding)
     try:
-        path.write_text(json.dumps(trails))
-        logger.debug("cache put: %s (%d trails)", path.name, len(trails))
+        # Bodies are served as read, so never expose a half-written file.
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+        logger.debug("cache put: %s (%d bytes)", path.name, len(body))
     except OSError:
         pass
+
+
+def stats() -> dict:
+    return {"memory": memory.stats(), "levels": levels.stats(), "disk_hits": disk_hits}
+
+
+class _Segment:
+    __slots__ = ("coords", "description", "times_us", "timestamps", "vehicle_type")
+
+    def __init__(self):
+        self.description = ""
+        self.vehicle_type = ""
+        self.times_us: list[int] = []
+        self.timestamps: list[str] = []
+        self.coords: list[list[float]] = []
+
+
+# (vehicle_id, city, segment_id) -> _Segment
+_Segments = dict[tuple[str, str, int], _Segment]
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _append_row(segments: _Segments, row: tuple):
+    """Add one Database.get_coverage_rows row to the end of its segment."""
+    vid, city, seg_id, ts_us, ts, lng, lat, description, vtype = row
+    seg = segments.get((vid, city, seg_id))
+    if seg is None:
+        seg = segments[(vid, city, seg_id)] = _Segment()
+    seg.description = description
+    seg.vehicle_type = vtype
+    seg.times_us.append(ts_us)
+    seg.timestamps.append(ts)
+    seg.coords.append([lng, lat])
+
+
+def _slice_trails(
+    segments: _Segments, since_us: int, until_us: int, city: str | None
+) -> list[dict]:
+    """Trails shaped like Database.get_coverage_trails, in the same order."""
+    trails = []
+    for key in sorted(segments):
+        vid, seg_city, _ = key
+        if city and seg_city != city:
+            continue
+        seg = segments[key]
+        i = bisect_left(seg.times_us, since_us)
+        j = bisect_right(seg.times_us, until_us)
+        if j - i < 2:
+            continue
+        trails.append(
+            {
+                "vehicle_id": vid,
+                "description": seg.description,
+                "vehicle_type": seg.vehicle_type,
+                "coordinates": seg.coords[i:j],
+                "timestamps": seg.timestamps[i:j],
+                "times_us": seg.times_us[i:j],
+                "city": seg_city,
+            }
+        )
+    return trails
+
+
+class LiveCoverage:
+    """Coverage segments of the last `hours`, extended append-only.
+
+    coverage_points rows are only ever appended, so everything up to the
+    watermark (the highest seq merged so far) is an immutable prefix.
+    Each request merges just the rows appended since into their
+    segments: a segment that was still open last time keeps growing,
+    including segments of one point that only become a trail now.
+    Points older than the window are trimmed off the front, and if the
+    window holds more than `max_bytes` its oldest points are shed too;
+    requests reaching back past them return None like any other range
+    outside the window.
+
+    The database read happens outside the lock that guards the segments,
+    so requests slicing trails never wait on it.  Requests arriving
+    while another one refreshes wait for that refresh instead of running
+    their own.
+    """
+
+    def __init__(self, hours: float = LIVE_HOURS, max_bytes: int = MAX_LIVE_BYTES):
+        self.span = timedelta(hours=hours)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._segments: _Segments = {}
+        # Earliest timestamp held completely, None before the first load.
+        self.start: datetime | None = None
+        self.watermark = 0
+        self.refreshes = 0
+        self.points = 0
+        self.merged = 0
+        self.shed = 0
+        self.served = 0
+
+    def trails(
+        self,
+        db: Database,
+        since: datetime,
+        until: datetime,
+        city: str | None = None,
+    ) -> list[dict] | None:
+        """Trails in [since, until], or None if since is outside the window.
+
+        Also None, sending the request down the chunk path, while the
+        window has never been loaded, e.g. because its first refresh
+        failed.
+        """
+        since = _utc(since)
+        if since < datetime.now(timezone.utc) - self.span:
+            return None
+        self._refresh(db)
+        with self._lock:
+            if self.start is None or since < self.start:
+                return None
+            self.served += 1
+            return _slice_trails(
+                self._segments, epoch_us(since), epoch_us(_utc(until)), city
+            )
+
+    def _refresh(self, db: Database):
+        seen = self.refreshes
+        with self._refresh_lock:
+            if self.refreshes != seen:
+                # Another request refreshed while this one waited.
+                return
+            start = datetime.now(timezone.utc) - self.span
+            fetch_from = self.start or start
+            rows, watermark = db.get_coverage_points(fetch_from, self.watermark)
+            with self._lock:
+                if self.start is None:
+                    self.start = fetch_from
+                for row in rows:
+                    _append_row(self._segments, row)
+                self.watermark = watermark
+                self.points += len(rows)
+                self.merged += len(rows)
+                # Requests only ever reach back `span`, so trimming can lag.
+                if start - self.start >= TRIM_EVERY:
+                    self._trim(start)
+                if self.points * _POINT_BYTES > self.max_bytes:
+                    self._shed()
+            self.refreshes += 1
+
+    def _trim(self, start: datetime):
+        start_us = epoch_us(start)
+        for key, seg in list(self._segments.items()):
+            i = bisect_left(seg.times_us, start_us)
+            if i == len(seg.times_us):
+                del self._segments[key]
+            elif i:
+                del seg.times_us[:i], seg.timestamps[:i], seg.coords[:i]
+            self.points -= i
+        self.start = start
+
+    def _shed(self):
+        """Move start forward until the points held fit in 90% of max_bytes."""
+        keep = max(1, self.max_bytes * 9 // 10 // _POINT_BYTES)
+        # Called only when over max_bytes, so there are more than `keep`.
+        times = sorted(t for seg in self._segments.values() for t in seg.times_us)
+        before = self.points
+        self._trim(from_epoch_us(times[-keep]))
+        self.shed += before - self.points
+
+    def stats(self) -> dict:
+        return {
+            "segments": len(self._segments),
+            "bytes": self.points * _POINT_BYTES,
+            "max_bytes": self.max_bytes,
+            "start": self.start.isoformat() if self.start else None,
+            "watermark": self.watermark,
+            "merged": self.merged,
+            "shed": self.shed,
+            "served": self.served,
+        }
+
+
+class CoverageChunks:
+    """Coverage cached in fixed hour-long chunks, stitched per request.
+
+    A chunk holds every rollup point of its hour, all cities together,
+    grouped by segment.  A requested range is assembled from the chunks
+    it touches: hours missing from the cache are fetched in one query
+    per contiguous run, segments are concatenated across chunk
+    boundaries (segment ids are global, so a trail crossing the hour is
+    one segment in both chunks), and the edges are trimmed to
+    [since, until] while slicing.  Hours that have not settled yet are
+    fetched but not cached.
+    """
+
+    def __init__(self, max_bytes: int = MAX_CHUNK_BYTES):
+        self.lru = MemoryLRU(max_bytes)
+        self.fetched_hours = 0
+
+    def trails(
+        self,
+        db: Database,
+        since: datetime,
+        until: datetime,
+        city: str | None = None,
+    ) -> list[dict]:
+        since_us = epoch_us(_utc(since))
+        until_us = epoch_us(_utc(until))
+        if until_us < since_us:
+            return []
+        settled_us = epoch_us(datetime.now(timezone.utc) - CHUNK_SETTLE)
+        hours = range(since_us // CHUNK_US, until_us // CHUNK_US + 1)
+        chunks: dict[int, _Segments] = {}
+        missing = []
+        for hour in hours:
+            chunk = self.lru.get(hour)
+            if chunk is None:
+                missing.append(hour)
+            else:
+                chunks[hour] = chunk
+        for run in _runs(missing):
+            fetched: dict[int, _Segments] = {hour: {} for hour in run}
+            rows = db.get_coverage_rows(
+                from_epoch_us(run[0] * CHUNK_US),
+                from_epoch_us((run[-1] + 1) * CHUNK_US - 1),
+            )
+            for row in rows:
+                _append_row(fetched[row[3] // CHUNK_US], row)
+            self.fetched_hours += len(run)
+            for hour, chunk in fetched.items():
+                chunks[hour] = chunk
+                if (hour + 1) * CHUNK_US <= settled_us:
+                    points = sum(len(seg.times_us) for seg in chunk.values())
+                    self.lru.put(hour, chunk, size=64 + points * _POINT_BYTES)
+
+        stitched: _Segments = {}
+        for hour in hours:
+            for key, seg in chunks[hour].items():
+                if city and key[1] != city:
+                    continue
+                out = stitched.get(key)
+                if out is None:
+                    out = stitched[key] = _Segment()
+                out.description = seg.description
+                out.vehicle_type = seg.vehicle_type
+                out.times_us.extend(seg.times_us)
+                out.timestamps.extend(seg.timestamps)
+                out.coords.extend(seg.coords)
+        return _slice_trails(stitched, since_us, until_us, city)
+
+    def stats(self) -> dict:
+        return {**self.lru.stats(), "fetched_hours": self.fetched_hours}
+
+
+def _runs(hours: list[int]) -> list[list[int]]:
+    """Split sorted hours into runs of consecutive values."""
+    runs: list[list[int]] = []
+    for hour in hours:
+        if runs and runs[-1][-1] == hour - 1:
+            runs[-1].append(hour)
+        else:
+            runs.append([hour])
+    return runs
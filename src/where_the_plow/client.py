@@ -1,58 +1,107 @@
+import hashlib
+import logging
 from datetime import datetime, timedelta, timezone
 
 import httpx
 
+from where_the_plow.batch import PositionBatch, epoch_us
 from where_the_plow.config import settings
+from where_the_plow.pbf import PbfDecodeError, decode_feature_collection
+
+logger = logging.getLogger(__name__)
 
 _NST_CORRECTION = timedelta(hours=3, minutes=30)
 
 
-def parse_avl_response(data: dict) -> tuple[list[dict], list[dict]]:
-    vehicles = []
-    positions = []
+class PayloadFingerprint:
+    """Remembers the last response from an upstream feed.
+
+    Sends the last ETag/Last-Modified back as conditional request headers
+    and hashes the raw body, so a response that is identical to the
+    previous one (a 304, or the same bytes) can be skipped without parsing.
+    """
+
+    def __init__(self):
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+        self.digest: bytes | None = None
+
+    def request_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def is_unchanged(self, resp: httpx.Response) -> bool:
+        """Return True if resp carries the same payload as the previous one."""
+        if resp.status_code == 304:
+            return True
+        digest = hashlib.blake2b(resp.content, digest_size=16).digest()
+        unchanged = digest == self.digest
+        self.digest = digest
+        self.etag = resp.headers.get("etag")
+        self.last_modified = resp.headers.get("last-modified")
+        return unchanged
+
+    def forget(self):
+        """Drop the remembered payload, e.g. after it failed to process."""
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+
+
+def parse_avl_batch(data: dict) -> PositionBatch:
+    """Parse a St. John's AVL response into a PositionBatch.
+
+    LocationDateTime is kept as raw epoch milliseconds; the NST correction
+    is recorded once on the batch and applied when it is loaded.
+    """
+    batch = PositionBatch(
+        epoch_unit_us=1000, offset_us=_NST_CORRECTION // timedelta(microseconds=1)
+    )
     for feature in data.get("features", []):
         attrs = feature["attributes"]
         geom = feature.get("geometry", {})
 
-        vehicle_id = str(attrs["ID"])
-        naive_ts = datetime.fromtimestamp(
-            attrs["LocationDateTime"] / 1000, tz=timezone.utc
-        )
-        ts = naive_ts + _NST_CORRECTION
-
-        vehicles.append(
-            {
-                "vehicle_id": vehicle_id,
-                "description": attrs.get("Description", ""),
-                "vehicle_type": attrs.get("VehicleType", ""),
-            }
-        )
-
-        speed_raw = attrs.get("Speed", "0.0")
+        batch.vehicle_id.append(str(attrs["ID"]))
+        batch.description.append(attrs.get("Description", ""))
+        batch.vehicle_type.append(attrs.get("VehicleType", ""))
+        batch.epoch.append(int(attrs["LocationDateTime"]))
+        batch.longitude.append(geom.get("x", 0.0))
+        batch.latitude.append(geom.get("y", 0.0))
+        batch.bearing.append(attrs.get("Bearing", 0) or 0)
         try:
-            speed = float(speed_raw)
+            batch.speed.append(float(attrs.get("Speed", "0.0")))
         except (ValueError, TypeError):
-            speed = 0.0
+            batch.speed.append(0.0)
+        batch.is_driving.append(attrs.get("isDriving", ""))
+
+    return batch
+
+
+_AVL_OUT_FIELDS = "ID,Description,VehicleType,LocationDateTime,Bearing,Speed,isDriving"
 
-        positions.append(
-            {
-                "vehicle_id": vehicle_id,
-                "timestamp": ts,
-                "longitude": geom.get("x", 0.0),
-                "latitude": geom.get("y", 0.0),
-                "bearing": attrs.get("Bearing", 0),
-                "speed": speed,
-                "is_driving": attrs.get("isDriving", ""),
-            }
-        )
+# Set once a PBF response fails to decode; later polls go straight to JSON.
+_pbf_unavailable = False
 
-    return vehicles, positions
 
+async def fetch_vehicles(
+    client: httpx.AsyncClient, fingerprint: PayloadFingerprint | None = None
+) -> dict | None:
+    """Fetch the St. John's AVL feed.
 
-async def fetch_vehicles(client: httpx.AsyncClient) -> dict:
+    Requests the compact `f=pbf` encoding when settings.avl_format is
+    "pbf", falling back to JSON for the rest of the process if the
+    response cannot be decoded.  With a fingerprint, returns None if the
+    payload is unchanged since the previous call.
+    """
+    global _pbf_unavailable
+    use_pbf = settings.avl_format == "pbf" and not _pbf_unavailable
     params = {
-        "f": "json",
-        "outFields": "ID,Description,VehicleType,LocationDateTime,Bearing,Speed,isDriving",
+        "f": "pbf" if use_pbf else "json",
+        "outFields": _AVL_OUT_FIELDS,
         "outSR": "4326",
         "returnGeometry": "true",
         "where": "1=1",
@@ -60,19 +109,31 @@ async def fetch_vehicles(client: httpx.AsyncClient) -> dict:
     headers = {
         "Referer": settings.avl_referer,
     }
+    if fingerprint is not None:
+        headers.update(fingerprint.request_headers())
     resp = await client.get(
         settings.avl_api_url, params=params, headers=headers, timeout=10
     )
-    resp.raise_for_status()
-    return resp.json()
-
-
-def parse_mt_pearl_response(data: list) -> tuple[list[dict], list[dict]]:
-    vehicles = []
-    positions = []
+    if resp.status_code != 304:
+        resp.raise_for_status()
+    if fingerprint is not None and fingerprint.is_unchanged(resp):
+        return None
+    if not use_pbf:
+        return resp.json()
+    try:
+        return decode_feature_collection(resp.content)
+    except PbfDecodeError:
+        logger.warning("AVL PBF response could not be decoded, falling back to JSON")
+        _pbf_unavailable = True
+        if fingerprint is not None:
+            fingerprint.forget()
+        return await fetch_vehicles(client, fingerprint)
+
+
+def parse_mt_pearl_batch(data: list) -> PositionBatch:
+    """Parse a Mount Pearl response into a PositionBatch."""
+    batch = PositionBatch(speed=None)
     for item in data:
-        vehicle_id = str(item["VEH_ID"])
-
         ts_str = item.get("VEH_EVENT_DATETIME", "")
         try:
             ts = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
@@ -81,30 +142,30 @@ def parse_mt_pearl_response(data: list) -> tuple[list[dict], list[dict]]:
         except (ValueError, TypeError):
             ts = datetime.now(timezone.utc)
 
-        vehicles.append(
-            {
-                "vehicle_id": vehicle_id,
-                "description": item.get("VEH_NAME", ""),
-                "vehicle_type": item.get("LOO_DESCRIPTION", "Unknown"),
-            }
-        )
-
-        positions.append(
-            {
-                "vehicle_id": vehicle_id,
-                "timestamp": ts,
-                "longitude": item.get("VEH_EVENT_LONGITUDE", 0.0),
-                "latitude": item.get("VEH_EVENT_LATITUDE", 0.0),
-                "bearing": int(item.get("VEH_EVENT_HEADING", 0)),
-                "speed": None,
-                "is_driving": "maybe",
-            }
-        )
-
-    return vehicles, positions
-
-
-async def fetch_mt_pearl_vehicles(client: httpx.AsyncClient) -> list:
-    resp = await client.get(settings.mt_pearl_api_url, timeout=10)
-    resp.raise_for_status()
+        batch.vehicle_id.append(str(item["VEH_ID"]))
+        batch.description.append(item.get("VEH_NAME", ""))
+        batch.vehicle_type.append(item.get("LOO_DESCRIPTION", "Unknown"))
+        batch.epoch.append(epoch_us(ts))
+        batch.longitude.append(item.get("VEH_EVENT_LONGITUDE", 0.0))
+        batch.latitude.append(item.get("VEH_EVENT_LATITUDE", 0.0))
+        batch.bearing.append(int(item.get("VEH_EVENT_HEADING", 0)))
+        batch.is_driving.append("maybe")
+
+    return batch
+
+
+async def fetch_mt_pearl_vehicles(
+    client: httpx.AsyncClient, fingerprint: PayloadFingerprint | None = None
+) -> list | None:
+    """Fetch the Mount Pearl feed.
+
+    With a fingerprint, returns None if the payload is unchanged since the
+    previous call.
+    """
+    headers = fingerprint.request_headers() if fingerprint is not None else {}
+    resp = await client.get(settings.mt_pearl_api_url, headers=headers, timeout=10)
+    if resp.status_code != 304:
+        resp.raise_for_status()
+    if fingerprint is not None and fingerprint.is_unchanged(resp):
+        return None
     return resp.json()
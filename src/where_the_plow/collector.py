@@ -2,64 +2,211 @@
 import asyncio
 import logging
 from datetime import datetime, timezone
+from typing import NamedTuple
 
 import httpx
 
 from where_the_plow.client import (
+    PayloadFingerprint,
     fetch_vehicles,
     fetch_mt_pearl_vehicles,
-    parse_avl_response,
-    parse_mt_pearl_response,
+    parse_avl_batch,
+    parse_mt_pearl_batch,
 )
+from where_the_plow.batch import PositionBatch
+from where_the_plow.broadcast import Broadcaster
 from where_the_plow.db import Database
 from where_the_plow.config import settings
-from where_the_plow.snapshot import build_realtime_snapshot
+from where_the_plow.dedup import DedupIndex
+from where_the_plow.scheduler import AdaptiveInterval, Ticker
+from where_the_plow.snapshot import RealtimeSnapshots, TrailBuffer
+from where_the_plow.writer import IngestWriter
 
 logger = logging.getLogger(__name__)
 
 
-def process_poll_st_johns(db: Database, response: dict) -> int:
+def _store_batch(
+    db: Database,
+    batch: PositionBatch,
+    city: str,
+    index: DedupIndex | None,
+    trails: TrailBuffer | None,
+) -> int:
     now = datetime.now(timezone.utc)
-    vehicles, positions = parse_avl_response(response)
-    db.upsert_vehicles(vehicles, now, "st_johns")
-    inserted = db.insert_positions(positions, now, "st_johns")
+    db.upsert_vehicle_batch(batch, now, city)
+    if trails is not None:
+        trails.record_vehicles(batch, city)
+    if index is not None:
+        batch = index.filter_batch(batch, city)
+    inserted = db.insert_position_batch(batch, now, city)
+    if index is not None:
+        index.record_batch(batch, city)
+    if trails is not None:
+        trails.record_batch(batch, city)
     return inserted
 
 
-def process_poll_mt_pearl(db: Database, response: list) -> int:
-    now = datetime.now(timezone.utc)
-    vehicles, positions = parse_mt_pearl_response(response)
-    db.upsert_vehicles(vehicles, now, "mt_pearl")
-    inserted = db.insert_positions(positions, now, "mt_pearl")
-    return inserted
+def process_poll_st_johns(
+    db: Database,
+    response: dict,
+    index: DedupIndex | None = None,
+    trails: TrailBuffer | None = None,
+) -> int:
+    return _store_batch(db, parse_avl_batch(response), "st_johns", index, trails)
+
+
+def process_poll_mt_pearl(
+    db: Database,
+    response: list,
+    index: DedupIndex | None = None,
+    trails: TrailBuffer | None = None,
+) -> int:
+    return _store_batch(db, parse_mt_pearl_batch(response), "mt_pearl", index, trails)
+
 
+class PollResult(NamedTuple):
+    new_positions: int
+    # None when the payload was unchanged and therefore not looked at.
+    active_vehicles: int | None
+    unchanged: bool = False
 
-async def poll_st_johns(client: httpx.AsyncClient, db: Database) -> int:
+
+UNCHANGED = PollResult(0, None, unchanged=True)
+
+
+async def poll_st_johns(
+    client: httpx.AsyncClient,
+    db: Database,
+    writer: IngestWriter,
+    index: DedupIndex | None = None,
+    fingerprint: PayloadFingerprint | None = None,
+    trails: TrailBuffer | None = None,
+) -> PollResult | None:
+    """Poll St. John's once. Returns None on failure."""
     try:
-        response = await fetch_vehicles(client)
-        count = len(response.get("features", []))
-        inserted = process_poll_st_johns(db, response)
-        logger.info("st_johns: %d vehicles seen, %d new positions", count, inserted)
-        return inserted
+        response = await fetch_vehicles(client, fingerprint)
+        if response is None:
+            logger.debug("st_johns: payload unchanged, skipping")
+            now = datetime.now(timezone.utc)
+            await writer.submit(db.refresh_last_seen, now, "st_johns")
+            return UNCHANGED
+        features = response.get("features", [])
+        active = sum(
+            1 for f in features if f.get("attributes", {}).get("isDriving") == "maybe"
+        )
+        inserted = await writer.submit(
+            process_poll_st_johns, db, response, index, trails
+        )
+        logger.info(
+            "st_johns: %d vehicles seen, %d new positions", len(features), inserted
+        )
+        return PollResult(inserted, active)
     except Exception:
         logger.exception("st_johns poll failed")
-        return 0
-
-
-async def poll_mt_pearl(client: httpx.AsyncClient, db: Database) -> int:
+        if fingerprint is not None:
+            fingerprint.forget()
+        return None
+
+
+async def poll_mt_pearl(
+    client: httpx.AsyncClient,
+    db: Database,
+    writer: IngestWriter,
+    index: DedupIndex | None = None,
+    fingerprint: PayloadFingerprint | None = None,
+    trails: TrailBuffer | None = None,
+) -> PollResult | None:
+    """Poll Mount Pearl once. Returns None on failure.
+
+    The Mount Pearl feed only lists plows that are out, so every vehicle
+    in it counts as active.
+    """
     try:
-        response = await fetch_mt_pearl_vehicles(client)
+        response = await fetch_mt_pearl_vehicles(client, fingerprint)
+        if response is None:
+            logger.debug("mt_pearl: payload unchanged, skipping")
+            now = datetime.now(timezone.utc)
+            await writer.submit(db.refresh_last_seen, now, "mt_pearl")
+            return UNCHANGED
         count = len(response) if isinstance(response, list) else 0
-        inserted = process_poll_mt_pearl(db, response)
+        inserted = await writer.submit(
+            process_poll_mt_pearl, db, response, index, trails
+        )
         logger.info("mt_pearl: %d vehicles seen, %d new positions", count, inserted)
-        return inserted
+        return PollResult(inserted, count)
     except Exception:
         logger.exception("mt_pearl poll failed")
-        return 0
-
-
-async def run(db: Database, store: dict):
-    logger.info("Collector starting — polling every %ds", settings.poll_interval)
+        if fingerprint is not None:
+            fingerprint.forget()
+        return None
+
+
+def publish_snapshot(
+    trails: TrailBuffer, realtime: RealtimeSnapshots, city: str
+) -> int | None:
+    """Publish a city's snapshot; returns the new version if it changed."""
+    if realtime.publish(city, trails.snapshot(city)):
+        return realtime.version
+    return None
+
+
+SOURCES = {
+    "st_johns": poll_st_johns,
+    "mt_pearl": poll_mt_pearl,
+}
+
+
+async def poll_source(
+    city: str,
+    ticker: Ticker,
+    client: httpx.AsyncClient,
+    db: Database,
+    writer: IngestWriter,
+    index: DedupIndex,
+    trails: TrailBuffer,
+    store: dict,
+):
+    """Poll one source forever on its own fixed-rate schedule."""
+    poll = SOURCES[city]
+    fingerprint = PayloadFingerprint()
+    while True:
+        tick = await ticker.wait()
+        try:
+            try:
+                result = await asyncio.wait_for(
+                    poll(client, db, writer, index, fingerprint, trails),
+                    settings.poll_timeout,
+                )
+            except TimeoutError:
+                ticker.record_poll(tick, timed_out=True)
+                fingerprint.forget()
+                logger.warning(
+                    "%s: poll timed out after %ds", city, settings.poll_timeout
+                )
+                continue
+            ticker.record_poll(tick, unchanged=result is not None and result.unchanged)
+            if result is None:
+                continue
+            ticker.schedule.observe(result.new_positions, result.active_vehicles, tick)
+            if result.unchanged:
+                continue
+            realtime = store["realtime"]
+            version = await writer.submit(publish_snapshot, trails, realtime, city)
+            if version is not None:
+                store["broadcaster"].publish(realtime, city, version - 1)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("%s: poll cycle failed", city)
+
+
+async def run(db: Database, store: dict, writer: IngestWriter):
+    logger.info(
+        "Collector starting — polling every %d-%ds (%ds when idle)",
+        settings.poll_interval,
+        settings.poll_interval_max,
+        settings.poll_interval_idle,
+    )
 
     stats = db.get_stats()
     logger.info(
@@ -68,21 +215,40 @@ async def run(db: Database, store: dict):
         stats["total_vehicles"],
     )
 
+    # Seeding scans the database; do it on the writer thread, not the loop.
+    index = await writer.submit(DedupIndex.from_db, db)
+    store["dedup"] = index
+    logger.info("Dedup index seeded with %d vehicles", len(index))
+
+    trails = await writer.submit(TrailBuffer.from_db, db)
+    realtime = RealtimeSnapshots()
+    for city in SOURCES:
+        await writer.submit(publish_snapshot, trails, realtime, city)
+    store["realtime"] = realtime
+    store["broadcaster"] = Broadcaster()
+    logger.info("Trail buffer seeded with %d vehicles", len(trails))
+
+    tickers = {
+        city: Ticker(
+            AdaptiveInterval(
+                settings.poll_interval,
+                settings.poll_interval_max,
+                settings.poll_interval_idle,
+            )
+        )
+        for city in SOURCES
+    }
+    store["sources"] = tickers
+
     async with httpx.AsyncClient() as client:
-        while True:
-            try:
-                await asyncio.gather(
-                    poll_st_johns(client, db),
-                    poll_mt_pearl(client, db),
-                )
-                store["realtime"] = {
-                    "st_johns": build_realtime_snapshot(db, "st_johns"),
-                    "mt_pearl": build_realtime_snapshot(db, "mt_pearl"),
-                }
-            except asyncio.CancelledError:
-                logger.info("Collector shutting down")
-                raise
-            except Exception:
-                logger.exception("Poll cycle failed")
-
-            await asyncio.sleep(settings.poll_interval)
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for city, ticker in tickers.items():
+                    tg.create_task(
+                        poll_source(
+                            city, ticker, client, db, writer, index, trails, store
+                        )
+                    )
+        except asyncio.CancelledError:
+            logger.info("Collector shutting down")
+            raise
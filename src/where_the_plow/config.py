@@ -5,12 +5,24 @@ class Settings:
     def __init__(self):
         self.db_path: str = os.environ.get("DB_PATH", "/data/plow.db")
         self.poll_interval: int = int(os.environ.get("POLL_INTERVAL", "6"))
+        self.poll_interval_max: int = int(os.environ.get("POLL_INTERVAL_MAX", "30"))
+        self.poll_interval_idle: int = int(os.environ.get("POLL_INTERVAL_IDLE", "120"))
+        self.poll_timeout: int = int(os.environ.get("POLL_TIMEOUT", "20"))
+        self.write_queue_size: int = int(os.environ.get("WRITE_QUEUE_SIZE", "8"))
+        # Most trail points a /coverage response may carry; longer ranges
+        # are served coarser, and refused once even hourly points exceed it.
+        self.coverage_max_points: int = int(
+            os.environ.get("COVERAGE_MAX_POINTS", "250000")
+        )
         self.log_level: str = os.environ.get("LOG_LEVEL", "INFO")
         self.avl_api_url: str = os.environ.get(
             "AVL_API_URL",
             "https://map.stjohns.ca/mapsrv/rest/services/AVL/MapServer/0/query",
         )
         self.avl_referer: str = "https://map.stjohns.ca/avl/"
+        # "json", or "pbf": fewer bytes per poll, but about 6x slower to
+        # decode in pure Python, so JSON is the default.
+        self.avl_format: str = os.environ.get("AVL_FORMAT", "json")
         self.mt_pearl_api_url: str = os.environ.get(
             "MT_PEARL_API_URL",
             "https://gps5.aatracking.com/api/MtPearlPortal/GetPlows",
@@ -0,0 +1,150 @@
+# src/where_the_plow/coverage_format.py
+"""Compact encodings of /coverage trails.
+
+GeoJSON sends each point as a `[lng, lat]` array of full-precision
+floats plus a parallel ISO 8601 timestamp string, 60-odd bytes a point.
+Two alternatives can be requested with `?format=` or `Accept`:
+
+polyline (application/json): one object per trail whose `line` is the
+coordinates as an encoded polyline (the Google Maps algorithm) at
+`precision` decimal digits, and whose `times` uses the same encoding for
+epoch seconds: the first value is the offset from the collection's `t0`,
+each following value the delta from the previous point.
+
+binary (application/x-plow-coverage): columns ready to be viewed as
+typed arrays, all little-endian and 4-byte aligned:
+
+    magic     4 bytes  b"PLWC"
+    header    6 x u32  version, precision, t0 (epoch seconds),
+                       trails, points, meta_bytes
+    counts    i32[trails]  points per trail
+    lng, lat  i32[points]  round(degrees * 10**precision)
+    time      i32[points]  epoch seconds - t0
+    meta      meta_bytes of UTF-8 JSON, one [vehicle_id, description,
+              vehicle_type, city] list per trail, padded with spaces
+
+Timestamps are whole seconds in both, which is what the feeds report.
+"""
+
+import json
+import struct
+import sys
+from array import array
+
+GEOJSON = "geojson"
+POLYLINE = "polyline"
+BINARY = "binary"
+FORMATS = (GEOJSON, POLYLINE, BINARY)
+MEDIA_TYPES = {
+    GEOJSON: "application/json",
+    POLYLINE: "application/json",
+    BINARY: "application/x-plow-coverage",
+}
+DEFAULT_PRECISION = 5  # ~1 m
+# 180 * 10**7 is the largest scaled coordinate that fits in an i32.
+MAX_PRECISION = 7
+
+MAGIC = b"PLWC"
+VERSION = 1
+_HEADER = struct.Struct("<4s6I")
+
+
+def negotiate(format: str | None, accept: str) -> str:
+    """Pick the encoding from ?format=, else the Accept header."""
+    if format:
+        return format
+    if "application/x-plow-coverage" in accept:
+        return BINARY
+    return GEOJSON
+
+
+def _seconds(trail: dict) -> list[int]:
+    return [t // 1_000_000 for t in trail["times_us"]]
+
+
+def _t0(trails: list[dict]) -> int:
+    return min((t["times_us"][0] for t in trails), default=0) // 1_000_000
+
+
+def _encode_value(delta: int, out: list[str]):
+    """Append one signed value in encoded-polyline form."""
+    delta = ~(delta << 1) if delta < 0 else delta << 1
+    while delta >= 0x20:
+        out.append(chr((0x20 | (delta & 0x1F)) + 63))
+        delta >>= 5
+    out.append(chr(delta + 63))
+
+
+def encode_polyline(trails: list[dict], precision: int = DEFAULT_PRECISION) -> bytes:
+    scale = 10**precision
+    t0 = _t0(trails)
+    features = []
+    for t in trails:
+        line: list[str] = []
+        prev_lat = prev_lng = 0
+        for lng, lat in t["coordinates"]:
+            lat = round(lat * scale)
+            lng = round(lng * scale)
+            _encode_value(lat - prev_lat, line)
+            _encode_value(lng - prev_lng, line)
+            prev_lat, prev_lng = lat, lng
+        times: list[str] = []
+        prev = t0
+        for ts in _seconds(t):
+            _encode_value(ts - prev, times)
+            prev = ts
+        features.append(
+            {
+                "vehicle_id": t["vehicle_id"],
+                "description": t["description"],
+                "vehicle_type": t["vehicle_type"],
+                "city": t.get("city", "st_johns"),
+                "line": "".join(line),
+                "times": "".join(times),
+            }
+        )
+    body = {
+        "type": "CoverageTrails",
+        "precision": precision,
+        "t0": t0,
+        "trails": features,
+    }
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+def _column(values: list[int]) -> bytes:
+    column = array("i", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def encode_binary(trails: list[dict], precision: int = DEFAULT_PRECISION) -> bytes:
+    scale = 10**precision
+    t0 = _t0(trails)
+    counts = []
+    lngs: list[int] = []
+    lats: list[int] = []
+    times: list[int] = []
+    meta = []
+    for t in trails:
+        coords = t["coordinates"]
+        counts.append(len(coords))
+        lngs.extend([round(c[0] * scale) for c in coords])
+        lats.extend([round(c[1] * scale) for c in coords])
+        times.extend([s - t0 for s in _seconds(t)])
+        meta.append(
+            [
+                t["vehicle_id"],
+                t["description"],
+                t["vehicle_type"],
+                t.get("city", "st_johns"),
+            ]
+        )
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+    meta_bytes += b" " * (-len(meta_bytes) % 4)
+    header = _HEADER.pack(
+        MAGIC, VERSION, precision, t0, len(counts), len(lngs), len(meta_bytes)
+    )
+    columns = [_column(counts), _column(lngs), _column(lats), _column(times)]
+    return b"".join([header, *columns, meta_bytes])
@@ -1,16 +1,77 @@
 # src/where_the_plow/db.py
+import json
 import os
 
 import duckdb
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from itertools import groupby
 
+from where_the_plow.batch import PositionBatch
+from where_the_plow.spatial import EARTH_RADIUS_M, bounding_box
+
+# JSON structure of a columnar position batch, as accepted by from_json().
+_POSITION_BATCH_TYPE = json.dumps(
+    {
+        "vehicle_id": "VARCHAR[]",
+        "epoch": "BIGINT[]",
+        "longitude": "DOUBLE[]",
+        "latitude": "DOUBLE[]",
+        "bearing": "INTEGER[]",
+        "speed": "DOUBLE[]",
+        "is_driving": "VARCHAR[]",
+        "is_driving_code": "INTEGER[]",
+    }
+)
+
+_VEHICLE_BATCH_TYPE = json.dumps(
+    {
+        "vehicle_id": "VARCHAR[]",
+        "description": "VARCHAR[]",
+        "vehicle_type": "VARCHAR[]",
+    }
+)
+
+
+def _iso_utc(column: str) -> str:
+    """SQL rendering a TIMESTAMPTZ like datetime.isoformat() in UTC.
+
+    Converting timestamps to datetime objects costs more than most
+    coverage queries themselves.
+    """
+    utc = f"timezone('UTC', {column})"
+    return f"""
+        CASE WHEN epoch_us({column}) % 1000000 = 0
+        THEN strftime({utc}, '%Y-%m-%dT%H:%M:%S')
+        ELSE strftime({utc}, '%Y-%m-%dT%H:%M:%S.%f')
+        END || '+00:00'
+    """
+
+
+def _as_utc(ts: datetime) -> datetime:
+    return ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
 
 class Database:
+    # Coverage trails break where a vehicle goes quiet for longer than
+    # COVERAGE_GAP_S and keep one point per COVERAGE_BUCKET_S.
+    COVERAGE_GAP_S = 120
+    COVERAGE_BUCKET_S = 30
+    # Coarser trail resolutions, each a multiple of the one before, so a
+    # point opening a coarse bucket also opens every finer one.
+    COVERAGE_LEVELS = (30, 120, 600, 3600)
+    # Heatmap grid cell, in degrees: about 100 m square at 47.5°N.
+    HEATMAP_CELL_LAT = 0.0009
+    HEATMAP_CELL_LNG = 0.0013
+
     def __init__(self, path: str):
         self.path = path
         os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         self.conn = duckdb.connect(path)
+        # In-memory copy of the vehicles dimension:
+        # vehicle_id -> (description, vehicle_type, city, last_seen)
+        self._vehicle_dim: dict[str, tuple[str, str, str, datetime]] = {}
+        # Each city's most recent vehicle list, for refresh_last_seen.
+        self._last_polled: dict[str, dict[str, tuple[str, str, str]]] = {}
 
     def _cursor(self) -> duckdb.DuckDBPyConnection:
         """Create a thread-local cursor for safe concurrent access."""
@@ -153,127 +214,520 @@ class Database:
                 "ALTER TABLE positions ADD COLUMN city VARCHAR NOT NULL DEFAULT 'st_johns'"
             )
 
-    def upsert_vehicles(self, vehicles: list[dict], now: datetime, city: str):
-        cur = self._cursor()
-        for v in vehicles:
+        # Latest position per (vehicle_id, city), maintained on ingest so
+        # "where is everything now" queries scale with the fleet rather
+        # than with the history in positions.
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS vehicle_latest (
+                vehicle_id    VARCHAR NOT NULL,
+                city          VARCHAR NOT NULL,
+                timestamp     TIMESTAMPTZ NOT NULL,
+                longitude     DOUBLE NOT NULL,
+                latitude      DOUBLE NOT NULL,
+                geom          GEOMETRY,
+                bearing       INTEGER,
+                speed         DOUBLE,
+                is_driving    VARCHAR,
+                segment_id    INTEGER,
+                PRIMARY KEY (vehicle_id, city)
+            )
+        """)
+        latest_cols = {
+            r[0]
+            for r in cur.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_name='vehicle_latest'"
+            ).fetchall()
+        }
+        if "segment_id" not in latest_cols:
+            cur.execute("ALTER TABLE vehicle_latest ADD COLUMN segment_id INTEGER")
+
+        # Backfill vehicle_latest from existing history
+        row = cur.execute("SELECT count(*) FROM vehicle_latest").fetchone()
+        if row[0] == 0:
+            cur.execute("""
+                INSERT INTO vehicle_latest
+                SELECT vehicle_id, city, timestamp, longitude, latitude,
+                       ST_Point(longitude, latitude), bearing, speed, is_driving,
+                       NULL
+                FROM positions
+                QUALIFY ROW_NUMBER() OVER (
+                    PARTITION BY vehicle_id, city ORDER BY timestamp DESC
+                ) = 1
+            """)
+
+        # Coverage rollup: positions already split into segments at gaps
+        # and downsampled to the first point per time bucket, appended on
+        # ingest.  Rows arrive roughly in time order, so DuckDB's zone
+        # maps prune time-range scans without an index.  Rows are never
+        # updated or deleted; seq increases with every append.  level is
+        # the coarsest of COVERAGE_LEVELS whose bucket the row opens, so
+        # the trail at resolution R is the rows with level >= R.
+        cur.execute("""
+            CREATE SEQUENCE IF NOT EXISTS coverage_points_seq
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS coverage_points (
+                vehicle_id    VARCHAR NOT NULL,
+                city          VARCHAR NOT NULL,
+                segment_id    INTEGER NOT NULL,
+                timestamp     TIMESTAMPTZ NOT NULL,
+                longitude     DOUBLE NOT NULL,
+                latitude      DOUBLE NOT NULL,
+                seq           BIGINT DEFAULT nextval('coverage_points_seq'),
+                level         SMALLINT DEFAULT 30
+            )
+        """)
+        cov_cols = {
+            r[0]
+            for r in cur.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_name='coverage_points'"
+            ).fetchall()
+        }
+        if "seq" not in cov_cols:
             cur.execute(
-                """
-                INSERT INTO vehicles (vehicle_id, description, vehicle_type, first_seen, last_seen, city)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT (vehicle_id) DO UPDATE SET
-                    description = EXCLUDED.description,
-                    vehicle_type = EXCLUDED.vehicle_type,
-                    last_seen = EXCLUDED.last_seen,
-                    city = EXCLUDED.city
-            """,
-                [v["vehicle_id"], v["description"], v["vehicle_type"], now, now, city],
+                "ALTER TABLE coverage_points "
+                "ADD COLUMN seq BIGINT DEFAULT nextval('coverage_points_seq')"
+            )
+        set_levels = "level" not in cov_cols
+        if set_levels:
+            cur.execute(
+                "ALTER TABLE coverage_points ADD COLUMN level SMALLINT DEFAULT 30"
+            )
+
+        # Backfill coverage_points from existing history
+        row = cur.execute("SELECT count(*) FROM coverage_points").fetchone()
+        if row[0] == 0:
+            cur.execute(f"""
+                INSERT INTO coverage_points
+                    (vehicle_id, city, segment_id, timestamp, longitude, latitude)
+                SELECT vehicle_id, city, segment_id, timestamp, longitude, latitude
+                FROM (
+                    SELECT *,
+                        SUM(CASE WHEN gap_s IS NULL OR gap_s > {self.COVERAGE_GAP_S}
+                            THEN 1 ELSE 0 END)
+                            OVER (PARTITION BY vehicle_id, city ORDER BY timestamp)
+                            AS segment_id
+                    FROM (
+                        SELECT vehicle_id, city, timestamp, longitude, latitude,
+                            EPOCH(timestamp - LAG(timestamp) OVER (
+                                PARTITION BY vehicle_id, city ORDER BY timestamp
+                            )) AS gap_s
+                        FROM positions
+                    )
+                )
+                QUALIFY ROW_NUMBER() OVER (
+                    PARTITION BY vehicle_id, city, segment_id,
+                        time_bucket(
+                            INTERVAL '{self.COVERAGE_BUCKET_S} seconds', timestamp
+                        )
+                    ORDER BY timestamp
+                ) = 1
+                ORDER BY timestamp
+            """)
+            cur.execute("""
+                UPDATE vehicle_latest SET segment_id = c.segment_id
+                FROM (
+                    SELECT vehicle_id, city, max(segment_id) AS segment_id
+                    FROM coverage_points
+                    GROUP BY vehicle_id, city
+                ) c
+                WHERE vehicle_latest.vehicle_id = c.vehicle_id
+                AND vehicle_latest.city = c.city
+            """)
+            set_levels = True
+        if set_levels:
+            level = self._coverage_level_sql("timestamp", "prev_ts", "prev_ts IS NULL")
+            cur.execute(f"""
+                UPDATE coverage_points SET level = l.level
+                FROM (
+                    SELECT seq, {level} AS level
+                    FROM (
+                        SELECT seq, timestamp, LAG(timestamp) OVER (
+                            PARTITION BY vehicle_id, city, segment_id
+                            ORDER BY timestamp
+                        ) AS prev_ts
+                        FROM coverage_points
+                    )
+                ) l
+                WHERE coverage_points.seq = l.seq
+                AND l.level > {self.COVERAGE_BUCKET_S}
+            """)
+
+        # Heatmap rollup: coverage points counted per grid cell and hour,
+        # upserted on ingest, so a long-range heatmap aggregates cells
+        # instead of scanning points.
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS heatmap_cells (
+                city          VARCHAR NOT NULL,
+                hour          TIMESTAMPTZ NOT NULL,
+                cell_x        INTEGER NOT NULL,
+                cell_y        INTEGER NOT NULL,
+                points        INTEGER NOT NULL,
+                last_seen     TIMESTAMPTZ NOT NULL,
+                PRIMARY KEY (city, hour, cell_x, cell_y)
             )
+        """)
+        row = cur.execute("SELECT count(*) FROM heatmap_cells").fetchone()
+        if row[0] == 0:
+            cur.execute(f"""
+                INSERT INTO heatmap_cells
+                {self._heatmap_cells_sql("coverage_points", "city")}
+            """)
+
+        self._vehicle_dim = {
+            r[0]: (r[1], r[2], r[3], r[4])
+            for r in cur.execute(
+                "SELECT vehicle_id, description, vehicle_type, city, last_seen FROM vehicles"
+            ).fetchall()
+        }
+
+    def _coverage_level_sql(self, ts: str, prev_ts: str, new_segment: str) -> str:
+        """SQL for the coarsest COVERAGE_LEVELS bucket `ts` opens.
+
+        A point opens a bucket when it starts a segment or falls in a
+        different bucket from the point before it.
+        """
+        cases = "".join(
+            f"""
+            WHEN {new_segment}
+                OR time_bucket(INTERVAL '{level} seconds', {ts})
+                    <> time_bucket(INTERVAL '{level} seconds', {prev_ts})
+            THEN {level}"""
+            for level in reversed(self.COVERAGE_LEVELS[1:])
+        )
+        return f"CASE {cases} ELSE {self.COVERAGE_LEVELS[0]} END"
+
+    def _heatmap_cells_sql(self, source: str, city: str, where: str = "") -> str:
+        """SELECT rows of `source` binned into heatmap_cells rows."""
+        return f"""
+            SELECT {city}, date_trunc('hour', timestamp) AS hour,
+                   floor(longitude / {self.HEATMAP_CELL_LNG})::INTEGER AS cell_x,
+                   floor(latitude / {self.HEATMAP_CELL_LAT})::INTEGER AS cell_y,
+                   count(*) AS points, max(timestamp) AS last_seen
+            FROM {source}
+            {where}
+            GROUP BY ALL
+        """
+
+    def upsert_vehicles(self, vehicles: list[dict], now: datetime, city: str) -> int:
+        """Upsert a poll's vehicle list, writing only what actually changed.
+
+        New vehicles and vehicles whose description, type or city changed are
+        written in one set-based INSERT ... ON CONFLICT.  For the rest only
+        last_seen is refreshed, for all of them in one batched UPDATE.
+        Returns the number of rows written.
+        """
+        polled = {
+            v["vehicle_id"]: (v["description"], v["vehicle_type"], city)
+            for v in vehicles
+        }
+        return self._upsert_polled_vehicles(polled, now, city)
+
+    def upsert_vehicle_batch(
+        self, batch: PositionBatch, now: datetime, city: str
+    ) -> int:
+        """Columnar variant of upsert_vehicles."""
+        polled = {
+            vid: (desc, vtype, city)
+            for vid, desc, vtype in zip(
+                batch.vehicle_id,
+                batch.description,
+                (batch.vehicle_type.values[c] for c in batch.vehicle_type.codes),
+            )
+        }
+        return self._upsert_polled_vehicles(polled, now, city)
+
+    def refresh_last_seen(self, now: datetime, city: str) -> int:
+        """Advance last_seen for the vehicles in a city's previous poll.
+
+        For polls whose payload was unchanged and so never parsed: the
+        vehicles are still being reported, so they are still seen.  Costs
+        one batched UPDATE.  Returns the number of rows written.
+        """
+        polled = self._last_polled.get(city)
+        if not polled:
+            return 0
+        return self._upsert_polled_vehicles(polled, now, city)
+
+    def _upsert_polled_vehicles(
+        self, polled: dict[str, tuple[str, str, str]], now: datetime, city: str
+    ) -> int:
+        self._last_polled[city] = polled
+        changed = []
+        stale = []
+        for vid, attrs in polled.items():
+            known = self._vehicle_dim.get(vid)
+            if known is None or known[:3] != attrs:
+                changed.append(vid)
+            elif now > known[3]:
+                stale.append(vid)
+        if not changed and not stale:
+            return 0
+
+        cur = self._cursor()
+        cur.begin()
+        try:
+            if changed:
+                batch = json.dumps(
+                    {
+                        "vehicle_id": changed,
+                        "description": [polled[vid][0] for vid in changed],
+                        "vehicle_type": [polled[vid][1] for vid in changed],
+                    }
+                )
+                cur.execute(
+                    f"""
+                    INSERT INTO vehicles (vehicle_id, description, vehicle_type, first_seen, last_seen, city)
+                    SELECT vehicle_id, description, vehicle_type, $2, $2, $3
+                    FROM (
+                        SELECT unnest(b.vehicle_id) AS vehicle_id,
+                               unnest(b.description) AS description,
+                               unnest(b.vehicle_type) AS vehicle_type
+                        FROM (SELECT from_json($1, '{_VEHICLE_BATCH_TYPE}') AS b)
+                    )
+                    ON CONFLICT (vehicle_id) DO UPDATE SET
+                        description = EXCLUDED.description,
+                        vehicle_type = EXCLUDED.vehicle_type,
+                        last_seen = EXCLUDED.last_seen,
+                        city = EXCLUDED.city
+                """,
+                    [batch, now, city],
+                )
+            if stale:
+                cur.execute(
+                    """
+                    UPDATE vehicles SET last_seen = $2
+                    WHERE vehicle_id IN (SELECT unnest(from_json($1, '["VARCHAR"]')))
+                """,
+                    [json.dumps(stale), now],
+                )
+            cur.commit()
+        except Exception:
+            cur.rollback()
+            raise
+
+        for vid in changed + stale:
+            self._vehicle_dim[vid] = (*polled[vid], now)
+        return len(changed) + len(stale)
 
     def insert_positions(
         self, positions: list[dict], collected_at: datetime, city: str
     ) -> int:
+        """Bulk-insert position dicts. See insert_position_batch."""
         if not positions:
             return 0
+        return self.insert_position_batch(
+            PositionBatch.from_positions(positions), collected_at, city
+        )
+
+    def insert_position_batch(
+        self, batch: PositionBatch, collected_at: datetime, city: str
+    ) -> int:
+        """Bulk-insert one poll's positions in a single transaction.
+
+        The batch is shipped to DuckDB as one columnar JSON document and
+        expanded with from_json/unnest, so a whole poll is one INSERT
+        regardless of fleet size.  Timestamp units/correction, missing
+        speeds and dictionary-encoded strings are resolved in SQL.  Rows
+        with NaN or infinite coordinates are dropped first, since strict
+        JSON cannot carry them.  The row count DuckDB reports for INSERT
+        OR IGNORE is the number of rows actually written, so no table
+        scans are needed to compute it.
+
+        vehicle_latest, coverage_points and heatmap_cells are updated in
+        the same transaction.  Each vehicle's newest row in vehicle_latest carries
+        its open coverage segment, so the rollup can extend or break it
+        without looking at history.  Positions older than a vehicle's
+        latest one arrive too late for the rollup and are only stored.
+        """
+        batch = batch.finite()
+        if not len(batch):
+            return 0
+        rows = f"""
+            SELECT vehicle_id,
+                   to_timestamp(0) + to_microseconds(epoch * $3 + $4) AS timestamp,
+                   longitude, latitude,
+                   ST_Point(longitude, latitude) AS geom, bearing,
+                   speed,
+                   is_driving_values[is_driving_code + 1] AS is_driving
+            FROM (
+                SELECT unnest(b.vehicle_id) AS vehicle_id,
+                       unnest(b.epoch) AS epoch,
+                       unnest(b.longitude) AS longitude,
+                       unnest(b.latitude) AS latitude,
+                       unnest(b.bearing) AS bearing,
+                       unnest(b.speed) AS speed,
+                       unnest(b.is_driving_code) AS is_driving_code,
+                       b.is_driving AS is_driving_values
+                FROM (SELECT from_json($1, '{_POSITION_BATCH_TYPE}') AS b)
+            )
+        """
+        bucket = f"INTERVAL '{self.COVERAGE_BUCKET_S} seconds'"
+        # Each row with the vehicle's previous position (from the batch or
+        # vehicle_latest), and the open coverage segment it may extend.
+        # Rows not newer than the vehicle's latest position have is_new
+        # false and only go to positions.
+        segmented = f"""
+            SELECT *,
+                   coalesce(open_segment, 0) + SUM(new_segment::INTEGER) OVER (
+                       PARTITION BY vehicle_id, is_new ORDER BY timestamp
+                   ) AS segment_id,
+                   new_segment OR time_bucket({bucket}, timestamp)
+                       <> time_bucket({bucket}, prev_ts) AS new_bucket,
+                   {self._coverage_level_sql("timestamp", "prev_ts", "new_segment")}
+                       AS level
+            FROM (
+                SELECT *,
+                       prev_ts IS NULL
+                       OR EPOCH(timestamp - prev_ts) > {self.COVERAGE_GAP_S}
+                       AS new_segment
+                FROM (
+                    SELECT r.*, l.segment_id AS open_segment,
+                           l.timestamp IS NULL OR r.timestamp > l.timestamp
+                               AS is_new,
+                           coalesce(
+                               LAG(r.timestamp) OVER (
+                                   PARTITION BY r.vehicle_id, is_new
+                                   ORDER BY r.timestamp
+                               ),
+                               l.timestamp
+                           ) AS prev_ts
+                    FROM ({rows}) r
+                    LEFT JOIN vehicle_latest l
+                        ON l.vehicle_id = r.vehicle_id AND l.city = $2
+                )
+            )
+        """
+        params = [batch.to_json(), city, batch.epoch_unit_us, batch.offset_us]
         cur = self._cursor()
-        count_before = cur.execute("SELECT count(*) FROM positions").fetchone()[0]
-        for p in positions:
+        cur.begin()
+        try:
             cur.execute(
+                f"CREATE OR REPLACE TEMP TABLE ingest_rows AS {segmented}", params
+            )
+            row = cur.execute(
                 """
                 INSERT OR IGNORE INTO positions
                     (vehicle_id, timestamp, collected_at, longitude, latitude, geom, bearing, speed, is_driving, city)
-                VALUES (?, ?, ?, ?, ?, ST_Point(?, ?), ?, ?, ?, ?)
+                SELECT vehicle_id, timestamp, $1, longitude, latitude, geom,
+                       bearing, speed, is_driving, $2
+                FROM ingest_rows
+            """,
+                [collected_at, city],
+            ).fetchone()
+            cur.execute(
+                """
+                INSERT INTO coverage_points
+                    (vehicle_id, city, segment_id, timestamp, longitude, latitude,
+                     level)
+                SELECT vehicle_id, $1, segment_id, timestamp, longitude, latitude,
+                       level
+                FROM ingest_rows
+                WHERE is_new AND new_bucket
+                ORDER BY timestamp
             """,
-                [
-                    p["vehicle_id"],
-                    p["timestamp"],
-                    collected_at,
-                    p["longitude"],
-                    p["latitude"],
-                    p["longitude"],
-                    p["latitude"],
-                    p["bearing"],
-                    p["speed"],
-                    p["is_driving"],
-                    city,
-                ],
+                [city],
             )
-        count_after = cur.execute("SELECT count(*) FROM positions").fetchone()[0]
-        return count_after - count_before
+            cells = self._heatmap_cells_sql(
+                "ingest_rows", "$1::VARCHAR", "WHERE is_new AND new_bucket"
+            )
+            cur.execute(
+                f"""
+                INSERT INTO heatmap_cells {cells}
+                ON CONFLICT (city, hour, cell_x, cell_y) DO UPDATE SET
+                    points = points + excluded.points,
+                    last_seen = greatest(last_seen, excluded.last_seen)
+            """,
+                [city],
+            )
+            cur.execute(
+                """
+                INSERT INTO vehicle_latest
+                SELECT vehicle_id, $1, timestamp, longitude, latitude, geom,
+                       bearing, speed, is_driving, segment_id
+                FROM ingest_rows
+                WHERE is_new
+                QUALIFY ROW_NUMBER() OVER (
+                    PARTITION BY vehicle_id ORDER BY timestamp DESC
+                ) = 1
+                ON CONFLICT (vehicle_id, city) DO UPDATE SET
+                    timestamp = excluded.timestamp,
+                    longitude = excluded.longitude,
+                    latitude = excluded.latitude,
+                    geom = excluded.geom,
+                    bearing = excluded.bearing,
+                    speed = excluded.speed,
+                    is_driving = excluded.is_driving,
+                    segment_id = excluded.segment_id
+            """,
+                [city],
+            )
+            cur.commit()
+        except Exception:
+            cur.rollback()
+            raise
+        return row[0] if row else 0
+
+    def get_last_timestamps(self) -> dict[tuple[str, str], int]:
+        """Get the newest stored position timestamp per (vehicle_id, city).
+
+        Timestamps are returned as microseconds since the Unix epoch.
+        """
+        rows = (
+            self._cursor()
+            .execute("SELECT vehicle_id, city, epoch_us(timestamp) FROM vehicle_latest")
+            .fetchall()
+        )
+        return {(r[0], r[1]): r[2] for r in rows}
 
     def get_latest_positions(
         self, limit: int = 200, after: datetime | None = None, city: str | None = None
     ) -> list[dict]:
         """Get the latest position for each vehicle."""
-        city_filter = "AND city = $3" if city else ""
-        query = f"""
-            WITH ranked AS (
-                SELECT p.vehicle_id, p.timestamp, p.longitude, p.latitude,
-                       p.bearing, p.speed, p.is_driving,
-                       v.description, v.vehicle_type, v.city,
-                       ROW_NUMBER() OVER (PARTITION BY p.vehicle_id ORDER BY p.timestamp DESC) as rn
-                FROM positions p
-                JOIN vehicles v ON p.vehicle_id = v.vehicle_id
-            )
-            SELECT vehicle_id, timestamp, longitude, latitude, bearing, speed,
-                   is_driving, description, vehicle_type, city
-            FROM ranked
-            WHERE rn = 1
-            AND ($1 IS NULL OR timestamp > $1)
-            {city_filter}
-            ORDER BY timestamp ASC
+        query = """
+            SELECT l.vehicle_id, l.timestamp, l.longitude, l.latitude,
+                   l.bearing, l.speed, l.is_driving,
+                   v.description, v.vehicle_type, v.city
+            FROM vehicle_latest l
+            JOIN vehicles v ON l.vehicle_id = v.vehicle_id
+            WHERE ($3 IS NULL OR v.city = $3)
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY l.vehicle_id ORDER BY l.timestamp DESC) = 1
+            AND ($1 IS NULL OR l.timestamp > $1)
+            ORDER BY l.timestamp ASC
             LIMIT $2
         """
-        params = [after, limit]
-        if city:
-            params.append(city)
-        rows = self._cursor().execute(query, params).fetchall()
+        rows = self._cursor().execute(query, [after, limit, city]).fetchall()
         return [self._row_to_dict(r) for r in rows]
 
-    def get_latest_positions_with_trails(
-        self, trail_points: int = 6, max_gap_s: int = 120, city: str | None = None
-    ) -> list[dict]:
-        """Get the latest position for each vehicle plus a mini-trail of recent coords.
+    def get_recent_positions(self, points: int) -> list[dict]:
+        """Get the last `points` positions of every vehicle, oldest first.
 
-        Positions separated by more than max_gap_s seconds are treated as a
-        discontinuity — the trail is truncated to only the contiguous segment
-        ending at the most recent position.
+        Timestamps are returned as epoch microseconds under "timestamp_us".
+        Used once at startup to seed the in-memory trail buffer.
         """
-        city_filter = "AND city = $2" if city else ""
-        query = f"""
+        query = """
             WITH ranked AS (
-                SELECT p.vehicle_id, p.timestamp, p.longitude, p.latitude,
-                       p.bearing, p.speed, p.is_driving,
+                SELECT p.vehicle_id, epoch_us(p.timestamp) AS ts, p.longitude,
+                       p.latitude, p.bearing, p.speed, p.is_driving,
                        v.description, v.vehicle_type, v.city,
                        ROW_NUMBER() OVER (PARTITION BY p.vehicle_id ORDER BY p.timestamp DESC) as rn
                 FROM positions p
                 JOIN vehicles v ON p.vehicle_id = v.vehicle_id
             )
-            SELECT vehicle_id, timestamp, longitude, latitude, bearing, speed,
+            SELECT vehicle_id, ts, longitude, latitude, bearing, speed,
                    is_driving, description, vehicle_type, city
             FROM ranked
             WHERE rn <= $1
-            {city_filter}
-            ORDER BY vehicle_id, timestamp ASC
+            ORDER BY vehicle_id, ts ASC
         """
-        params = [trail_points, city] if city else [trail_points]
-        rows = self._cursor().execute(query, params).fetchall()
-        all_dicts = [self._row_to_dict(r) for r in rows]
-
+        rows = self._cursor().execute(query, [points]).fetchall()
         results = []
-        for _, group in groupby(all_dicts, key=lambda r: r["vehicle_id"]):
-            points = list(group)
-            start = len(points) - 1
-            for i in range(len(points) - 1, 0, -1):
-                gap = (
-                    points[i]["timestamp"] - points[i - 1]["timestamp"]
-                ).total_seconds()
-                if gap > max_gap_s:
-                    break
-                start = i - 1
-            contiguous = points[start:]
-            current = contiguous[-1]
-            current["trail"] = [[p["longitude"], p["latitude"]] for p in contiguous]
-            results.append(current)
+        for r in rows:
+            row = self._row_to_dict(r)
+            row["timestamp_us"] = row.pop("timestamp")
+            results.append(row)
         return results
 
     def get_nearby_vehicles(
@@ -285,33 +739,47 @@ class Database:
         after: datetime | None = None,
         city: str | None = None,
     ) -> list[dict]:
-        """Get latest vehicle positions within radius_m meters of (lat, lng)."""
-        radius_deg = radius_m / 111320.0
-        city_filter = "AND city = $5" if city else ""
-        query = f"""
-            WITH ranked AS (
-                SELECT p.vehicle_id, p.timestamp, p.longitude, p.latitude,
-                       p.bearing, p.speed, p.is_driving, p.geom,
-                       v.description, v.vehicle_type, v.city,
-                       ROW_NUMBER() OVER (PARTITION BY p.vehicle_id ORDER BY p.timestamp DESC) as rn
-                FROM positions p
-                JOIN vehicles v ON p.vehicle_id = v.vehicle_id
+        """Get latest vehicle positions within radius_m meters of (lat, lng).
+
+        A lat/lng bounding box prunes candidates; the great-circle
+        (haversine) distance decides.
+        """
+        lat_span, lng_span = bounding_box(lat, lng, radius_m)
+        query = """
+            WITH latest AS (
+                SELECT l.vehicle_id, l.timestamp, l.longitude, l.latitude,
+                       l.bearing, l.speed, l.is_driving,
+                       v.description, v.vehicle_type, v.city
+                FROM vehicle_latest l
+                JOIN vehicles v ON l.vehicle_id = v.vehicle_id
+                WHERE ($5 IS NULL OR v.city = $5)
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY l.vehicle_id ORDER BY l.timestamp DESC) = 1
             )
             SELECT vehicle_id, timestamp, longitude, latitude, bearing, speed,
                    is_driving, description, vehicle_type, city
-            FROM ranked
-            WHERE rn = 1
-            AND ST_DWithin(geom, ST_Point($1, $2), $3)
+            FROM latest
+            WHERE latitude BETWEEN $2 - $7 AND $2 + $7
+            AND longitude BETWEEN $1 - $8 AND $1 + $8
+            AND 2 * $9 * asin(sqrt(
+                pow(sin(radians(latitude - $2) / 2), 2)
+                + cos(radians($2)) * cos(radians(latitude))
+                  * pow(sin(radians(longitude - $1) / 2), 2)
+            )) <= $3
             AND ($4 IS NULL OR timestamp > $4)
-            {city_filter}
             ORDER BY timestamp ASC
             LIMIT $6
         """
-        params = (
-            [lng, lat, radius_deg, after, city, limit]
-            if city
-            else [lng, lat, radius_deg, after, limit]
-        )
+        params = [
+            lng,
+            lat,
+            radius_m,
+            after,
+            city,
+            limit,
+            lat_span,
+            lng_span,
+            EARTH_RADIUS_M,
+        ]
         rows = self._cursor().execute(query, params).fetchall()
         return [self._row_to_dict(r) for r in rows]
 
@@ -325,8 +793,7 @@ class Database:
         city: str | None = None,
     ) -> list[dict]:
         """Get position history for a single vehicle in a time range."""
-        city_filter = "AND v.city = $5" if city else ""
-        query = f"""
+        query = """
             SELECT p.vehicle_id, p.timestamp, p.longitude, p.latitude,
                    p.bearing, p.speed, p.is_driving,
                    v.description, v.vehicle_type, v.city
@@ -336,15 +803,11 @@ class Database:
             AND p.timestamp >= $2
             AND p.timestamp <= $3
             AND ($4 IS NULL OR p.timestamp > $4)
-            {city_filter}
+            AND ($5 IS NULL OR v.city = $5)
             ORDER BY p.timestamp ASC
             LIMIT $6
         """
-        params = (
-            [vehicle_id, since, until, after, city, limit]
-            if city
-            else [vehicle_id, since, until, after, limit]
-        )
+        params = [vehicle_id, since, until, after, city, limit]
         rows = self._cursor().execute(query, params).fetchall()
         return [self._row_to_dict(r) for r in rows]
 
@@ -357,8 +820,7 @@ class Database:
         city: str | None = None,
     ) -> list[dict]:
         """Get all positions in a time range."""
-        city_filter = "AND v.city = $4" if city else ""
-        query = f"""
+        query = """
             SELECT p.vehicle_id, p.timestamp, p.longitude, p.latitude,
                    p.bearing, p.speed, p.is_driving,
                    v.description, v.vehicle_type, v.city
@@ -367,13 +829,11 @@ class Database:
             WHERE p.timestamp >= $1
             AND p.timestamp <= $2
             AND ($3 IS NULL OR p.timestamp > $3)
-            {city_filter}
+            AND ($4 IS NULL OR v.city = $4)
             ORDER BY p.timestamp ASC
             LIMIT $5
         """
-        params = (
-            [since, until, after, city, limit] if city else [since, until, after, limit]
-        )
+        params = [since, until, after, city, limit]
         rows = self._cursor().execute(query, params).fetchall()
         return [self._row_to_dict(r) for r in rows]
 
@@ -382,76 +842,188 @@ class Database:
         since: datetime,
         until: datetime,
         city: str | None = None,
+        resolution: int = COVERAGE_BUCKET_S,
     ) -> list[dict]:
         """Get per-vehicle LineString trails in a time range.
 
-        Uses SQL-side gap detection (>120s breaks a segment) and
-        time_bucket downsampling (~1 point per 30s) to minimise
-        the number of rows transferred to Python.
+        A range scan over coverage_points, which ingest keeps split into
+        segments (>COVERAGE_GAP_S breaks a segment) and downsampled to
+        ~1 point per COVERAGE_BUCKET_S, or per `resolution` seconds (one
+        of COVERAGE_LEVELS).
         """
-        city_filter = "AND v.city = $3" if city else ""
-        query = f"""
-            WITH with_gap AS (
-                SELECT
-                    p.vehicle_id,
-                    p.timestamp,
-                    p.longitude,
-                    p.latitude,
-                    v.description,
-                    v.vehicle_type,
-                    EPOCH(p.timestamp - LAG(p.timestamp) OVER (
-                        PARTITION BY p.vehicle_id ORDER BY p.timestamp
-                    )) AS gap_s
-                FROM positions p
-                JOIN vehicles v ON p.vehicle_id = v.vehicle_id
-                WHERE p.timestamp >= $1
-                AND p.timestamp <= $2
-                {city_filter}
-            ),
-            with_segment AS (
-                SELECT *,
-                    SUM(CASE WHEN gap_s IS NULL OR gap_s > 120 THEN 1 ELSE 0 END)
-                        OVER (PARTITION BY vehicle_id ORDER BY timestamp) AS segment_id
-                FROM with_gap
-            ),
-            bucketed AS (
-                SELECT *,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY vehicle_id, segment_id,
-                            time_bucket(INTERVAL '30 seconds', timestamp)
-                        ORDER BY timestamp
-                    ) AS bucket_rn
-                FROM with_segment
-            )
-            SELECT vehicle_id, segment_id, timestamp, longitude, latitude,
-                   description, vehicle_type
-            FROM bucketed
-            WHERE bucket_rn = 1
-            ORDER BY vehicle_id, segment_id, timestamp
-        """
-        params = [since, until, city] if city else [since, until]
-        rows = self._cursor().execute(query, params).fetchall()
-
+        rows = self.get_coverage_rows(since, until, city, resolution)
         trails = []
-        for (vid, seg_id), group in groupby(rows, key=lambda r: (r[0], r[1])):
+        for (vid, city, _), group in groupby(rows, key=lambda r: r[:3]):
             points = list(group)
             if len(points) < 2:
                 continue
             trails.append(
                 {
                     "vehicle_id": vid,
-                    "description": points[0][5],
-                    "vehicle_type": points[0][6],
-                    "coordinates": [[p[3], p[4]] for p in points],
-                    "timestamps": [
-                        p[2].isoformat() if isinstance(p[2], datetime) else str(p[2])
-                        for p in points
-                    ],
+                    "description": points[0][7],
+                    "vehicle_type": points[0][8],
+                    "coordinates": [[p[5], p[6]] for p in points],
+                    "timestamps": [p[4] for p in points],
+                    "times_us": [p[3] for p in points],
+                    "city": city,
                 }
             )
 
         return trails
 
+    def get_coverage_rows(
+        self,
+        since: datetime,
+        until: datetime,
+        city: str | None = None,
+        resolution: int = COVERAGE_BUCKET_S,
+    ) -> list[tuple]:
+        """Rollup rows with since <= timestamp <= until at `resolution`.
+
+        Rows are (vehicle_id, city, segment_id, timestamp_us, timestamp,
+        longitude, latitude, description, vehicle_type), ordered by segment
+        then time.
+        """
+        query = f"""
+            SELECT c.vehicle_id, c.city, c.segment_id, epoch_us(c.timestamp),
+                   {_iso_utc("c.timestamp")}, c.longitude, c.latitude,
+                   v.description, v.vehicle_type
+            FROM coverage_points c
+            JOIN vehicles v ON c.vehicle_id = v.vehicle_id
+            WHERE c.timestamp >= $1
+            AND c.timestamp <= $2
+            AND ($3 IS NULL OR c.city = $3)
+            AND c.level >= $4
+            ORDER BY c.vehicle_id, c.city, c.segment_id, c.timestamp
+        """
+        params = [since, until, city, resolution]
+        return self._cursor().execute(query, params).fetchall()
+
+    def count_coverage_levels(
+        self, since: datetime, until: datetime, city: str | None = None
+    ) -> dict[int, int]:
+        """Rollup points in a time range at each of COVERAGE_LEVELS."""
+        rows = (
+            self._cursor()
+            .execute(
+                """
+                SELECT level, count(*)
+                FROM coverage_points
+                WHERE timestamp >= $1
+                AND timestamp <= $2
+                AND ($3 IS NULL OR city = $3)
+                GROUP BY level
+            """,
+                [since, until, city],
+            )
+            .fetchall()
+        )
+        return {
+            level: sum(n for row_level, n in rows if row_level >= level)
+            for level in self.COVERAGE_LEVELS
+        }
+
+    def pick_coverage_resolution(
+        self,
+        since: datetime,
+        until: datetime,
+        budget: int,
+        city: str | None = None,
+        finest: int = COVERAGE_BUCKET_S,
+    ) -> tuple[int, int]:
+        """The finest of COVERAGE_LEVELS with at most `budget` points.
+
+        Levels finer than `finest` are skipped.  Returns the level and its
+        point count, or the coarsest level and its count when none fits,
+        so callers can tell an unsatisfiable range by count > budget.
+        Counting is one aggregate over the rollup; no rows leave DuckDB.
+        """
+        counts = self.count_coverage_levels(since, until, city)
+        levels = [level for level in self.COVERAGE_LEVELS if level >= finest]
+        for level in levels:
+            if counts[level] <= budget:
+                return level, counts[level]
+        level = self.COVERAGE_LEVELS[-1]
+        return level, counts[level]
+
+    def get_coverage_points(
+        self, since: datetime, after_seq: int = 0
+    ) -> tuple[list[tuple], int]:
+        """Rollup rows appended after `after_seq` with timestamp >= since.
+
+        Rows are shaped like get_coverage_rows.  Also returns the watermark
+        to pass as after_seq next time: rows are only appended, by the
+        single ingest writer, so nothing at or below it can appear later.
+        """
+        cur = self._cursor()
+        watermark = cur.execute(
+            "SELECT coalesce(max(seq), 0) FROM coverage_points"
+        ).fetchone()[0]
+        if watermark <= after_seq:
+            return [], after_seq
+        query = f"""
+            SELECT c.vehicle_id, c.city, c.segment_id, epoch_us(c.timestamp),
+                   {_iso_utc("c.timestamp")}, c.longitude, c.latitude,
+                   v.description, v.vehicle_type
+            FROM coverage_points c
+            JOIN vehicles v ON c.vehicle_id = v.vehicle_id
+            WHERE c.seq > $1 AND c.seq <= $2
+            AND c.timestamp >= $3
+            ORDER BY c.vehicle_id, c.city, c.segment_id, c.timestamp
+        """
+        rows = cur.execute(query, [after_seq, watermark, since]).fetchall()
+        return rows, watermark
+
+    def get_heatmap(
+        self,
+        since: datetime,
+        until: datetime,
+        city: str | None = None,
+        scale: int = 1,
+    ) -> list[tuple]:
+        """Coverage point counts per heatmap cell between since and until.
+
+        Whole hours inside the range come from heatmap_cells; the partial
+        hours at either end are binned from coverage_points the same way.
+        `scale` merges scale x scale cells into one.  Rows are (longitude,
+        latitude, points, last_seen) with the coordinates at the cell's
+        centre, ordered by cell.
+        """
+        since = _as_utc(since)
+        until = _as_utc(until)
+        hour = timedelta(hours=1)
+        first = since.replace(minute=0, second=0, microsecond=0)
+        if first < since:
+            first += hour
+        last = until.replace(minute=0, second=0, microsecond=0)
+        if last < first:
+            first = last = since
+        edges = self._heatmap_cells_sql(
+            "coverage_points",
+            "city",
+            "WHERE (timestamp >= $1 AND timestamp < $3) "
+            "OR (timestamp >= $4 AND timestamp <= $2)",
+        )
+        lng = self.HEATMAP_CELL_LNG * scale
+        lat = self.HEATMAP_CELL_LAT * scale
+        query = f"""
+            SELECT (floor(cell_x / $6) + 0.5) * {lng},
+                   (floor(cell_y / $6) + 0.5) * {lat},
+                   sum(points)::INTEGER, {_iso_utc("max(last_seen)")}
+            FROM (
+                SELECT city, cell_x, cell_y, points, last_seen
+                FROM heatmap_cells
+                WHERE hour >= $3 AND hour < $4
+                UNION ALL
+                SELECT city, cell_x, cell_y, points, last_seen FROM ({edges})
+            )
+            WHERE ($5 IS NULL OR city = $5)
+            GROUP BY floor(cell_x / $6), floor(cell_y / $6)
+            ORDER BY floor(cell_x / $6), floor(cell_y / $6)
+        """
+        cur = self._cursor()
+        return cur.execute(query, [since, until, first, last, city, scale]).fetchall()
+
     def _row_to_dict(self, row) -> dict:
         return {
             "vehicle_id": row[0],
@@ -0,0 +1,83 @@
+# src/where_the_plow/dedup.py
+"""In-memory index of the last stored report per vehicle.
+
+Most polls repeat the previous LocationDateTime for parked or
+slow-reporting vehicles.  Remembering the newest stored timestamp per
+(vehicle_id, city) lets the collector drop those repeats before they
+reach DuckDB, where they would only be rejected by the primary key.
+"""
+
+from where_the_plow.batch import PositionBatch, epoch_us
+from where_the_plow.db import Database
+
+
+class DedupIndex:
+    """Last stored timestamp per (vehicle_id, city), with hit/miss counters.
+
+    Timestamps are held as integer microseconds since the epoch.  A hit is
+    a report whose timestamp equals the last stored one and is therefore
+    dropped; a miss is a report passed on to the database.  Older,
+    out-of-order reports are passed through and left to the primary key,
+    since only the newest timestamp is tracked.
+    """
+
+    def __init__(self, latest: dict[tuple[str, str], int] | None = None):
+        self._latest: dict[tuple[str, str], int] = latest or {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_db(cls, db: Database) -> "DedupIndex":
+        return cls(db.get_last_timestamps())
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def _is_stored(self, vehicle_id: str, city: str, ts_us: int) -> bool:
+        if self._latest.get((vehicle_id, city)) == ts_us:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def _advance(self, vehicle_id: str, city: str, ts_us: int):
+        key = (vehicle_id, city)
+        last = self._latest.get(key)
+        if last is None or ts_us > last:
+            self._latest[key] = ts_us
+
+    def filter(self, positions: list[dict], city: str) -> list[dict]:
+        """Return only the positions that are not already stored."""
+        return [
+            p
+            for p in positions
+            if not self._is_stored(p["vehicle_id"], city, epoch_us(p["timestamp"]))
+        ]
+
+    def filter_batch(self, batch: PositionBatch, city: str) -> PositionBatch:
+        """Columnar variant of filter."""
+        keep = [
+            i
+            for i, vid in enumerate(batch.vehicle_id)
+            if not self._is_stored(vid, city, batch.timestamp_us(i))
+        ]
+        return batch if len(keep) == len(batch) else batch.take(keep)
+
+    def record(self, positions: list[dict], city: str):
+        """Mark positions as stored once they have been committed."""
+        for p in positions:
+            self._advance(p["vehicle_id"], city, epoch_us(p["timestamp"]))
+
+    def record_batch(self, batch: PositionBatch, city: str):
+        """Columnar variant of record."""
+        for i, vid in enumerate(batch.vehicle_id):
+            self._advance(vid, city, batch.timestamp_us(i))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "vehicles": len(self._latest),
+            "hits": self.hits,
+            "misses": self.misses,
+            "new_ratio": round(self.misses / total, 3) if total else None,
+        }
@@ -8,10 +8,11 @@ from fastapi import FastAPI
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
-from where_the_plow import collector
+from where_the_plow import cache, collector
 from where_the_plow.config import settings
 from where_the_plow.db import Database
 from where_the_plow.routes import router
+from where_the_plow.writer import IngestWriter
 
 logging.basicConfig(
     level=settings.log_level,
@@ -25,16 +26,26 @@ async def lifespan(app: FastAPI):
     db = Database(settings.db_path)
     db.init()
     app.state.db = db
-    app.state.store = {}
+    app.state.coverage_max_points = settings.coverage_max_points
+    app.state.store = {
+        "coverage": cache.LiveCoverage(),
+        "coverage_chunks": cache.CoverageChunks(),
+        "coverage_tiles": cache.MemoryLRU(cache.MAX_TILE_WINDOW_BYTES),
+    }
     logger.info("Database initialized at %s", settings.db_path)
 
-    task = asyncio.create_task(collector.run(db, app.state.store))
+    writer = IngestWriter(maxsize=settings.write_queue_size)
+    writer.start()
+    app.state.writer = writer
+
+    task = asyncio.create_task(collector.run(db, app.state.store, writer))
     yield
     task.cancel()
     try:
         await task
     except asyncio.CancelledError:
         pass
+    await writer.drain()
     db.close()
     logger.info("Shutdown complete")
 
@@ -65,4 +76,25 @@ def root():
 def health():
     db: Database = app.state.db
     stats = db.get_stats()
-    return {"status": "ok", **stats}
+    result = {"status": "ok", **stats}
+    result["writer"] = app.state.writer.stats()
+    sources = app.state.store.get("sources")
+    if sources is not None:
+        result["sources"] = {city: t.stats() for city, t in sources.items()}
+    broadcaster = app.state.store.get("broadcaster")
+    if broadcaster is not None:
+        result["push"] = broadcaster.stats()
+    dedup = app.state.store.get("dedup")
+    if dedup is not None:
+        result["dedup"] = dedup.stats()
+    result["coverage_cache"] = cache.stats()
+    live = app.state.store.get("coverage")
+    if live is not None:
+        result["coverage_cache"]["live"] = live.stats()
+    chunks = app.state.store.get("coverage_chunks")
+    if chunks is not None:
+        result["coverage_cache"]["chunks"] = chunks.stats()
+    tiles = app.state.store.get("coverage_tiles")
+    if tiles is not None:
+        result["coverage_cache"]["tiles"] = tiles.stats()
+    return result
@@ -60,6 +60,38 @@ class FeatureCollection(BaseModel):
     pagination: Pagination
 
 
+class NearestFeatureProperties(FeatureProperties):
+    distance_m: float = Field(
+        ..., description="Great-circle distance from the query point in meters"
+    )
+
+
+class NearestFeature(BaseModel):
+    type: str = Field(default="Feature")
+    geometry: PointGeometry
+    properties: NearestFeatureProperties
+
+
+class NearestFeatureCollection(BaseModel):
+    type: str = Field(default="FeatureCollection")
+    features: list[NearestFeature]
+
+
+class VehicleChanges(BaseModel):
+    version: str = Field(..., description="Snapshot version these changes lead to")
+    full: bool = Field(
+        ...,
+        description="True if since_version was too old and features holds the "
+        "full snapshot, which replaces everything the client has",
+    )
+    features: list[Feature] = Field(
+        ..., description="Vehicles added or moved since since_version"
+    )
+    removed: list[str] = Field(
+        ..., description="IDs of vehicles no longer in the snapshot"
+    )
+
+
 class LineStringGeometry(BaseModel):
     type: str = Field(default="LineString")
     coordinates: list[list[float]] = Field(
@@ -91,6 +123,28 @@ class CoverageFeature(BaseModel):
 class CoverageFeatureCollection(BaseModel):
     type: str = Field(default="FeatureCollection")
     features: list[CoverageFeature]
+    resolution_s: int = Field(
+        30, description="Seconds per trail point bucket (30, 120, 600 or 3600)"
+    )
+
+
+class HeatmapProperties(BaseModel):
+    count: int = Field(..., description="Coverage points (~1 per 30 s) in the cell")
+    last_seen: str = Field(
+        ..., description="ISO 8601 timestamp of the most recent point in the cell"
+    )
+
+
+class HeatmapFeature(BaseModel):
+    type: str = Field(default="Feature")
+    geometry: PointGeometry
+    properties: HeatmapProperties
+
+
+class HeatmapFeatureCollection(BaseModel):
+    type: str = Field(default="FeatureCollection")
+    cell_size_m: float = Field(..., description="Approximate cell edge in meters")
+    features: list[HeatmapFeature]
 
 
 class ViewportTrack(BaseModel):
@@ -0,0 +1,366 @@
+# src/where_the_plow/mvt.py
+"""Mapbox Vector Tile encoder for coverage trails.
+
+A tile has two layers built from the same trails:
+
+- "coverage": one (multi)linestring per trail, clipped to the tile plus
+  a small buffer, with vehicle_id, vehicle_type, description, city and
+  the trail's first and last epoch seconds (start, end) as properties.
+- "heatmap": one multipoint per trail with its vehicle_type.
+
+Coordinates are snapped to the tile's EXTENT x EXTENT grid and repeated
+grid cells are dropped, so the number of vertices a trail keeps shrinks
+with the zoom level.  Like pbf.py the protobuf writing is hand-rolled;
+only the handful of Tile messages needed here are produced.
+"""
+
+import math
+from itertools import groupby
+
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 22
+
+# Tile message field numbers (vector_tile.proto, version 2)
+_TILE_LAYERS = 3
+_LAYER_NAME = 1
+_LAYER_FEATURES = 2
+_LAYER_KEYS = 3
+_LAYER_VALUES = 4
+_LAYER_EXTENT = 5
+_LAYER_VERSION = 15
+_FEATURE_TAGS = 2
+_FEATURE_TYPE = 3
+_FEATURE_GEOMETRY = 4
+_VALUE_STRING = 1
+_VALUE_UINT = 5
+
+_POINT = 1
+_LINESTRING = 2
+_MOVE_TO = 1
+_LINE_TO = 2
+
+
+def _varint(n: int, out: bytearray):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _len_field(number: int, payload: bytes | bytearray, out: bytearray):
+    _varint(number << 3 | 2, out)
+    _varint(len(payload), out)
+    out += payload
+
+
+def _varint_field(number: int, value: int, out: bytearray):
+    _varint(number << 3, out)
+    _varint(value, out)
+
+
+def _packed(number: int, values: list[int], out: bytearray):
+    payload = bytearray()
+    append = payload.append
+    for v in values:
+        # Snapped geometry is mostly small deltas that fit in one byte.
+        if v < 0x80:
+            append(v)
+        else:
+            _varint(v, payload)
+    _len_field(number, payload, out)
+
+
+def _zigzag_deltas(points: list[tuple[int, int]], cx: int, cy: int) -> list[int]:
+    """Zigzag-encoded x, y deltas of points, starting from cursor (cx, cy)."""
+    xs = [cx] + [p[0] for p in points]
+    ys = [cy] + [p[1] for p in points]
+    deltas = [
+        d
+        for pair in zip(map(int.__sub__, xs[1:], xs), map(int.__sub__, ys[1:], ys))
+        for d in pair
+    ]
+    return [(d << 1) ^ (d >> 63) for d in deltas]
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+class _Layer:
+    """Collects features, interning property keys and values."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.keys: dict[str, int] = {}
+        self.values: dict[str | int, int] = {}
+        self.features: list[bytes] = []
+
+    def _tags(self, properties: dict) -> list[int]:
+        tags = []
+        for key, value in properties.items():
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            tags.append(self.values.setdefault(value, len(self.values)))
+        return tags
+
+    def add(self, geom_type: int, geometry: list[int], properties: dict):
+        out = bytearray()
+        _packed(_FEATURE_TAGS, self._tags(properties), out)
+        _varint_field(_FEATURE_TYPE, geom_type, out)
+        _packed(_FEATURE_GEOMETRY, geometry, out)
+        self.features.append(bytes(out))
+
+    def encode(self) -> bytes:
+        out = bytearray()
+        _varint_field(_LAYER_VERSION, 2, out)
+        _len_field(_LAYER_NAME, self.name.encode(), out)
+        for feature in self.features:
+            _len_field(_LAYER_FEATURES, feature, out)
+        for key in self.keys:
+            _len_field(_LAYER_KEYS, key.encode(), out)
+        for value in self.values:
+            encoded = bytearray()
+            if isinstance(value, str):
+                _len_field(_VALUE_STRING, value.encode(), encoded)
+            else:
+                _varint_field(_VALUE_UINT, value, encoded)
+            _len_field(_LAYER_VALUES, encoded, out)
+        _varint_field(_LAYER_EXTENT, EXTENT, out)
+        return bytes(out)
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """(west, south, east, north) of a tile in degrees."""
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def _world(
+    lngs: tuple[float, ...], lats: tuple[float, ...]
+) -> tuple[list[float], list[float]]:
+    """Web Mercator coordinates on the zoom-0 tile's grid, as two columns.
+
+    A zoom-z tile's own grid is this one scaled by 2**z and shifted by
+    its x, y times EXTENT, so trails are projected once per window.
+    """
+    kx = EXTENT / 360
+    ky = EXTENT / (2 * math.pi)
+    sin, atanh, rad = math.sin, math.atanh, math.radians
+    if min(lats) < -85.0511 or max(lats) > 85.0511:
+        # Clamp to the Mercator limit, where atanh(sin(lat)) is still finite.
+        lats = [max(-85.0511, min(85.0511, lat)) for lat in lats]
+    return [(lng + 180) * kx for lng in lngs], [
+        EXTENT / 2 - atanh(sin(rad(lat))) * ky for lat in lats
+    ]
+
+
+def _clip_segment(
+    ax: float, ay: float, bx: float, by: float, lo: float, hi: float
+) -> tuple[float, float, float, float] | None:
+    """Liang-Barsky clip of segment a-b to the square [lo, hi]^2."""
+    t0, t1 = 0.0, 1.0
+    dx, dy = bx - ax, by - ay
+    for p, q in ((-dx, ax - lo), (dx, hi - ax), (-dy, ay - lo), (dy, hi - ay)):
+        if p == 0:
+            if q < 0:
+                return None
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return None
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return None
+                t1 = min(t1, t)
+    return ax + t0 * dx, ay + t0 * dy, ax + t1 * dx, ay + t1 * dy
+
+
+def clip_line(
+    points: list[tuple[float, float]],
+    lo: float = -BUFFER,
+    hi: float = EXTENT + BUFFER,
+) -> list[list[tuple[int, int]]]:
+    """Clip a projected line to the buffered tile and snap it to the grid.
+
+    Returns the parts that stay inside, each with at least two distinct
+    grid points and no consecutive repeats.
+    """
+    parts: list[list[tuple[int, int]]] = []
+    part: list[tuple[int, int]] = []
+    for i in range(len(points) - 1):
+        (ax, ay), (bx, by) = points[i], points[i + 1]
+        clipped = _clip_segment(ax, ay, bx, by, lo, hi)
+        if clipped is None:
+            continue
+        end = (round(clipped[2]), round(clipped[3]))
+        if not part:
+            part.append((round(clipped[0]), round(clipped[1])))
+        if end != part[-1]:
+            part.append(end)
+        if not (lo <= bx <= hi and lo <= by <= hi):
+            # Left the tile; a later segment may come back in.
+            if len(part) > 1:
+                parts.append(part)
+            part = []
+    if len(part) > 1:
+        parts.append(part)
+    return parts
+
+
+def _line_geometry(parts: list[list[tuple[int, int]]]) -> list[int]:
+    geometry = []
+    cx = cy = 0
+    for part in parts:
+        moves = _zigzag_deltas(part, cx, cy)
+        geometry += [_command(_MOVE_TO, 1), moves[0], moves[1]]
+        geometry.append(_command(_LINE_TO, len(part) - 1))
+        geometry += moves[2:]
+        cx, cy = part[-1]
+    return geometry
+
+
+def _point_geometry(points: list[tuple[int, int]]) -> list[int]:
+    return [_command(_MOVE_TO, len(points)), *_zigzag_deltas(points, 0, 0)]
+
+
+class TrailIndex:
+    """Trails of one window, projected and indexed for encoding its tiles.
+
+    Each trail is projected once, then cut into pieces of PIECE points
+    (neighbouring pieces share their end point) with a bounding box each.
+    A tile only projects, clips and snaps the pieces whose box reaches
+    it, so the work per tile follows what is drawn in it rather than
+    the size of the window.  Pieces are bucketed by the BUCKET_ZOOM tiles
+    their buffered box touches; a tile at that zoom or deeper only looks
+    at its bucket.  Built once per window and shared by all its tiles.
+    """
+
+    PIECE = 32
+    BUCKET_ZOOM = 12
+
+    def __init__(self, trails: list[dict], bucketed: bool = True):
+        self.trails = trails
+        self.points = 0
+        self.world: list[tuple[list[float], list[float]]] = []
+        # (trail index, first point, last point, west, north, east, south)
+        self.pieces: list[tuple[int, int, int, float, float, float, float]] = []
+        for i, t in enumerate(trails):
+            wx, wy = _world(*zip(*t["coordinates"]))
+            self.world.append((wx, wy))
+            self.points += len(wx)
+            last = len(wx) - 1
+            for start in range(0, max(last, 1), self.PIECE):
+                end = min(start + self.PIECE, last)
+                xs, ys = wx[start : end + 1], wy[start : end + 1]
+                self.pieces.append((i, start, end, min(xs), min(ys), max(xs), max(ys)))
+        self.buckets: dict[tuple[int, int], list[int]] | None = None
+        if bucketed:
+            self.buckets = {}
+            scale = 2**self.BUCKET_ZOOM / EXTENT
+            pad = BUFFER / 2**self.BUCKET_ZOOM
+            n = 2**self.BUCKET_ZOOM - 1
+            for p, (_, _, _, west, north, east, south) in enumerate(self.pieces):
+                x0 = max(0, math.floor((west - pad) * scale))
+                x1 = min(n, math.floor((east + pad) * scale))
+                y0 = max(0, math.floor((north - pad) * scale))
+                y1 = min(n, math.floor((south + pad) * scale))
+                for bx in range(x0, x1 + 1):
+                    for by in range(y0, y1 + 1):
+                        self.buckets.setdefault((bx, by), []).append(p)
+
+    @property
+    def nbytes(self) -> int:
+        """Rough memory held: the trails plus their projected columns."""
+        return 64 + self.points * 250
+
+    def encode_tile(self, z: int, x: int, y: int) -> bytes:
+        """encode_tile(trails, z, x, y) for this index's trails."""
+        if self.buckets is not None and z >= self.BUCKET_ZOOM:
+            shift = z - self.BUCKET_ZOOM
+            candidates = self.buckets.get((x >> shift, y >> shift), [])
+        else:
+            candidates = range(len(self.pieces))
+        # The buffered tile on the zoom-0 grid.
+        size = 2**z
+        west, east = (x * EXTENT - BUFFER) / size, ((x + 1) * EXTENT + BUFFER) / size
+        north, south = (y * EXTENT - BUFFER) / size, ((y + 1) * EXTENT + BUFFER) / size
+        # Runs of consecutive pieces reaching the tile, per trail in order.
+        runs: dict[int, list[list[int]]] = {}
+        for p in candidates:
+            i, start, end, p_west, p_north, p_east, p_south = self.pieces[p]
+            if p_east < west or p_west > east or p_south < north or p_north > south:
+                continue
+            trail_runs = runs.setdefault(i, [])
+            if trail_runs and trail_runs[-1][1] == start:
+                trail_runs[-1][1] = end
+            else:
+                trail_runs.append([start, end])
+
+        lines = _Layer("coverage")
+        heat = _Layer("heatmap")
+        lo, hi = -BUFFER, EXTENT + BUFFER
+        bx, by = x * EXTENT, y * EXTENT
+        for i in sorted(runs):
+            t = self.trails[i]
+            wx, wy = self.world[i]
+            parts: list[list[tuple[int, int]]] = []
+            points: dict[tuple[int, int], None] = {}
+            for start, end in runs[i]:
+                pxs = [v * size - bx for v in wx[start : end + 1]]
+                pys = [v * size - by for v in wy[start : end + 1]]
+                if (
+                    min(pxs) >= lo
+                    and max(pxs) <= hi
+                    and min(pys) >= lo
+                    and max(pys) <= hi
+                ):
+                    # Entirely inside the buffered tile: nothing to clip.
+                    snapped = list(zip(map(round, pxs), map(round, pys)))
+                    line = [point for point, _ in groupby(snapped)]
+                    if len(line) > 1:
+                        parts.append(line)
+                    points.update(dict.fromkeys(line))
+                else:
+                    parts += clip_line(list(zip(pxs, pys)), lo, hi)
+                    points.update(
+                        dict.fromkeys(
+                            (round(px), round(py))
+                            for px, py in zip(pxs, pys)
+                            if lo <= px <= hi and lo <= py <= hi
+                        )
+                    )
+            if parts:
+                lines.add(
+                    _LINESTRING,
+                    _line_geometry(parts),
+                    {
+                        "vehicle_id": t["vehicle_id"],
+                        "vehicle_type": t["vehicle_type"],
+                        "description": t["description"],
+                        "city": t.get("city", "st_johns"),
+                        "start": t["times_us"][0] // 1_000_000,
+                        "end": t["times_us"][-1] // 1_000_000,
+                    },
+                )
+            if points:
+                heat.add(
+                    _POINT,
+                    _point_geometry(list(points)),
+                    {"vehicle_type": t["vehicle_type"]},
+                )
+        out = bytearray()
+        for layer in (lines, heat):
+            if layer.features:
+                _len_field(_TILE_LAYERS, layer.encode(), out)
+        return bytes(out)
+
+
+def encode_tile(trails: list[dict], z: int, x: int, y: int) -> bytes:
+    """Encode trails shaped like Database.get_coverage_trails into a tile."""
+    return TrailIndex(trails, bucketed=False).encode_tile(z, x, y)
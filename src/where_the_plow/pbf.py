@@ -0,0 +1,265 @@
+# src/where_the_plow/pbf.py
+"""Decoder for ArcGIS `f=pbf` query responses.
+
+The MapServer query endpoint can return a FeatureCollectionPBuffer
+(esriPBuffer) instead of verbose JSON: field names are sent once, the
+attribute values are packed, and point geometry is quantised to integers
+relative to a translate/scale transform.  Only the subset of the message
+needed for point features is decoded here, with a small hand-rolled
+protobuf reader so no protobuf runtime is required.
+
+decode_feature_collection returns the same shape as the JSON response
+(`{"features": [{"attributes": {...}, "geometry": {"x", "y"}}]}`), so the
+result goes through parse_avl_batch unchanged.
+"""
+
+import math
+import struct
+
+
+class PbfDecodeError(ValueError):
+    pass
+
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LEN = 2
+_FIXED32 = 5
+
+# FeatureCollectionPBuffer field numbers, from Esri's FeatureCollection.proto
+_FC_QUERY_RESULT = 2
+_QR_FEATURE_RESULT = 1
+_FR_TRANSFORM = 12
+_FR_FIELDS = 13
+_FR_FEATURES = 15
+_FIELD_NAME = 1
+_FEATURE_ATTRIBUTES = 1
+_FEATURE_GEOMETRY = 2
+_GEOMETRY_COORDS = 3
+_TRANSFORM_ORIGIN = 1
+_TRANSFORM_SCALE = 2
+_TRANSFORM_TRANSLATE = 3
+
+# Transform.quantizeOriginPostion
+_ORIGIN_UPPER_LEFT = 0
+
+# Value oneof field number -> wire type
+_VALUE_WIRE = {
+    1: _LEN,  # string_value
+    2: _FIXED32,  # float_value
+    3: _FIXED64,  # double_value
+    4: _VARINT,  # sint_value
+    5: _VARINT,  # uint_value
+    6: _VARINT,  # int64_value
+    7: _VARINT,  # uint64_value
+    8: _VARINT,  # sint64_value
+    9: _VARINT,  # bool_value
+}
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise PbfDecodeError("truncated varint")
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise PbfDecodeError("varint too long")
+
+
+def _zigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def _fields(buf: bytes):
+    """Yield (field_number, wire_type, value) for each field in a message.
+
+    Length-delimited values are returned as bytes, varints as int and
+    fixed-width values as raw bytes.
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        number, wire = key >> 3, key & 7
+        if wire == _VARINT:
+            value, pos = _read_varint(buf, pos)
+        elif wire == _LEN:
+            length, pos = _read_varint(buf, pos)
+            if pos + length > end:
+                raise PbfDecodeError("truncated field")
+            value = buf[pos : pos + length]
+            pos += length
+        elif wire in (_FIXED64, _FIXED32):
+            size = 8 if wire == _FIXED64 else 4
+            if pos + size > end:
+                raise PbfDecodeError("truncated field")
+            value = buf[pos : pos + size]
+            pos += size
+        else:
+            raise PbfDecodeError(f"unsupported wire type {wire}")
+        yield number, wire, value
+
+
+def _packed_varints(buf: bytes) -> list[int]:
+    values = []
+    pos = 0
+    while pos < len(buf):
+        value, pos = _read_varint(buf, pos)
+        values.append(value)
+    return values
+
+
+def _decode_value(buf: bytes):
+    """Decode a FeatureCollectionPBuffer.Value oneof."""
+    for number, wire, raw in _fields(buf):
+        expected = _VALUE_WIRE.get(number)
+        if expected is None:
+            continue
+        if wire != expected:
+            raise PbfDecodeError(f"value field {number} has wire type {wire}")
+        if number == 1:  # string_value
+            return raw.decode("utf-8")
+        if number == 2:  # float_value
+            return struct.unpack("<f", raw)[0]
+        if number == 3:  # double_value
+            return struct.unpack("<d", raw)[0]
+        if number in (4, 8):  # sint_value, sint64_value
+            return _zigzag(raw)
+        if number in (5, 6, 7):  # uint_value, int64_value, uint64_value
+            if number == 6 and raw >= 1 << 63:
+                raw -= 1 << 64
+            return raw
+        if number == 9:  # bool_value
+            return bool(raw)
+    return None
+
+
+def _decode_doubles(buf: bytes) -> dict[int, float]:
+    return {
+        number: struct.unpack("<d", raw)[0]
+        for number, wire, raw in _fields(buf)
+        if wire == _FIXED64
+    }
+
+
+def _decode_transform(buf: bytes) -> tuple[int, float, float, float, float]:
+    origin = _ORIGIN_UPPER_LEFT
+    scale: dict[int, float] = {}
+    translate: dict[int, float] = {}
+    for number, wire, raw in _fields(buf):
+        if number == _TRANSFORM_ORIGIN and wire == _VARINT:
+            origin = raw
+        elif number == _TRANSFORM_SCALE and wire == _LEN:
+            scale = _decode_doubles(raw)
+        elif number == _TRANSFORM_TRANSLATE and wire == _LEN:
+            translate = _decode_doubles(raw)
+    return (
+        origin,
+        scale.get(1, 1.0),
+        scale.get(2, 1.0),
+        translate.get(1, 0.0),
+        translate.get(2, 0.0),
+    )
+
+
+def _decode_point(buf: bytes) -> tuple[int, int] | None:
+    """The first x, y of a Geometry's coords (repeated sint64)."""
+    coords: list[int] = []
+    for number, wire, raw in _fields(buf):
+        if number != _GEOMETRY_COORDS:
+            continue
+        if wire == _LEN:  # packed
+            coords.extend(_packed_varints(raw))
+        elif wire == _VARINT:
+            coords.append(raw)
+        else:
+            raise PbfDecodeError(f"geometry coords have wire type {wire}")
+    if len(coords) < 2:
+        return None
+    return _zigzag(coords[0]), _zigzag(coords[1])
+
+
+def _digits(scale: float) -> int:
+    if scale <= 0 or scale >= 1:
+        return 0
+    return min(15, math.ceil(-math.log10(scale)))
+
+
+def decode_feature_collection(data: bytes) -> dict:
+    """Decode a point FeatureCollectionPBuffer into the JSON response shape.
+
+    Raises PbfDecodeError if data is not a readable feature collection.
+    """
+    try:
+        return _decode_feature_collection(data)
+    except PbfDecodeError:
+        raise
+    except (struct.error, TypeError, IndexError, KeyError, ValueError) as e:
+        raise PbfDecodeError(str(e)) from e
+
+
+def _decode_feature_collection(data: bytes) -> dict:
+    feature_result = None
+    for number, wire, raw in _fields(data):
+        if number == _FC_QUERY_RESULT and wire == _LEN:
+            for qnumber, qwire, qraw in _fields(raw):
+                if qnumber == _QR_FEATURE_RESULT and qwire == _LEN:
+                    feature_result = qraw
+    if feature_result is None:
+        raise PbfDecodeError("no featureResult in response")
+
+    names: list[str] = []
+    raw_features: list[bytes] = []
+    transform = None
+    for number, wire, raw in _fields(feature_result):
+        if wire != _LEN:
+            continue
+        if number == _FR_FIELDS:
+            name = ""
+            for fnumber, fwire, fraw in _fields(raw):
+                if fnumber == _FIELD_NAME and fwire == _LEN:
+                    name = fraw.decode("utf-8")
+            names.append(name)
+        elif number == _FR_FEATURES:
+            raw_features.append(raw)
+        elif number == _FR_TRANSFORM:
+            transform = _decode_transform(raw)
+    origin, x_scale, y_scale, x_translate, y_translate = transform or (
+        _ORIGIN_UPPER_LEFT,
+        1.0,
+        1.0,
+        0.0,
+        0.0,
+    )
+    y_sign = -1.0 if origin == _ORIGIN_UPPER_LEFT else 1.0
+    # Round away float noise from dequantising, to the precision of the grid.
+    x_digits = _digits(x_scale)
+    y_digits = _digits(y_scale)
+
+    features = []
+    for raw in raw_features:
+        values = []
+        point = None
+        for number, wire, fraw in _fields(raw):
+            if wire != _LEN:
+                continue
+            if number == _FEATURE_ATTRIBUTES:
+                values.append(_decode_value(fraw))
+            elif number == _FEATURE_GEOMETRY:
+                point = _decode_point(fraw)
+        feature = {"attributes": dict(zip(names, values))}
+        if point is not None:
+            feature["geometry"] = {
+                "x": round(x_translate + point[0] * x_scale, x_digits),
+                "y": round(y_translate + y_sign * point[1] * y_scale, y_digits),
+            }
+        features.append(feature)
+    return {"features": features}
@@ -4,9 +4,12 @@ from collections import defaultdict
 from datetime import datetime, timezone, timedelta
 
 from fastapi import APIRouter, Query, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from where_the_plow import cache
+from where_the_plow import cache, coverage_format, mvt, simplify
+from where_the_plow.broadcast import encode_event
+from where_the_plow.snapshot import SnapshotArtifact
+from where_the_plow.spatial import VehicleIndex
 
 
 # ── Generic in-memory rate limiter ────────────────────
@@ -47,11 +50,18 @@ from where_the_plow.models import (
     Feature,
     FeatureCollection,
     FeatureProperties,
+    HeatmapFeature,
+    HeatmapFeatureCollection,
+    HeatmapProperties,
     LineStringGeometry,
+    NearestFeature,
+    NearestFeatureCollection,
+    NearestFeatureProperties,
     Pagination,
     PointGeometry,
     SignupRequest,
     StatsResponse,
+    VehicleChanges,
     ViewportTrack,
 )
 from where_the_plow.config import CITY_CONFIGS
@@ -111,12 +121,63 @@ def _rows_to_feature_collection(rows: list[dict], limit: int) -> FeatureCollecti
     )
 
 
+def _accepts_gzip(request: Request) -> bool:
+    """Whether Accept-Encoding allows gzip; q=0 refuses it."""
+    qualities = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    q = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return q > 0
+
+
+def _etag_matches(request: Request, *etags: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+def _artifact_response(request: Request, artifact: SnapshotArtifact) -> Response:
+    """Serve pre-serialised snapshot bytes, gzipped if the client accepts it."""
+    use_gzip = _accepts_gzip(request)
+    etag = artifact.gzip_etag if use_gzip else artifact.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Snapshot-Version": artifact.version_id,
+    }
+    if _etag_matches(request, artifact.etag, artifact.gzip_etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(
+            artifact.gzip_body, media_type="application/json", headers=headers
+        )
+    return Response(artifact.body, media_type="application/json", headers=headers)
+
+
 @router.get(
     "/vehicles",
     response_model=FeatureCollection,
     summary="Current vehicle positions",
     description="Returns the latest known position for every vehicle as a GeoJSON "
-    "FeatureCollection with cursor-based pagination.",
+    "FeatureCollection with cursor-based pagination. Without a cursor the live "
+    "snapshot is served with an ETag; send If-None-Match to get a 304 when it "
+    "has not changed. Its version is returned in the X-Snapshot-Version header, "
+    "for use with /vehicles/changes.",
     tags=["vehicles"],
 )
 def get_vehicles(
@@ -133,27 +194,97 @@ def get_vehicles(
 ):
     store = getattr(request.app.state, "store", {})
     if after is None and "realtime" in store:
-        if city and city in store["realtime"]:
-            return JSONResponse(content=store["realtime"][city])
-        elif city is None:
-            combined = {"type": "FeatureCollection", "features": []}
-            for c in ["st_johns", "mt_pearl"]:
-                if c in store["realtime"]:
-                    combined["features"].extend(store["realtime"][c]["features"])
-            return JSONResponse(content=combined)
-        return JSONResponse(content={"type": "FeatureCollection", "features": []})
+        return _artifact_response(request, store["realtime"].get(city))
 
     db = request.app.state.db
     rows = db.get_latest_positions(limit=limit, after=after, city=city)
     return _rows_to_feature_collection(rows, limit)
 
 
+@router.get(
+    "/vehicles/changes",
+    response_model=VehicleChanges,
+    summary="Changes to current vehicle positions",
+    description="Returns only the vehicles added, moved or removed since the "
+    "given snapshot version (from X-Snapshot-Version or a previous response). "
+    "If that version is too old or from before a server restart, the full "
+    "snapshot is returned with full=true.",
+    tags=["vehicles"],
+)
+def get_vehicle_changes(
+    request: Request,
+    since_version: str = Query(
+        ..., description="Snapshot version the client currently holds"
+    ),
+    city: str | None = Query(
+        None, description="Filter by city: 'st_johns' or 'mt_pearl'"
+    ),
+):
+    store = getattr(request.app.state, "store", {})
+    if "realtime" not in store:
+        return Response(status_code=503)
+    realtime = store["realtime"]
+    since = realtime.parse_version(since_version)
+    return _artifact_response(request, realtime.changes(since, city))
+
+
+@router.get(
+    "/vehicles/stream",
+    summary="Stream of vehicle position changes",
+    description="Server-Sent Events stream. The first `changes` event holds the "
+    "full snapshot (full=true), or only the changes if since_version is given; "
+    "each later one holds the vehicles added, moved "
+    "or removed in a new snapshot version, in the same shape as "
+    "/vehicles/changes. Event ids are snapshot versions, so a reconnecting "
+    "EventSource resumes from Last-Event-ID. Clients that fall too far behind "
+    "are disconnected and should reconnect.",
+    tags=["vehicles"],
+    response_class=StreamingResponse,
+)
+async def stream_vehicles(
+    request: Request,
+    city: str | None = Query(
+        None, description="Filter by city: 'st_johns' or 'mt_pearl'"
+    ),
+    since_version: str | None = Query(
+        None,
+        description="Snapshot version the client already holds, e.g. from "
+        "X-Snapshot-Version; the first event then only holds changes",
+    ),
+):
+    store = getattr(request.app.state, "store", {})
+    if "realtime" not in store or "broadcaster" not in store:
+        return Response(status_code=503)
+    realtime, broadcaster = store["realtime"], store["broadcaster"]
+
+    since = realtime.parse_version(
+        request.headers.get("last-event-id") or since_version
+    )
+    sub = broadcaster.subscribe(city)
+    first = realtime.changes(since, city)
+
+    async def events():
+        try:
+            yield encode_event(first.version_id, first.body)
+            async for event in sub.events():
+                yield event
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     "/vehicles/nearby",
     response_model=FeatureCollection,
     summary="Nearby vehicles",
-    description="Returns current vehicle positions within a radius of a given point. "
-    "Uses DuckDB spatial ST_DWithin for fast lookups.",
+    description="Returns current vehicle positions within a radius of a given point, "
+    "by great-circle distance. Served from an in-memory spatial index of the live "
+    "snapshot.",
     tags=["vehicles"],
 )
 def get_vehicles_nearby(
@@ -171,13 +302,62 @@ def get_vehicles_nearby(
         None, description="Filter by city: 'st_johns' or 'mt_pearl'"
     ),
 ):
-    db = request.app.state.db
-    rows = db.get_nearby_vehicles(
-        lat=lat, lng=lng, radius_m=radius, limit=limit, after=after, city=city
-    )
+    store = getattr(request.app.state, "store", {})
+    if "realtime" in store:
+        rows = store["realtime"].index.nearby(
+            lat=lat, lng=lng, radius_m=radius, limit=limit, after=after, city=city
+        )
+    else:
+        db = request.app.state.db
+        rows = db.get_nearby_vehicles(
+            lat=lat, lng=lng, radius_m=radius, limit=limit, after=after, city=city
+        )
     return _rows_to_feature_collection(rows, limit)
 
 
+@router.get(
+    "/vehicles/nearest",
+    response_model=NearestFeatureCollection,
+    summary="Nearest vehicles",
+    description="Returns the k vehicles closest to a given point by great-circle "
+    "distance, nearest first, each with its distance in meters.",
+    tags=["vehicles"],
+)
+def get_vehicles_nearest(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lng: float = Query(..., ge=-180, le=180, description="Longitude"),
+    k: int = Query(5, ge=1, le=50, description="Number of vehicles"),
+    city: str | None = Query(
+        None, description="Filter by city: 'st_johns' or 'mt_pearl'"
+    ),
+):
+    store = getattr(request.app.state, "store", {})
+    if "realtime" in store:
+        index = store["realtime"].index
+    else:
+        index = VehicleIndex(request.app.state.db.get_latest_positions(limit=MAX_LIMIT))
+    features = []
+    for distance, r in index.nearest(lat, lng, k, city):
+        features.append(
+            NearestFeature(
+                geometry=PointGeometry(coordinates=[r["longitude"], r["latitude"]]),
+                properties=NearestFeatureProperties(
+                    vehicle_id=r["vehicle_id"],
+                    description=r["description"],
+                    vehicle_type=r["vehicle_type"],
+                    speed=r["speed"],
+                    bearing=r["bearing"],
+                    is_driving=r["is_driving"],
+                    timestamp=r["timestamp"].isoformat(),
+                    city=r.get("city", "st_johns"),
+                    distance_m=round(distance, 1),
+                ),
+            )
+        )
+    return NearestFeatureCollection(features=features)
+
+
 @router.get(
     "/vehicles/{vehicle_id}/history",
     response_model=FeatureCollection,
@@ -223,7 +403,17 @@ def get_vehicle_history(
     summary="Coverage trails",
     description="Returns per-vehicle LineString trails within a time range, "
     "downsampled to ~1 point per 30 seconds. Each feature includes a "
-    "parallel timestamps array for recency-based visualization.",
+    "parallel timestamps array for recency-based visualization. "
+    "format=polyline returns encoded polylines with delta-coded epoch "
+    "seconds instead, and format=binary (or Accept: "
+    "application/x-plow-coverage) a columnar typed-array layout; both "
+    "quantise coordinates to `precision` decimal digits. `tolerance` (metres) "
+    "or `zoom` drops vertices with Douglas-Peucker simplification; kept "
+    "vertices keep their timestamps. Long ranges are served from a coarser "
+    "bucket (2 min, 10 min or 1 h) so the response stays within a point "
+    "budget; the bucket used is returned in the X-Coverage-Resolution "
+    "header and, for GeoJSON, as `resolution_s`. Ranges with more points "
+    "than the budget even at 1 h get a 413.",
     tags=["coverage"],
 )
 def get_coverage(
@@ -237,21 +427,173 @@ def get_coverage(
     city: str | None = Query(
         None, description="Filter by city: 'st_johns' or 'mt_pearl'"
     ),
+    format: str | None = Query(
+        None,
+        pattern="^(geojson|polyline|binary)$",
+        description="Encoding: 'geojson' (default), 'polyline' or 'binary'",
+    ),
+    precision: int = Query(
+        coverage_format.DEFAULT_PRECISION,
+        ge=0,
+        le=coverage_format.MAX_PRECISION,
+        description="Decimal digits kept in polyline and binary coordinates",
+    ),
+    tolerance: float | None = Query(
+        None,
+        ge=0,
+        le=1000,
+        description="Simplification tolerance in metres. Default: none, or "
+        "one pixel at `zoom` when that is given.",
+    ),
+    zoom: int | None = Query(
+        None,
+        ge=0,
+        le=simplify.MAX_ZOOM,
+        description="Map zoom level to simplify for",
+    ),
+    resolution: int | None = Query(
+        None,
+        ge=1,
+        le=86400,
+        description="Bucket seconds, rounded up to 30, 120, 600 or 3600. "
+        "Default: the finest bucket within the point budget.",
+    ),
 ):
-    db = request.app.state.db
     now = datetime.now(timezone.utc)
     if since is None:
         since = now - timedelta(hours=24)
     if until is None:
         until = now
 
-    cached = cache.get(since, until)
-    if cached is not None:
-        trails = cached
-    else:
-        trails = db.get_coverage_trails(since=since, until=until, city=city)
-        cache.put(since, until, trails)
+    fmt = coverage_format.negotiate(format, request.headers.get("accept", ""))
+    encoding = fmt if fmt == coverage_format.GEOJSON else f"{fmt}:{precision}"
+    if tolerance is None and zoom is not None:
+        tolerance = round(simplify.zoom_tolerance_m(zoom), 2)
+    if tolerance:
+        encoding += f":dp{tolerance:g}"
+    resolution = _coverage_resolution(request, since, until, city, resolution)
+    if isinstance(resolution, Response):
+        return resolution
+    body = cache.get(since, until, city, resolution, encoding)
+    if body is None:
+        trails = _coverage_trails(request, since, until, city, resolution)
+        if tolerance:
+            trails = simplify.simplify_trails(trails, tolerance)
+        if fmt == coverage_format.POLYLINE:
+            body = coverage_format.encode_polyline(trails, precision)
+        elif fmt == coverage_format.BINARY:
+            body = coverage_format.encode_binary(trails, precision)
+        else:
+            body = _coverage_geojson(trails, resolution)
+        cache.put(since, until, city, resolution, body, encoding)
+    return Response(
+        body,
+        media_type=coverage_format.MEDIA_TYPES[fmt],
+        headers={"Vary": "Accept", "X-Coverage-Resolution": str(resolution)},
+    )
+
+
+def _coverage_resolution(
+    request: Request,
+    since: datetime,
+    until: datetime,
+    city: str | None,
+    finest: int | None = None,
+) -> int | Response:
+    """The coverage level to serve, or a 413 if no level fits the budget.
+
+    Counts the window's rollup rows per level before anything is
+    fetched, so an oversized range is refused without materialising it.
+    A historical window's counts never change, so its choice is kept in
+    cache.levels and a cached body is served without counting again.
+    """
+    db = request.app.state.db
+    budget = request.app.state.coverage_max_points
+    finest = finest or db.COVERAGE_BUCKET_S
+    key = (since, until, city, budget, finest)
+    cacheable = cache.is_cacheable(until)
+    picked = cache.levels.get(key) if cacheable else None
+    if picked is None:
+        picked = db.pick_coverage_resolution(since, until, budget, city, finest)
+        if cacheable:
+            cache.levels.put(key, picked, cache.LEVEL_ENTRY_BYTES)
+    resolution, points = picked
+    if points > budget:
+        return JSONResponse(
+            {
+                "detail": "Too many coverage points in this range even at "
+                f"{resolution} s resolution; request a shorter range.",
+                "points": points,
+                "max_points": budget,
+                "resolution_s": resolution,
+            },
+            status_code=413,
+        )
+    return resolution
 
+
+def _coverage_trails(
+    request: Request,
+    since: datetime,
+    until: datetime,
+    city: str | None,
+    resolution: int | None = None,
+) -> list[dict]:
+    """Trails from the live window, the hourly chunks or the database.
+
+    The live window and the chunks hold the finest level only; coarser
+    levels are a fraction of the rows and are read straight from the
+    rollup.
+    """
+    db = request.app.state.db
+    if resolution is not None and resolution != db.COVERAGE_BUCKET_S:
+        return db.get_coverage_trails(since, until, city, resolution)
+    store = getattr(request.app.state, "store", {})
+    live = store.get("coverage")
+    if live is not None and not cache.is_cacheable(until):
+        trails = live.trails(db, since, until, city)
+        if trails is not None:
+            return trails
+    if "coverage_chunks" in store:
+        return store["coverage_chunks"].trails(db, since, until, city)
+    return db.get_coverage_trails(since=since, until=until, city=city)
+
+
+def _tile_index(
+    request: Request,
+    since: datetime,
+    until: datetime,
+    city: str | None,
+    resolution: int,
+    types: list[str],
+    window: tuple,
+) -> mvt.TrailIndex:
+    """The window's trails indexed for tiling, shared by all its tiles.
+
+    Indexes of historical windows stay until evicted; windows reaching
+    into today are rebuilt once they are TILE_WINDOW_TTL seconds old.
+    """
+    store = getattr(request.app.state, "store", {})
+    windows = store.get("coverage_tiles")
+    key = (*window, resolution, tuple(types))
+    if windows is not None:
+        entry = windows.get(key)
+        if entry is not None:
+            expires, index = entry
+            if expires is None or time.monotonic() < expires:
+                return index
+    trails = _coverage_trails(request, since, until, city, resolution)
+    if types:
+        trails = [t for t in trails if t["vehicle_type"] in types]
+    index = mvt.TrailIndex(trails)
+    if windows is not None:
+        historical = window[0] is not None and cache.is_cacheable(until)
+        expires = None if historical else time.monotonic() + cache.TILE_WINDOW_TTL
+        windows.put(key, (expires, index), size=index.nbytes)
+    return index
+
+
+def _coverage_geojson(trails: list[dict], resolution: int = 30) -> bytes:
     features = [
         CoverageFeature(
             geometry=LineStringGeometry(coordinates=t["coordinates"]),
@@ -265,7 +607,125 @@ def get_coverage(
         )
         for t in trails
     ]
-    return CoverageFeatureCollection(features=features)
+    collection = CoverageFeatureCollection(features=features, resolution_s=resolution)
+    return collection.model_dump_json().encode()
+
+
+@router.get(
+    "/coverage/tiles/{z}/{x}/{y}.mvt",
+    summary="Coverage vector tile",
+    description="Coverage trails in one Mapbox Vector Tile: a 'coverage' layer "
+    "of trail lines (with start/end epoch seconds) and a 'heatmap' layer of "
+    "points, clipped to the tile and snapped to its 4096 grid. Takes the same "
+    "since/until/city filters as /coverage, plus vehicle_type.",
+    tags=["coverage"],
+    response_class=Response,
+)
+def get_coverage_tile(
+    request: Request,
+    z: int,
+    x: int,
+    y: int,
+    since: datetime | None = Query(
+        None, description="Start of time range (ISO 8601). Default: 24 hours ago."
+    ),
+    until: datetime | None = Query(
+        None, description="End of time range (ISO 8601). Default: now."
+    ),
+    city: str | None = Query(
+        None, description="Filter by city: 'st_johns' or 'mt_pearl'"
+    ),
+    vehicle_type: list[str] | None = Query(
+        None, description="Only these vehicle types (repeatable)"
+    ),
+):
+    if not 0 <= z <= mvt.MAX_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+        return Response(status_code=404)
+    # The window as requested: "the last 24 hours" is one window for all
+    # of a map's tiles even though each resolves it at a different now.
+    window = (since, until, city)
+    now = datetime.now(timezone.utc)
+    if since is None:
+        since = now - timedelta(hours=24)
+    if until is None:
+        until = now
+
+    types = sorted(set(vehicle_type or ()))
+    encoding = f"mvt:{z}/{x}/{y}:{','.join(types)}"
+    # The tile index holds the whole window's trails, so the same budget
+    # applies.
+    resolution = _coverage_resolution(request, since, until, city)
+    if isinstance(resolution, Response):
+        return resolution
+    # A map pan fetches dozens of tiles; keep them off disk.
+    body = cache.get(since, until, city, resolution, encoding, disk=False)
+    if body is None:
+        index = _tile_index(request, since, until, city, resolution, types, window)
+        body = index.encode_tile(z, x, y)
+        cache.put(since, until, city, resolution, body, encoding, disk=False)
+    historical = cache.is_cacheable(until)
+    return Response(
+        body,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={
+            "Cache-Control": "public, max-age=86400" if historical else "no-cache",
+            "X-Coverage-Resolution": str(resolution),
+        },
+    )
+
+
+@router.get(
+    "/coverage/heatmap",
+    response_model=HeatmapFeatureCollection,
+    summary="Coverage heatmap grid",
+    description="Coverage points binned into a ~100 m grid, one Point feature "
+    "per visited cell at its centre with the point count and last visit time. "
+    "Served from an hourly per-cell rollup, so long ranges stay cheap. "
+    "`cell` merges cell x cell grid squares for coarser zoom levels.",
+    tags=["coverage"],
+)
+def get_coverage_heatmap(
+    request: Request,
+    since: datetime | None = Query(
+        None, description="Start of time range (ISO 8601). Default: 24 hours ago."
+    ),
+    until: datetime | None = Query(
+        None, description="End of time range (ISO 8601). Default: now."
+    ),
+    city: str | None = Query(
+        None, description="Filter by city: 'st_johns' or 'mt_pearl'"
+    ),
+    cell: int = Query(1, ge=1, le=64, description="Grid squares per cell side"),
+):
+    db = request.app.state.db
+    now = datetime.now(timezone.utc)
+    if since is None:
+        since = now - timedelta(hours=24)
+    if until is None:
+        until = now
+
+    encoding = f"heatmap:{cell}"
+    resolution = db.COVERAGE_BUCKET_S
+    body = cache.get(since, until, city, resolution, encoding)
+    if body is None:
+        rows = db.get_heatmap(since, until, city, cell)
+        features = [
+            HeatmapFeature(
+                geometry=PointGeometry(coordinates=[lng, lat]),
+                properties=HeatmapProperties(count=count, last_seen=last_seen),
+            )
+            for lng, lat, count, last_seen in rows
+        ]
+        body = (
+            HeatmapFeatureCollection(
+                cell_size_m=round(db.HEATMAP_CELL_LAT * 111_320 * cell, 1),
+                features=features,
+            )
+            .model_dump_json()
+            .encode()
+        )
+        cache.put(since, until, city, resolution, body, encoding)
+    return Response(body, media_type="application/json")
 
 
 @router.get(
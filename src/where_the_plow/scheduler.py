@@ -0,0 +1,155 @@
+# src/where_the_plow/scheduler.py
+"""Per-source poll scheduling: adaptive intervals on a fixed-rate ticker.
+
+docs/poll_rate.py shows that vehicles report far less often than we poll,
+and outside of storms most of the fleet is parked.  Each source gets an
+AdaptiveInterval that watches whether its polls actually bring in new
+positions and adjusts how long to wait before polling it again:
+
+- a poll with new positions halves the interval (down to min_interval),
+  so active plowing is tracked at full rate within a couple of polls;
+- a poll with nothing new stretches it by 25%, but never past the
+  source's observed update period (or the time since it last changed,
+  whichever is longer) and never past max_interval;
+- a poll that reports no active vehicles at all jumps straight to
+  idle_interval, e.g. overnight or in summer.
+
+Ticker turns that interval into fixed-rate ticks on the monotonic clock,
+so the period does not drift by the time spent polling.
+"""
+
+import asyncio
+import time
+
+TIGHTEN_FACTOR = 0.5
+RELAX_FACTOR = 1.25
+# Weight of the newest sample in the running estimates.
+EWMA_ALPHA = 0.2
+
+
+class AdaptiveInterval:
+    def __init__(self, min_interval: float, max_interval: float, idle_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.idle_interval = max(idle_interval, self.max_interval)
+        self.interval = min_interval
+        # Share of polls that brought new positions.
+        self.change_rate: float | None = None
+        # Seconds between polls that brought new positions.
+        self.update_period: float | None = None
+        self._last_change: float | None = None
+        self._active: int | None = None
+
+    def observe(
+        self, new_positions: int, active_vehicles: int | None, now: float
+    ) -> float:
+        """Record the outcome of a poll made at monotonic time `now`.
+
+        active_vehicles may be None when the poll was skipped because the
+        payload was unchanged; the previous count is assumed.  Returns the
+        interval to wait before the next poll.
+        """
+        if active_vehicles is None:
+            active_vehicles = self._active
+        self._active = active_vehicles
+        changed = new_positions > 0
+        self.change_rate = _ewma(self.change_rate, 1.0 if changed else 0.0)
+        if changed:
+            if self._last_change is not None:
+                self.update_period = _ewma(self.update_period, now - self._last_change)
+            self._last_change = now
+
+        if active_vehicles == 0:
+            self.interval = self.idle_interval
+        elif changed:
+            self.interval = max(
+                self.min_interval,
+                min(self.interval, self.max_interval) * TIGHTEN_FACTOR,
+            )
+        else:
+            ceiling = self.max_interval
+            if self._last_change is not None:
+                quiet = now - self._last_change
+                ceiling = min(ceiling, max(self.update_period or 0.0, quiet))
+            self.interval = max(
+                self.min_interval, min(ceiling, self.interval * RELAX_FACTOR)
+            )
+        return self.interval
+
+    def stats(self) -> dict:
+        return {
+            "interval_s": round(self.interval, 2),
+            "change_rate": _round(self.change_rate, 3),
+            "update_period_s": _round(self.update_period, 1),
+        }
+
+
+class Ticker:
+    """Fixed-rate ticks on the monotonic clock, paced by an AdaptiveInterval.
+
+    Each tick is scheduled one interval after the previous *scheduled* tick,
+    not after the previous poll finished.  If a poll overruns one or more
+    ticks, those ticks are skipped (and counted) rather than fired back to
+    back.
+    """
+
+    def __init__(self, schedule: AdaptiveInterval):
+        self.schedule = schedule
+        self._next_tick: float | None = None
+        self.ticks = 0
+        self.skipped = 0
+        self.timeouts = 0
+        self.unchanged = 0
+        self.last_lag: float | None = None
+        self.max_lag = 0.0
+        self.last_duration: float | None = None
+
+    async def wait(self) -> float:
+        """Sleep until the next tick; return its scheduled monotonic time."""
+        now = time.monotonic()
+        if self._next_tick is None:
+            self._next_tick = now
+        else:
+            interval = self.schedule.interval
+            self._next_tick += interval
+            if self._next_tick < now:
+                missed = int((now - self._next_tick) // interval) + 1
+                self.skipped += missed
+                self._next_tick += missed * interval
+            await asyncio.sleep(self._next_tick - now)
+        lag = time.monotonic() - self._next_tick
+        self.ticks += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        return self._next_tick
+
+    def record_poll(
+        self, started: float, timed_out: bool = False, unchanged: bool = False
+    ):
+        self.last_duration = time.monotonic() - started
+        if timed_out:
+            self.timeouts += 1
+        if unchanged:
+            self.unchanged += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.schedule.stats(),
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "timeouts": self.timeouts,
+            "unchanged": self.unchanged,
+            "last_lag_s": _round(self.last_lag, 3),
+            "max_lag_s": round(self.max_lag, 3),
+            "last_duration_s": _round(self.last_duration, 3),
+        }
+
+
+def _ewma(current: float | None, sample: float) -> float:
+    if current is None:
+        return sample
+    return EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * current
+
+
+def _round(value: float | None, digits: int) -> float | None:
+    return round(value, digits) if value is not None else None
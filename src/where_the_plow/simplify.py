@@ -0,0 +1,159 @@
+# src/where_the_plow/simplify.py
+"""Douglas-Peucker simplification of coverage trails.
+
+The rollup keeps one point per 30-second bucket regardless of shape, so
+a truck idling in a lot keeps every bucket while a straight run keeps
+points a map at city zoom cannot show.  Dropping the vertices that lie
+within `tolerance_m` of the line through their neighbours fixes both.
+Distances are measured in a local equirectangular projection, which is
+well under a percent off over the few kilometres a segment spans.
+
+Kept vertices are a subset of the originals, so a simplified trail's
+timestamps and times_us are filtered with the same indices and stay
+aligned with its coordinates.
+
+Live windows bypass the coverage cache, so this runs on every such
+request: simplifying a 24-hour fleet (200 trucks, ~576k points) takes
+0.35-0.65 s depending on zoom (docs/bench_simplify.py).
+"""
+
+import math
+from itertools import chain
+
+import numpy as np
+
+from where_the_plow.spatial import EARTH_RADIUS_M
+
+_M_PER_DEG = math.pi * EARTH_RADIUS_M / 180
+# Both cities sit near 47.5°N; zoom tolerances are computed there.
+REFERENCE_LAT = 47.5
+TILE_SIZE = 256
+MAX_ZOOM = 22
+
+
+def zoom_tolerance_m(zoom: int, lat: float = REFERENCE_LAT) -> float:
+    """Width in metres of one screen pixel at a Web Mercator zoom level."""
+    circumference = 2 * math.pi * EARTH_RADIUS_M * math.cos(math.radians(lat))
+    return circumference / (TILE_SIZE * 2**zoom)
+
+
+def _simplify_ranges(
+    xs: np.ndarray, ys: np.ndarray, starts: np.ndarray, ends: np.ndarray, tol: float
+) -> np.ndarray:
+    """Douglas-Peucker over many [start, end] ranges of one point array.
+
+    Rather than recursing range by range, every open range is split in
+    the same pass: their interior points are laid end to end so the
+    distances, per-range maxima and split points are a handful of array
+    operations, and the number of passes is the depth of the recursion.
+    Returns the keep mask.
+    """
+    keep = np.zeros(len(xs), dtype=bool)
+    keep[starts] = True
+    keep[ends] = True
+    tol2 = tol * tol
+    i, j = starts, ends
+    while True:
+        open_ = j - i >= 2
+        i, j = i[open_], j[open_]
+        if not len(i):
+            return keep
+        counts = j - i - 1
+        offsets = np.cumsum(counts) - counts
+        owner = np.repeat(np.arange(len(i)), counts)
+        points = np.arange(counts.sum()) + np.repeat(i + 1 - offsets, counts)
+        ax, ay = xs[i], ys[i]
+        dx, dy = xs[j] - ax, ys[j] - ay
+        seg = dx * dx + dy * dy
+        # A zero-length range has every point on its "line"; the segment
+        # check below then measures from its end.
+        inv = np.repeat(1 / np.where(seg > 0, seg, 1), counts)
+        px = xs[points] - np.repeat(ax, counts)
+        py = ys[points] - np.repeat(ay, counts)
+        dx, dy = np.repeat(dx, counts), np.repeat(dy, counts)
+        # Squared distances throughout; only their order matters.
+        cross = px * dy - py * dx
+        dist2 = cross * cross * inv
+        best = np.maximum.reduceat(dist2, offsets)
+        # Close to the line is not enough: a trail that doubles back on
+        # itself must keep its turning point, which lies on the line but
+        # off the segment.  Only ranges about to be dropped pay for this
+        # check, and they partition the trail.
+        near = np.flatnonzero(np.repeat(best <= tol2, counts))
+        if len(near):
+            nx, ny, ndx, ndy = px[near], py[near], dx[near], dy[near]
+            t = np.clip((nx * ndx + ny * ndy) * inv[near], 0.0, 1.0)
+            dist2[near] = (nx - t * ndx) ** 2 + (ny - t * ndy) ** 2
+            best = np.maximum.reduceat(dist2, offsets)
+        # The first point at each range's maximum is where it splits.
+        hits = np.flatnonzero(dist2 == np.repeat(best, counts))
+        k = points[hits[np.diff(owner[hits], prepend=-1) != 0]]
+        split = best > tol2
+        k = k[split]
+        keep[k] = True
+        i = np.concatenate([i[split], k])
+        j = np.concatenate([k, j[split]])
+
+
+def _project(coordinates: list) -> tuple[np.ndarray, np.ndarray]:
+    """Metres east and north of the first [lng, lat] vertex."""
+    # fromiter over the flattened pairs is about twice as fast as
+    # np.asarray on the nested list.
+    flat = np.fromiter(
+        chain.from_iterable(coordinates), np.float64, 2 * len(coordinates)
+    )
+    lngs, lats = flat[0::2], flat[1::2]
+    kx = _M_PER_DEG * math.cos(math.radians(lats.mean()))
+    # Metres from the first point, keeping the cross products small.
+    return (lngs - lngs[0]) * kx, (lats - lats[0]) * _M_PER_DEG
+
+
+def simplify_indices(coordinates: list, tolerance_m: float) -> list[int]:
+    """Indices of the [lng, lat] vertices Douglas-Peucker keeps, in order."""
+    n = len(coordinates)
+    if n < 3 or tolerance_m <= 0:
+        return list(range(n))
+    xs, ys = _project(coordinates)
+    ends = np.array([0]), np.array([n - 1])
+    return np.flatnonzero(_simplify_ranges(xs, ys, *ends, tolerance_m)).tolist()
+
+
+def simplify_trails(trails: list[dict], tolerance_m: float) -> list[dict]:
+    """Trails shaped like Database.get_coverage_trails, simplified.
+
+    All trails go through one _simplify_ranges call, each its own
+    starting range, so the per-pass overhead is paid once per request
+    rather than once per truck.
+    """
+    if tolerance_m <= 0:
+        return trails
+    long = [t for t in trails if len(t["coordinates"]) >= 3]
+    if not long:
+        return trails
+    projected = [_project(t["coordinates"]) for t in long]
+    sizes = np.array([len(t["coordinates"]) for t in long])
+    ends = np.cumsum(sizes) - 1
+    starts = ends - sizes + 1
+    keep = _simplify_ranges(
+        np.concatenate([xs for xs, _ in projected]),
+        np.concatenate([ys for _, ys in projected]),
+        starts,
+        ends,
+        tolerance_m,
+    )
+    kept = {
+        id(t): np.flatnonzero(keep[a : b + 1]).tolist()
+        for t, a, b in zip(long, starts.tolist(), ends.tolist())
+    }
+    out = []
+    for t in trails:
+        indices = kept.get(id(t))
+        if indices is None or len(indices) == len(t["coordinates"]):
+            out.append(t)
+            continue
+        trail = dict(t)
+        for key in ("coordinates", "timestamps", "times_us"):
+            values = t[key]
+            trail[key] = [values[k] for k in indices]
+        out.append(trail)
+    return out
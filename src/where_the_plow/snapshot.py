@@ -1,39 +1,392 @@
 # src/where_the_plow/snapshot.py
-"""Build the cached realtime snapshot returned by /vehicles."""
+"""Build the cached realtime snapshot returned by /vehicles.
 
-from datetime import datetime
+The snapshot used to be rebuilt from DuckDB after every poll with a
+ROW_NUMBER() over the whole positions table, which grows with history.
+TrailBuffer keeps the last few positions of each vehicle in memory
+instead: it is seeded from the database once at startup and then fed
+each batch as it is ingested, so building the snapshot never touches
+DuckDB.
 
+RealtimeSnapshots turns each published snapshot into immutable response
+bytes (plain and gzip, with strong ETags) for every city and for all
+cities combined, so /vehicles can serve them without serialising.  It
+also keeps a short history of per-version deltas for /vehicles/changes
+and a spatial index for /vehicles/nearby and /vehicles/nearest.
+
+Versions count up from 0 each time the process starts, so clients are
+given version ids of the form "<epoch>.<version>", where the epoch is a
+random per-boot nonce.  A version id from before a restart never names
+a version of this run; it gets the full snapshot rather than a delta
+against an unrelated base.
+"""
+
+import gzip
+import hashlib
+import json
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from where_the_plow.batch import PositionBatch, from_epoch_us
 from where_the_plow.db import Database
+from where_the_plow.spatial import VehicleIndex
+
+TRAIL_POINTS = 6
+MAX_GAP_S = 120
+# Published versions kept for /vehicles/changes.
+DELTA_HISTORY = 100
+
+
+class _Vehicle:
+    __slots__ = ("city", "description", "points", "vehicle_type")
+
+    def __init__(self, points: int):
+        self.description = ""
+        self.vehicle_type = ""
+        self.city = "st_johns"
+        # (timestamp_us, longitude, latitude, bearing, speed, is_driving),
+        # oldest first.
+        self.points: deque[tuple] = deque(maxlen=points)
+
+
+class TrailBuffer:
+    """Ring buffer of the last `points` positions per vehicle.
+
+    Not thread-safe: record_batch and snapshot are both expected to run
+    on the ingest writer thread.
+    """
+
+    def __init__(self, points: int = TRAIL_POINTS, max_gap_s: int = MAX_GAP_S):
+        self.points = points
+        self.max_gap_us = max_gap_s * 1_000_000
+        self._vehicles: dict[str, _Vehicle] = {}
+
+    @classmethod
+    def from_db(
+        cls, db: Database, points: int = TRAIL_POINTS, max_gap_s: int = MAX_GAP_S
+    ) -> "TrailBuffer":
+        buffer = cls(points, max_gap_s)
+        for r in db.get_recent_positions(points):
+            vehicle = buffer._vehicle(r["vehicle_id"])
+            vehicle.description = r["description"]
+            vehicle.vehicle_type = r["vehicle_type"]
+            vehicle.city = r["city"]
+            vehicle.points.append(
+                (
+                    r["timestamp_us"],
+                    r["longitude"],
+                    r["latitude"],
+                    r["bearing"],
+                    r["speed"],
+                    r["is_driving"],
+                )
+            )
+        return buffer
+
+    def __len__(self) -> int:
+        return len(self._vehicles)
+
+    def _vehicle(self, vehicle_id: str) -> _Vehicle:
+        vehicle = self._vehicles.get(vehicle_id)
+        if vehicle is None:
+            vehicle = self._vehicles[vehicle_id] = _Vehicle(self.points)
+        return vehicle
+
+    def record_vehicles(self, batch: PositionBatch, city: str):
+        """Update vehicle details from every row of a poll."""
+        for i, vid in enumerate(batch.vehicle_id):
+            vehicle = self._vehicles.get(vid)
+            if vehicle is not None:
+                vehicle.description = batch.description[i]
+                vehicle.vehicle_type = batch.vehicle_type[i]
+                vehicle.city = city
+
+    def record_batch(self, batch: PositionBatch, city: str):
+        """Add newly stored positions to their vehicles' buffers."""
+        speeds = batch.speed
+        for i, vid in enumerate(batch.vehicle_id):
+            vehicle = self._vehicle(vid)
+            vehicle.description = batch.description[i]
+            vehicle.vehicle_type = batch.vehicle_type[i]
+            vehicle.city = city
+            speed = speeds[i] if speeds is not None else None
+            point = (
+                batch.timestamp_us(i),
+                batch.longitude[i],
+                batch.latitude[i],
+                batch.bearing[i],
+                None if speed is None or speed != speed else speed,
+                batch.is_driving[i],
+            )
+            _insert(vehicle.points, point)
+
+    def snapshot(self, city: str | None = None) -> dict:
+        """Latest position and mini-trail per vehicle as a FeatureCollection.
+
+        Positions separated by more than max_gap_s seconds are treated as a
+        discontinuity: the trail holds only the contiguous run ending at
+        the most recent position.
+        """
+        features = []
+        for vid in sorted(self._vehicles):
+            vehicle = self._vehicles[vid]
+            if not vehicle.points or (city and vehicle.city != city):
+                continue
+            points = vehicle.points
+            start = len(points) - 1
+            while (
+                start > 0 and points[start][0] - points[start - 1][0] <= self.max_gap_us
+            ):
+                start -= 1
+            ts_us, lon, lat, bearing, speed, is_driving = points[-1]
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                    "properties": {
+                        "vehicle_id": vid,
+                        "description": vehicle.description,
+                        "vehicle_type": vehicle.vehicle_type,
+                        "speed": speed,
+                        "bearing": bearing,
+                        "is_driving": is_driving,
+                        "timestamp": from_epoch_us(ts_us).isoformat(),
+                        "trail": [
+                            [points[i][1], points[i][2]]
+                            for i in range(start, len(points))
+                        ],
+                        "city": vehicle.city,
+                    },
+                }
+            )
+        return {
+            "type": "FeatureCollection",
+            "features": features,
+        }
+
+
+def _insert(points: deque, point: tuple):
+    """Insert point in timestamp order, ignoring repeats."""
+    if not points or point[0] > points[-1][0]:
+        points.append(point)
+        return
+    # Out-of-order report: rare, so rebuild the buffer.
+    if any(p[0] == point[0] for p in points):
+        return
+    ordered = sorted([*points, point], key=lambda p: p[0])
+    points.clear()
+    points.extend(ordered[-points.maxlen :])
 
 
 def build_realtime_snapshot(db: Database, city: str | None = None) -> dict:
-    """Query latest positions with mini-trails and return a GeoJSON FeatureCollection dict."""
-    rows = db.get_latest_positions_with_trails(trail_points=6, city=city)
-    features = []
-    for r in rows:
-        ts = r["timestamp"]
-        ts_str = ts.isoformat() if isinstance(ts, datetime) else str(ts)
-        features.append(
-            {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [r["longitude"], r["latitude"]],
-                },
-                "properties": {
-                    "vehicle_id": r["vehicle_id"],
-                    "description": r["description"],
-                    "vehicle_type": r["vehicle_type"],
-                    "speed": r["speed"],
-                    "bearing": r["bearing"],
-                    "is_driving": r["is_driving"],
-                    "timestamp": ts_str,
-                    "trail": r["trail"],
-                    "city": r.get("city", "st_johns"),
-                },
-            }
+    """Build the snapshot straight from the database, without a live buffer."""
+    return TrailBuffer.from_db(db).snapshot(city)
+
+
+@dataclass(frozen=True)
+class SnapshotArtifact:
+    """A snapshot serialised once, ready to be written to a response."""
+
+    version: int
+    epoch: str
+    etag: str
+    body: bytes
+    gzip_etag: str
+    gzip_body: bytes
+
+    @property
+    def version_id(self) -> str:
+        """The version as clients see it: X-Snapshot-Version, SSE ids."""
+        return _version_id(self.epoch, self.version)
+
+    @classmethod
+    def build(cls, snapshot: dict, version: int, epoch: str) -> "SnapshotArtifact":
+        body = json.dumps(snapshot, separators=(",", ":")).encode()
+        digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        return cls(
+            version=version,
+            epoch=epoch,
+            etag=f'"{digest}"',
+            body=body,
+            gzip_etag=f'"{digest}-gz"',
+            # mtime=0 keeps the compressed bytes stable for the same body.
+            gzip_body=gzip.compress(body, compresslevel=6, mtime=0),
         )
-    return {
-        "type": "FeatureCollection",
-        "features": features,
+
+
+def _version_id(epoch: str, version: int) -> str:
+    return f"{epoch}.{version}"
+
+
+def _empty() -> dict:
+    return {"type": "FeatureCollection", "features": []}
+
+
+class _Delta(NamedTuple):
+    version: int
+    city: str
+    # Features added or changed in this version, and vehicles that left.
+    upserted: list[dict]
+    removed: list[str]
+
+
+class _Published(NamedTuple):
+    """Everything changes() reads, swapped in as one object by publish()."""
+
+    epoch: str
+    version: int
+    # Oldest version the retained deltas can be applied on top of.
+    base_version: int
+    snapshots: dict[str, dict]
+    deltas: tuple[_Delta, ...]
+    # Serialised change sets for this version, by (since, city); every
+    # since outside the retained deltas shares the ("full", city) entry.
+    changes: dict[tuple[int | str, str | None], "SnapshotArtifact"]
+
+
+def _vehicle_id(feature: dict) -> str:
+    return feature["properties"]["vehicle_id"]
+
+
+class RealtimeSnapshots:
+    """Latest published snapshot artifacts per city and for all cities.
+
+    Every publish that changes a city's snapshot bumps `version` and
+    records which vehicles were added, moved or removed, keeping the last
+    `history` of those deltas so clients can ask for changes since the
+    version they hold.
+
+    publish() runs on the ingest writer thread; readers only ever see a
+    complete artifact because each one is swapped in with a single
+    assignment.  changes() runs on request threads, so it reads the
+    snapshots and deltas through one _Published reference that publish()
+    replaces rather than mutates.
+    """
+
+    def __init__(self, history: int = DELTA_HISTORY):
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self.history = history
+        self._published = _Published(self.epoch, 0, 0, {}, (), {})
+        self._artifacts: dict[str | None, SnapshotArtifact] = {
+            None: SnapshotArtifact.build(_empty(), 0, self.epoch)
+        }
+        self._empty = self._artifacts[None]
+        # Spatial index over all cities' current positions.
+        self.index = VehicleIndex([])
+
+    def __contains__(self, city: str) -> bool:
+        return city in self._published.snapshots
+
+    def publish(self, city: str, snapshot: dict) -> bool:
+        """Publish a city's snapshot; returns False if nothing changed."""
+        published = self._published
+        previous = published.snapshots.get(city)
+        if previous == snapshot:
+            return False
+        old = {_vehicle_id(f): f for f in previous["features"]} if previous else {}
+        upserted = [f for f in snapshot["features"] if old.get(_vehicle_id(f)) != f]
+        current = {_vehicle_id(f) for f in snapshot["features"]}
+        removed = [vid for vid in old if vid not in current]
+
+        version = self.version + 1
+        deltas = (*published.deltas, _Delta(version, city, upserted, removed))
+        base_version = published.base_version
+        if len(deltas) > self.history:
+            base_version = deltas[-self.history - 1].version
+            deltas = deltas[-self.history :]
+        snapshots = {**published.snapshots, city: snapshot}
+        self._artifacts[city] = SnapshotArtifact.build(snapshot, version, self.epoch)
+        combined = _empty()
+        for s in snapshots.values():
+            combined["features"].extend(s["features"])
+        self._artifacts[None] = SnapshotArtifact.build(combined, version, self.epoch)
+        self.index = VehicleIndex.from_features(combined["features"])
+        self._published = _Published(
+            self.epoch, version, base_version, snapshots, deltas, {}
+        )
+        self.version = version
+        # Clients polling on schedule are one version behind; have their
+        # change set ready before the first of them asks.
+        self.changes(version - 1)
+        self.changes(version - 1, city)
+        return True
+
+    def get(self, city: str | None = None) -> SnapshotArtifact:
+        """Artifact for one city, or all cities when city is None."""
+        return self._artifacts.get(city, self._empty)
+
+    @property
+    def version_id(self) -> str:
+        return _version_id(self.epoch, self.version)
+
+    def parse_version(self, version_id: str | None) -> int:
+        """The version a client's version id names, or -1 for none.
+
+        Ids from another epoch, i.e. from before a restart, and anything
+        malformed give -1, which changes() answers with a full snapshot.
+        """
+        epoch, _, version = (version_id or "").partition(".")
+        if epoch != self.epoch or not version.isdigit():
+            return -1
+        return int(version)
+
+    def changes(self, since_version: int, city: str | None = None) -> SnapshotArtifact:
+        """Features added, moved or removed since `since_version`.
+
+        If that version is no longer covered by the retained deltas (or is
+        from the future) the full snapshot is returned instead, flagged
+        with "full": true.
+        """
+        published = self._published
+        if published.base_version <= since_version <= published.version:
+            key = (since_version, city)
+        else:
+            key = ("full", city)
+        artifact = published.changes.get(key)
+        if artifact is None:
+            artifact = _build_changes(published, since_version, city)
+            published.changes[key] = artifact
+        return artifact
+
+
+def _build_changes(
+    published: _Published, since_version: int, city: str | None
+) -> SnapshotArtifact:
+    version = published.version
+    version_id = _version_id(published.epoch, version)
+    if not published.base_version <= since_version <= version:
+        snapshots = (
+            [published.snapshots.get(city, _empty())]
+            if city
+            else list(published.snapshots.values())
+        )
+        payload = {
+            "version": version_id,
+            "full": True,
+            "features": [f for s in snapshots for f in s["features"]],
+            "removed": [],
+        }
+        return SnapshotArtifact.build(payload, version, published.epoch)
+
+    upserted: dict[str, dict] = {}
+    removed: set[str] = set()
+    for delta in published.deltas:
+        if delta.version <= since_version or (city and delta.city != city):
+            continue
+        for feature in delta.upserted:
+            vid = _vehicle_id(feature)
+            upserted[vid] = feature
+            removed.discard(vid)
+        for vid in delta.removed:
+            upserted.pop(vid, None)
+            removed.add(vid)
+    payload = {
+        "version": version_id,
+        "full": False,
+        "features": list(upserted.values()),
+        "removed": sorted(removed),
     }
+    return SnapshotArtifact.build(payload, version, published.epoch)
@@ -0,0 +1,210 @@
+# src/where_the_plow/spatial.py
+"""In-memory spatial index over current vehicle positions.
+
+/vehicles/nearby used to run a DuckDB spatial scan per request and turn
+metres into degrees with a single factor, which at St. John's latitude
+(~47.5°N) makes the search area an ellipse about 1.5x wider east-west
+than asked for.  The fleet is a few hundred points that change once per
+poll, so a uniform grid rebuilt on every publish answers radius and
+k-nearest queries in microseconds, using great-circle (haversine)
+distance for the final check.
+"""
+
+import heapq
+import math
+from datetime import datetime, timezone
+
+from where_the_plow.batch import epoch_us
+
+EARTH_RADIUS_M = 6_371_008.8
+# Shortest length of one degree of latitude (at the equator), so spans
+# computed from it never undershoot.
+_MIN_M_PER_DEG_LAT = 110_574.0
+_M_PER_DEG = math.pi * EARTH_RADIUS_M / 180
+CELL_M = 500.0
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in metres between two WGS84 points."""
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+def bounding_box(lat: float, lng: float, radius_m: float) -> tuple[float, float]:
+    """Half-widths in degrees (lat, lng) of a box containing the circle."""
+    lat_span = radius_m / _MIN_M_PER_DEG_LAT
+    edge = min(89.9, abs(lat) + lat_span)
+    lng_span = min(180.0, radius_m / (_M_PER_DEG * math.cos(math.radians(edge))))
+    return lat_span, lng_span
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+class VehicleIndex:
+    """Uniform lat/lng grid of row dicts shaped like Database._row_to_dict.
+
+    Cells are about cell_m on a side at the mean latitude of the rows.
+    Immutable once built; a new index replaces the old one each poll.
+    """
+
+    def __init__(self, rows: list[dict], cell_m: float = CELL_M):
+        self.rows = rows
+        ref_lat = sum(r["latitude"] for r in rows) / len(rows) if rows else 0.0
+        self._ref_cos = math.cos(math.radians(ref_lat))
+        self.cell_lat = cell_m / _M_PER_DEG
+        self.cell_lng = cell_m / (_M_PER_DEG * self._ref_cos)
+        self.cell_m = cell_m
+        self._cells: dict[tuple[int, int], list[dict]] = {}
+        for r in rows:
+            cell = self._cell(r["latitude"], r["longitude"])
+            self._cells.setdefault(cell, []).append(r)
+        if self._cells:
+            ys = [c[0] for c in self._cells]
+            xs = [c[1] for c in self._cells]
+            self._extent = (min(ys), max(ys), min(xs), max(xs))
+
+    @classmethod
+    def from_features(cls, features: list[dict], cell_m: float = CELL_M):
+        """Build from snapshot GeoJSON features."""
+        rows = []
+        for f in features:
+            p = f["properties"]
+            lng, lat = f["geometry"]["coordinates"]
+            rows.append(
+                {
+                    "vehicle_id": p["vehicle_id"],
+                    "timestamp": datetime.fromisoformat(p["timestamp"]),
+                    "longitude": lng,
+                    "latitude": lat,
+                    "bearing": p["bearing"],
+                    "speed": p["speed"],
+                    "is_driving": p["is_driving"],
+                    "description": p["description"],
+                    "vehicle_type": p["vehicle_type"],
+                    "city": p["city"],
+                }
+            )
+        return cls(rows, cell_m)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_lat), math.floor(lng / self.cell_lng)
+
+    def within(
+        self, lat: float, lng: float, radius_m: float, city: str | None = None
+    ) -> list[tuple[float, dict]]:
+        """(distance_m, row) for every vehicle within radius_m, nearest first."""
+        lat_span, lng_span = bounding_box(lat, lng, radius_m)
+        y0, x0 = self._cell(lat - lat_span, lng - lng_span)
+        y1, x1 = self._cell(lat + lat_span, lng + lng_span)
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > len(self._cells):
+            candidates = self.rows
+        else:
+            candidates = [
+                r
+                for y in range(y0, y1 + 1)
+                for x in range(x0, x1 + 1)
+                for r in self._cells.get((y, x), ())
+            ]
+        found = []
+        for r in candidates:
+            if city and r["city"] != city:
+                continue
+            d = haversine_m(lat, lng, r["latitude"], r["longitude"])
+            if d <= radius_m:
+                found.append((d, r))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearby(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        limit: int = 200,
+        after: datetime | None = None,
+        city: str | None = None,
+    ) -> list[dict]:
+        """Same contract as Database.get_nearby_vehicles: oldest first, paged."""
+        after_us = epoch_us(_utc(after)) if after is not None else None
+        rows = [
+            r
+            for _, r in self.within(lat, lng, radius_m, city)
+            if after_us is None or epoch_us(r["timestamp"]) > after_us
+        ]
+        rows.sort(key=lambda r: r["timestamp"])
+        return rows[:limit]
+
+    def nearest(
+        self, lat: float, lng: float, k: int, city: str | None = None
+    ) -> list[tuple[float, dict]]:
+        """(distance_m, row) for the k nearest vehicles, nearest first.
+
+        Searches rings of cells outward from the query's cell and stops
+        once no unvisited ring can hold anything closer than the k-th
+        best distance found so far.
+        """
+        if not self._cells or k <= 0:
+            return []
+        cy, cx = self._cell(lat, lng)
+        ymin, ymax, xmin, xmax = self._extent
+        max_ring = max(cy - ymin, ymax - cy, cx - xmin, xmax - cx, 0)
+        # Distance from the query to the nearest point of ring n is at
+        # least (n - 1) cells.  Cells narrow east-west poleward of the
+        # reference latitude; size them for a degree beyond the query.
+        edge = math.cos(math.radians(min(89.9, abs(lat) + 1.0)))
+        ring_m = self.cell_m * min(1.0, edge / self._ref_cos)
+        best: list[tuple[float, int, dict]] = []  # max-heap via negated distance
+        visited = 0
+        for ring in range(max_ring + 1):
+            if len(best) == k and -best[0][0] <= (ring - 1) * ring_m:
+                break
+            visited += 8 * ring or 1
+            if visited > len(self._cells) * 4:
+                # Query far from the fleet: a scan is cheaper than more rings.
+                return self._scan_nearest(lat, lng, k, city)
+            for cell in _ring(cy, cx, ring):
+                for r in self._cells.get(cell, ()):
+                    if city and r["city"] != city:
+                        continue
+                    d = haversine_m(lat, lng, r["latitude"], r["longitude"])
+                    item = (-d, id(r), r)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, item)
+        return sorted(((-d, r) for d, _, r in best), key=lambda item: item[0])
+
+    def _scan_nearest(
+        self, lat: float, lng: float, k: int, city: str | None
+    ) -> list[tuple[float, dict]]:
+        return heapq.nsmallest(
+            k,
+            (
+                (haversine_m(lat, lng, r["latitude"], r["longitude"]), r)
+                for r in self.rows
+                if not city or r["city"] == city
+            ),
+            key=lambda item: item[0],
+        )
+
+
+def _ring(cy: int, cx: int, n: int):
+    """Cells on the square ring at Chebyshev distance n around (cy, cx)."""
+    if n == 0:
+        yield cy, cx
+        return
+    for x in range(cx - n, cx + n + 1):
+        yield cy - n, x
+        yield cy + n, x
+    for y in range(cy - n + 1, cy + n):
+        yield y, cx - n
+        yield y, cx + n
@@ -668,10 +668,51 @@ function formatBytes(bytes) {
 
 /* ── API ───────────────────────────────────────────── */
 
+// Last snapshot per city, kept up to date from /vehicles/changes or the
+// /vehicles/stream push channel.
+const vehicleState = new Map();
+
+function applyVehicleChanges(city, changes) {
+  const key = city || "";
+  let state = vehicleState.get(key);
+  if (!state) {
+    state = { version: "", byId: new Map() };
+    vehicleState.set(key, state);
+  }
+  if (changes.full) state.byId.clear();
+  for (const id of changes.removed) state.byId.delete(id);
+  for (const f of changes.features) state.byId.set(f.properties.vehicle_id, f);
+  state.version = changes.version;
+  return { type: "FeatureCollection", features: [...state.byId.values()] };
+}
+
 async function fetchVehicles(city) {
-  const url = city ? `/vehicles?city=${city}` : "/vehicles";
-  const resp = await fetch(url);
-  return resp.json();
+  const key = city || "";
+  const state = vehicleState.get(key);
+  if (!state) {
+    const url = city ? `/vehicles?city=${city}` : "/vehicles";
+    const resp = await fetch(url);
+    const data = await resp.json();
+    const version = resp.headers.get("X-Snapshot-Version");
+    if (version !== null) {
+      applyVehicleChanges(city, {
+        version,
+        full: true,
+        features: data.features,
+        removed: [],
+      });
+    }
+    return data;
+  }
+
+  const params = new URLSearchParams({ since_version: state.version });
+  if (city) params.set("city", city);
+  const resp = await fetch(`/vehicles/changes?${params}`);
+  if (!resp.ok) {
+    vehicleState.delete(key);
+    return fetchVehicles(city);
+  }
+  return applyVehicleChanges(city, await resp.json());
 }
 
 function updateVehicleCount(data) {
@@ -854,6 +895,7 @@ class PlowApp {
     this.mode = "realtime";
 
     this.refreshInterval = null;
+    this.vehicleStream = null;
     this.activeVehicleId = null;
     this.activeVehicleTimestamp = null;
 
@@ -886,6 +928,8 @@ class PlowApp {
     btnMtPearl.classList.toggle("active", city === "mt_pearl");
 
     if (this.mode === "realtime") {
+      this.stopAutoRefresh();
+      this.startAutoRefresh();
       await this.refreshVehicles();
     } else {
       await this.loadCoverageForRange(this.coverageSince, this.coverageUntil);
@@ -893,7 +937,10 @@ class PlowApp {
   }
 
   async refreshVehicles() {
-    const rawData = await fetchVehicles(this.city);
+    await this.renderVehicles(await fetchVehicles(this.city));
+  }
+
+  async renderVehicles(rawData) {
     const freshData = filterRecentFeatures(rawData);
     this.map.updateVehicles(freshData);
     this.map.updateMiniTrails(buildMiniTrails(freshData));
@@ -1327,7 +1374,25 @@ class PlowApp {
   /* ── Auto-refresh ──────────────────────────────── */
 
   startAutoRefresh() {
-    if (this.refreshInterval) return;
+    if (this.refreshInterval || this.vehicleStream) return;
+    if (window.EventSource) {
+      const city = this.city;
+      const params = new URLSearchParams();
+      if (city) params.set("city", city);
+      const state = vehicleState.get(city || "");
+      if (state) params.set("since_version", state.version);
+      this.vehicleStream = new EventSource(`/vehicles/stream?${params}`);
+      this.vehicleStream.addEventListener("changes", async (e) => {
+        const data = applyVehicleChanges(city, JSON.parse(e.data));
+        if (this.mode !== "realtime" || city !== this.city) return;
+        try {
+          await this.renderVehicles(data);
+        } catch (err) {
+          console.error("Failed to refresh vehicles:", err);
+        }
+      });
+      return;
+    }
     this.refreshInterval = setInterval(async () => {
       if (this.mode !== "realtime") return;
       try {
@@ -1339,6 +1404,10 @@ class PlowApp {
   }
 
   stopAutoRefresh() {
+    if (this.vehicleStream) {
+      this.vehicleStream.close();
+      this.vehicleStream = null;
+    }
     if (this.refreshInterval) {
       clearInterval(this.refreshInterval);
       this.refreshInterval = null;
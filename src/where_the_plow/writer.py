@@ -0,0 +1,131 @@
+# src/where_the_plow/writer.py
+"""Single background thread that runs the collector's DuckDB work.
+
+DuckDB calls are synchronous.  Running them on the event loop stalls every
+other coroutine in the process (including request handling) for the
+duration of each commit, so the collector hands them to this writer
+instead and awaits the result.  Fetching the next poll can then overlap
+with storing the previous one.
+
+The writer holds at most `maxsize` jobs at a time.  When it is full,
+`submit` waits for a slot, which slows the pollers down to the rate the
+database can absorb instead of letting work pile up in memory.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class IngestWriter:
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._jobs: queue.Queue = queue.Queue()
+        self._slots = asyncio.Semaphore(maxsize)
+        self._thread: threading.Thread | None = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.full_waits = 0
+        self.busy_s = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="ingest-writer", daemon=True
+        )
+        self._thread.start()
+
+    async def submit(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(*args) on the writer thread and return its result.
+
+        Waits for a free slot first if the writer already holds `maxsize`
+        jobs.  If the caller is cancelled, a job that was already queued
+        still runs to completion.
+        """
+        if self._thread is None:
+            raise RuntimeError("IngestWriter has not been started")
+        if self._slots.locked():
+            self.full_waits += 1
+            logger.warning("Writer queue full (%d jobs), waiting", self.maxsize)
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending += 1
+        self._jobs.put((fn, args, loop, future))
+        return await future
+
+    async def drain(self, max_wait_s: float = 30.0):
+        """Finish every queued job, then stop the writer thread."""
+        if self._thread is None:
+            return
+        self._jobs.put(_STOP)
+        await asyncio.to_thread(self._thread.join, max_wait_s)
+        if self._thread.is_alive():
+            logger.warning(
+                "Writer did not drain within %.0fs (%d jobs pending)",
+                max_wait_s,
+                self.pending,
+            )
+        else:
+            logger.info("Writer drained (%d jobs completed)", self.completed)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "maxsize": self.maxsize,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "full_waits": self.full_waits,
+            "busy_s": round(self.busy_s, 3),
+        }
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            fn, args, loop, future = job
+            start = time.perf_counter()
+            try:
+                result, error = fn(*args), None
+            except (duckdb.Error, ValueError) as e:
+                # What a write can be expected to raise: rejected by DuckDB,
+                # or a feed value that does not convert.
+                result, error = None, e
+            except Exception as e:
+                # Anything else is a bug.  Log the traceback here, then still
+                # fail the caller's future so it does not wait forever.
+                logger.exception("Writer job %r crashed", fn)
+                result, error = None, e
+            self.busy_s += time.perf_counter() - start
+            try:
+                loop.call_soon_threadsafe(self._finish, future, result, error)
+            except RuntimeError:
+                # Event loop already closed; nobody is waiting any more.
+                self.pending -= 1
+
+    def _finish(self, future: asyncio.Future, result: Any, error: Exception | None):
+        self.pending -= 1
+        self._slots.release()
+        if error is None:
+            self.completed += 1
+        else:
+            self.failed += 1
+        if future.done():
+            if error is not None:
+                logger.error("Writer job failed after caller went away: %r", error)
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
@@ -0,0 +1,287 @@
+import copy
+import json
+import math
+import sys
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from where_the_plow import cache
+from where_the_plow.batch import PositionBatch
+from where_the_plow.coverage_format import _HEADER, MAGIC, VERSION
+from where_the_plow.mvt import EXTENT
+from where_the_plow.pbf import _fields, _packed_varints, _zigzag
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+SAMPLE_RESPONSE = {
+    "features": [
+        {
+            "attributes": {
+                "ID": "281474984421544",
+                "Description": "2222 SA PLOW TRUCK",
+                "VehicleType": "SA PLOW TRUCK",
+                "LocationDateTime": 1771491812000,
+                "Bearing": 135,
+                "Speed": "13.4",
+                "isDriving": "maybe",
+            },
+            "geometry": {"x": -52.731, "y": 47.564},
+        },
+        {
+            "attributes": {
+                "ID": "281474992393189",
+                "Description": "2037 LOADER",
+                "VehicleType": "LOADER",
+                "LocationDateTime": 1771492204000,
+                "Bearing": 0,
+                "Speed": "0.0",
+                "isDriving": "no",
+            },
+            "geometry": {"x": -52.726, "y": 47.595},
+        },
+    ]
+}
+
+MT_PEARL_RESPONSE = [
+    {
+        "VEH_ID": 17,
+        "VEH_NAME": "Plow 17",
+        "LOO_DESCRIPTION": "Plow Truck",
+        "VEH_EVENT_DATETIME": "2026-02-19T12:00:00Z",
+        "VEH_EVENT_LONGITUDE": -52.81,
+        "VEH_EVENT_LATITUDE": 47.52,
+        "VEH_EVENT_HEADING": 270.0,
+    },
+    {
+        "VEH_ID": 18,
+        "VEH_NAME": "Plow 18",
+        "LOO_DESCRIPTION": "Plow Truck",
+        "VEH_EVENT_DATETIME": "2026-02-19T12:00:05Z",
+        "VEH_EVENT_LONGITUDE": -52.82,
+        "VEH_EVENT_LATITUDE": 47.53,
+        "VEH_EVENT_HEADING": 90,
+    },
+]
+
+
+@pytest.fixture
+def avl_response():
+    """A St. John's AVL query response in `f=json` form."""
+    return copy.deepcopy(SAMPLE_RESPONSE)
+
+
+@pytest.fixture
+def avl_pbf():
+    """avl_response's two vehicles as an `f=pbf` FeatureCollectionPBuffer."""
+    return (FIXTURES / "avl_query.pbf").read_bytes()
+
+
+@pytest.fixture
+def mt_pearl_response():
+    """A Mount Pearl feed response."""
+    return copy.deepcopy(MT_PEARL_RESPONSE)
+
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    """An empty coverage cache, its disk tier in a fresh directory."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "memory", cache.MemoryLRU())
+    monkeypatch.setattr(cache, "levels", cache.MemoryLRU())
+    monkeypatch.setattr(cache, "disk_hits", 0)
+    return tmp_path
+
+
+@pytest.fixture
+def make_batch():
+    """Factory for a one-vehicle batch with positions at the given seconds."""
+
+    def make(vehicle_id: str, seconds: list[int]) -> PositionBatch:
+        return PositionBatch.from_positions(
+            [
+                {
+                    "vehicle_id": vehicle_id,
+                    "description": "Plow 1",
+                    "vehicle_type": "LOADER",
+                    "timestamp": datetime(2026, 2, 19, 12, 0, s, tzinfo=timezone.utc),
+                    "longitude": float(s),
+                    "latitude": 47.5,
+                    "bearing": 0,
+                    "speed": None,
+                    "is_driving": "maybe",
+                }
+                for s in seconds
+            ]
+        )
+
+    return make
+
+
+def _tile_for(lng: float, lat: float, z: int) -> tuple[int, int]:
+    n = 2**z
+    x = int((lng + 180) / 360 * n)
+    s = math.sin(math.radians(lat))
+    y = int((0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * n)
+    return x, y
+
+
+def _decode_tile(data: bytes) -> dict:
+    """Layers by name, each a list of (type, properties, parts)."""
+    layers = {}
+    for number, _, layer_buf in _fields(data):
+        assert number == 3
+        name = None
+        keys, values, raw = [], [], []
+        for n, _, value in _fields(layer_buf):
+            if n == 1:
+                name = value.decode()
+            elif n == 2:
+                raw.append(value)
+            elif n == 3:
+                keys.append(value.decode())
+            elif n == 4:
+                [(vn, _, v)] = list(_fields(value))
+                values.append(v.decode() if vn == 1 else v)
+            elif n == 5:
+                assert value == EXTENT
+        features = []
+        for buf in raw:
+            fields = {n: v for n, _, v in _fields(buf)}
+            tags = _packed_varints(fields[2])
+            props = {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)}
+            features.append((fields[3], props, _decode_geometry(fields[4])))
+        layers[name] = features
+    return layers
+
+
+def _decode_geometry(buf: bytes) -> list[list[tuple[int, int]]]:
+    ints = _packed_varints(buf)
+    parts, i, x, y = [], 0, 0, 0
+    while i < len(ints):
+        command, count = ints[i] & 7, ints[i] >> 3
+        i += 1
+        if command == 1 and count > 1:  # multipoint
+            parts.append([])
+        for _ in range(count):
+            x += _zigzag(ints[i])
+            y += _zigzag(ints[i + 1])
+            i += 2
+            if command == 1 and (count == 1 or not parts):
+                parts.append([])
+            parts[-1].append((x, y))
+    return parts
+
+
+def _decode_values(text: str) -> list[int]:
+    values = []
+    value = shift = 0
+    for ch in text:
+        b = ord(ch) - 63
+        value |= (b & 0x1F) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return values
+
+
+def _decode_polyline(body: bytes) -> list[dict]:
+    """Inverse of encode_polyline, as trails with coordinates and seconds."""
+    doc = json.loads(body)
+    scale = 10 ** doc["precision"]
+    trails = []
+    for t in doc["trails"]:
+        deltas = _decode_values(t["line"])
+        coords = []
+        lat = lng = 0
+        for i in range(0, len(deltas), 2):
+            lat += deltas[i]
+            lng += deltas[i + 1]
+            coords.append([lng / scale, lat / scale])
+        seconds = []
+        ts = doc["t0"]
+        for delta in _decode_values(t["times"]):
+            ts += delta
+            seconds.append(ts)
+        trails.append(
+            {
+                "vehicle_id": t["vehicle_id"],
+                "description": t["description"],
+                "vehicle_type": t["vehicle_type"],
+                "city": t["city"],
+                "coordinates": coords,
+                "seconds": seconds,
+            }
+        )
+    return trails
+
+
+def _decode_binary(body: bytes) -> list[dict]:
+    """Inverse of encode_binary, as trails with coordinates and seconds."""
+    magic, version, precision, t0, n_trails, n_points, meta_len = _HEADER.unpack_from(
+        body
+    )
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a version 1 coverage body")
+    pos = _HEADER.size
+
+    def column(n: int) -> array:
+        nonlocal pos
+        values = array("i")
+        values.frombytes(body[pos : pos + 4 * n])
+        if sys.byteorder == "big":
+            values.byteswap()
+        pos += 4 * n
+        return values
+
+    counts = column(n_trails)
+    lngs = column(n_points)
+    lats = column(n_points)
+    times = column(n_points)
+    meta = json.loads(body[pos : pos + meta_len])
+    scale = 10**precision
+    trails = []
+    start = 0
+    for count, (vid, description, vtype, city) in zip(counts, meta):
+        end = start + count
+        trails.append(
+            {
+                "vehicle_id": vid,
+                "description": description,
+                "vehicle_type": vtype,
+                "city": city,
+                "coordinates": [
+                    [lngs[i] / scale, lats[i] / scale] for i in range(start, end)
+                ],
+                "seconds": [t0 + times[i] for i in range(start, end)],
+            }
+        )
+        start = end
+    return trails
+
+
+@pytest.fixture
+def tile_for():
+    """(x, y) of the zoom-z tile containing a point."""
+    return _tile_for
+
+
+@pytest.fixture
+def decode_tile():
+    """Decode a vector tile into layers by name, each a list of features."""
+    return _decode_tile
+
+
+@pytest.fixture
+def decode_polyline():
+    """Inverse of encode_polyline, as trails with coordinates and seconds."""
+    return _decode_polyline
+
+
+@pytest.fixture
+def decode_binary():
+    """Inverse of encode_binary, as trails with coordinates and seconds."""
+    return _decode_binary
@@ -0,0 +1,67 @@
+import json
+from datetime import datetime, timezone
+
+from where_the_plow.batch import PositionBatch, epoch_us
+from where_the_plow.client import parse_avl_batch, parse_mt_pearl_batch
+
+
+def test_avl_batch_keeps_raw_epoch(avl_response):
+    batch = parse_avl_batch(avl_response)
+    # Raw epoch milliseconds are kept; the NST correction lives on the batch
+    assert batch.epoch[0] == 1771491812000
+    assert batch.epoch_unit_us == 1000
+
+
+def test_mt_pearl_batch_shares_dictionary_entries(mt_pearl_response):
+    batch = parse_mt_pearl_batch(mt_pearl_response)
+    assert batch.vehicle_type.values == ["Plow Truck"]
+
+
+def test_take_selects_rows(avl_response):
+    batch = parse_avl_batch(avl_response)
+    picked = batch.take([1])
+    assert picked.vehicle_id == [batch.vehicle_id[1]]
+    assert picked.timestamp_us(0) == batch.timestamp_us(1)
+    assert picked.is_driving[0] == "no"
+
+
+def test_from_positions_marks_missing_speed():
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    row = {
+        "vehicle_id": "v1",
+        "timestamp": ts,
+        "longitude": -52.7,
+        "latitude": 47.5,
+        "bearing": 0,
+        "speed": None,
+        "is_driving": "maybe",
+    }
+    assert PositionBatch.from_positions([row]).speed is None
+
+    batch = PositionBatch.from_positions([row, {**row, "speed": 3.0}])
+    assert batch.speed[0] != batch.speed[0]  # NaN
+    assert batch.speed[1] == 3.0
+    assert batch.timestamp_us(0) == epoch_us(ts)
+
+
+def test_to_json_is_strict_and_drops_non_finite_rows():
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    row = {
+        "vehicle_id": "v1",
+        "timestamp": ts,
+        "longitude": -52.7,
+        "latitude": 47.5,
+        "bearing": 0,
+        "speed": None,
+        "is_driving": "maybe",
+    }
+    rows = [
+        row,
+        {**row, "vehicle_id": "v2", "speed": float("inf")},
+        {**row, "vehicle_id": "v3", "speed": 3.0, "longitude": float("nan")},
+    ]
+    batch = PositionBatch.from_positions(rows).finite()
+    assert batch.vehicle_id == ["v1", "v2"]
+    doc = json.loads(batch.to_json())
+    assert doc["speed"] == [None, None]
+    assert PositionBatch.from_positions(rows[:1]).finite().vehicle_id == ["v1"]
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from where_the_plow.broadcast import KEEPALIVE, Broadcaster, encode_event
+from where_the_plow.snapshot import RealtimeSnapshots, TrailBuffer
+
+
+@pytest.fixture
+def publish(make_batch):
+    """Record one position, publish the snapshot and broadcast the change."""
+
+    def publish(realtime, broadcaster, trails, city, vehicle_id, second):
+        trails.record_batch(make_batch(vehicle_id, [second]), city)
+        realtime.publish(city, trails.snapshot(city))
+        broadcaster.publish(realtime, city, realtime.version - 1)
+
+    return publish
+
+
+def parse(event: bytes) -> tuple[str, dict]:
+    lines = dict(line.split(": ", 1) for line in event.decode().strip().split("\n"))
+    assert lines["event"] == "changes"
+    return lines["id"], json.loads(lines["data"])
+
+
+def test_encode_event():
+    event = encode_event("ab12.3", b'{"a":1}')
+    assert event == b'id: ab12.3\nevent: changes\ndata: {"a":1}\n\n'
+
+
+async def test_publish_fans_out_by_city(publish):
+    realtime, trails = RealtimeSnapshots(), TrailBuffer()
+    broadcaster = Broadcaster()
+    everyone = broadcaster.subscribe()
+    st_johns = broadcaster.subscribe("st_johns")
+    mt_pearl = broadcaster.subscribe("mt_pearl")
+
+    publish(realtime, broadcaster, trails, "st_johns", "v1", 0)
+
+    assert mt_pearl.queue.empty()
+    event = everyone.queue.get_nowait()
+    # Serialised once per city filter, not per subscriber
+    assert event == st_johns.queue.get_nowait()
+    version, changes = parse(event)
+    assert version == realtime.version_id == f"{realtime.epoch}.1"
+    assert changes["version"] == version
+    assert [f["properties"]["vehicle_id"] for f in changes["features"]] == ["v1"]
+    assert broadcaster.stats() == {
+        "subscribers": 3,
+        "published": 1,
+        "delivered": 2,
+        "evicted": 0,
+    }
+
+
+async def test_slow_subscriber_is_evicted(publish):
+    realtime, trails = RealtimeSnapshots(), TrailBuffer()
+    broadcaster = Broadcaster(maxsize=2)
+    slow = broadcaster.subscribe()
+    fast = broadcaster.subscribe()
+
+    for second in (0, 6, 12):
+        publish(realtime, broadcaster, trails, "st_johns", "v1", second)
+        while not fast.queue.empty():
+            fast.queue.get_nowait()
+
+    assert slow.evicted
+    assert not fast.evicted
+    assert len(broadcaster) == 1
+    assert broadcaster.evicted == 1
+    # The backlog is dropped and the stream ends
+    assert [event async for event in slow.events()] == []
+
+
+async def test_unsubscribe_and_keepalive():
+    broadcaster = Broadcaster()
+    sub = broadcaster.subscribe("st_johns")
+
+    events = sub.events(keepalive=0.01)
+    assert await anext(events) == KEEPALIVE
+    await events.aclose()
+
+    broadcaster.unsubscribe(sub)
+    assert len(broadcaster) == 0
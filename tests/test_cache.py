@@ -0,0 +1,271 @@
+# tests/test_cache.py
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+
+from where_the_plow import cache
+from where_the_plow.cache import CoverageChunks, LiveCoverage, MemoryLRU
+from where_the_plow.db import Database
+
+SINCE = datetime(2026, 2, 19, 0, 0, 0, tzinfo=timezone.utc)
+UNTIL = datetime(2026, 2, 20, 0, 0, 0, tzinfo=timezone.utc)
+
+
+def test_memory_lru_evicts_least_recently_used_by_bytes():
+    lru = MemoryLRU(max_bytes=10)
+    lru.put("a", b"aaaa")
+    lru.put("b", b"bbbb")
+    assert lru.get("a") == b"aaaa"  # b is now least recently used
+    lru.put("c", b"cccc")
+    assert lru.get("b") is None
+    assert lru.get("a") == b"aaaa"
+    assert lru.get("c") == b"cccc"
+    assert lru.bytes == 8
+    assert lru.stats() == {
+        "entries": 2,
+        "bytes": 8,
+        "max_bytes": 10,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+
+def test_memory_lru_replaces_and_skips_oversized():
+    lru = MemoryLRU(max_bytes=10)
+    lru.put("a", b"aaaa")
+    lru.put("a", b"aaaaaa")
+    assert lru.bytes == 6
+    lru.put("big", b"x" * 11)
+    assert lru.get("big") is None
+    assert len(lru) == 1
+
+
+def test_put_get_keyed_by_city_and_resolution(isolated_cache):
+    cache.put(SINCE, UNTIL, None, 30, b'{"all":1}')
+    cache.put(SINCE, UNTIL, "mt_pearl", 30, b'{"mt_pearl":1}')
+    assert cache.get(SINCE, UNTIL, None, 30) == b'{"all":1}'
+    assert cache.get(SINCE, UNTIL, "mt_pearl", 30) == b'{"mt_pearl":1}'
+    assert cache.get(SINCE, UNTIL, "st_johns", 30) is None
+    assert cache.get(SINCE, UNTIL, None, 60) is None
+    assert len(list(isolated_cache.glob("*.json"))) == 2
+
+
+def test_disk_hit_is_promoted_to_memory(isolated_cache):
+    cache.put(SINCE, UNTIL, None, 30, b"{}")
+    cache.memory.clear()
+    assert cache.get(SINCE, UNTIL, None, 30) == b"{}"
+    assert cache.get(SINCE, UNTIL, None, 30) == b"{}"
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory"]["hits"] == 1
+
+
+def test_files_are_named_by_encoding_and_memory_only_skips_disk(isolated_cache):
+    cache.put(SINCE, UNTIL, None, 30, b"\x01\x02", "binary:5")
+    cache.put(SINCE, UNTIL, None, 30, b"\x1a\x00", "mvt:10/1/2:", disk=False)
+    assert [f.suffix for f in isolated_cache.iterdir()] == [".bin"]
+    cache.memory.clear()
+    assert cache.get(SINCE, UNTIL, None, 30, "binary:5") == b"\x01\x02"
+    assert cache.get(SINCE, UNTIL, None, 30, "mvt:10/1/2:", disk=False) is None
+
+
+def test_today_is_not_cached(isolated_cache):
+    now = datetime.now(timezone.utc)
+    cache.put(now - timedelta(hours=1), now, None, 30, b"{}")
+    assert cache.get(now - timedelta(hours=1), now, None, 30) is None
+    assert len(cache.memory) == 0
+    assert list(isolated_cache.iterdir()) == []
+
+
+def make_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    db = Database(path)
+    db.init()
+    return db, path
+
+
+def _poll(db: Database, start: datetime, offsets: dict[str, list[int]]):
+    """Insert one poll per offset; offsets maps vehicle_id to seconds."""
+    now = datetime.now(timezone.utc)
+    for s in sorted({s for seconds in offsets.values() for s in seconds}):
+        positions = [
+            {
+                "vehicle_id": vid,
+                "timestamp": start + timedelta(seconds=s),
+                "longitude": -52.7 + s * 1e-5,
+                "latitude": 47.5 + i * 0.01,
+                "bearing": 0,
+                "speed": 10.0,
+                "is_driving": "maybe",
+            }
+            for i, (vid, seconds) in enumerate(sorted(offsets.items()))
+            if s in seconds
+        ]
+        db.insert_positions(positions, now, "st_johns")
+
+
+def test_live_coverage_merges_appended_rows():
+    db, path = make_db()
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    start = now - timedelta(hours=2)
+    db.upsert_vehicles(
+        [
+            {"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"},
+            {"vehicle_id": "v2", "description": "Plow 2", "vehicle_type": "LOADER"},
+        ],
+        now,
+        "st_johns",
+    )
+    live = LiveCoverage()
+    since, until = now - timedelta(hours=24), now + timedelta(hours=1)
+
+    _poll(db, start, {"v1": [0, 30, 60], "v2": [0]})
+    trails = live.trails(db, since, until)
+    assert trails == db.get_coverage_trails(since, until)
+    assert [t["vehicle_id"] for t in trails] == ["v1"]
+    first_watermark = live.watermark
+
+    # v1's open segment continues across the watermark, v2's single
+    # point becomes a trail, and v1 then starts a new segment.
+    _poll(db, start, {"v1": [90, 120, 600, 630], "v2": [30]})
+    trails = live.trails(db, since, until)
+    assert trails == db.get_coverage_trails(since, until)
+    assert [len(t["coordinates"]) for t in trails] == [5, 2, 2]
+    assert live.merged == 9
+    assert live.watermark > first_watermark
+
+    narrow = live.trails(db, start + timedelta(seconds=60), until, "st_johns")
+    assert narrow == db.get_coverage_trails(
+        start + timedelta(seconds=60), until, "st_johns"
+    )
+    assert live.trails(db, since, until, "mt_pearl") == []
+
+    db.close()
+    os.unlink(path)
+
+
+def test_live_coverage_window():
+    db, path = make_db()
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    db.upsert_vehicles(
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
+    )
+    _poll(db, now - timedelta(minutes=50), {"v1": [0, 30, 60]})
+    _poll(db, now - timedelta(minutes=20), {"v1": [0, 30]})
+
+    live = LiveCoverage(hours=1)
+    assert live.trails(db, now - timedelta(hours=2), now) is None
+    trails = live.trails(db, now - timedelta(minutes=55), now)
+    assert [len(t["coordinates"]) for t in trails] == [3, 2]
+
+    # Once the window moves on, segments that fall out of it are dropped
+    live.span = timedelta(minutes=30)
+    trails = live.trails(db, now - timedelta(minutes=25), now)
+    assert [len(t["coordinates"]) for t in trails] == [2]
+    assert live.stats()["segments"] == 1
+
+    db.close()
+    os.unlink(path)
+
+
+def test_live_coverage_misses_until_first_load(monkeypatch):
+    now = datetime.now(timezone.utc)
+    live = LiveCoverage(hours=1)
+    # A refresh that never loaded the window leaves start unset.
+    monkeypatch.setattr(live, "_refresh", lambda db: None)
+    assert live.trails(None, now - timedelta(minutes=30), now) is None
+    assert live.served == 0
+
+
+def test_live_coverage_sheds_oldest_points_over_budget():
+    db, path = make_db()
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    start = now - timedelta(minutes=30)
+    db.upsert_vehicles(
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
+    )
+    _poll(db, start, {"v1": [0, 30, 60, 90, 120]})
+
+    # Room for four points; shedding goes down to 90% of that, i.e. three.
+    live = LiveCoverage(hours=1, max_bytes=4 * cache._POINT_BYTES)
+    assert live.trails(db, now - timedelta(minutes=55), now) is None
+    assert live.start == start + timedelta(seconds=60)
+    assert live.stats()["bytes"] == 3 * cache._POINT_BYTES
+    assert live.shed == 2
+
+    trails = live.trails(db, live.start, now)
+    assert trails == db.get_coverage_trails(live.start, now)
+    assert [len(t["coordinates"]) for t in trails] == [3]
+
+    db.close()
+    os.unlink(path)
+
+
+def test_coverage_chunks_stitch_across_hours():
+    db, path = make_db()
+    start = datetime(2026, 2, 19, 11, 50, 0, tzinfo=timezone.utc)
+    db.upsert_vehicles(
+        [
+            {"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"},
+            {"vehicle_id": "v2", "description": "Plow 2", "vehicle_type": "LOADER"},
+        ],
+        start,
+        "st_johns",
+    )
+    # v1 drives through 12:00 and 13:00; v2 stops for 10 minutes at 12:30
+    _poll(
+        db,
+        start,
+        {
+            "v1": list(range(0, 7200, 60)),
+            "v2": [s for s in range(0, 3600, 60) if not 2400 <= s < 3000],
+        },
+    )
+    chunks = CoverageChunks()
+    windows = [
+        (start, start + timedelta(hours=2)),
+        (start + timedelta(minutes=5), start + timedelta(minutes=95)),
+        (start + timedelta(minutes=40), start + timedelta(minutes=41)),
+        (start + timedelta(minutes=30), start + timedelta(minutes=75)),
+    ]
+    for since, until in windows:
+        for city in (None, "st_johns", "mt_pearl"):
+            expected = db.get_coverage_trails(since, until, city)
+            assert chunks.trails(db, since, until, city) == expected
+    # 11:00, 12:00 and 13:00 were each fetched once
+    assert chunks.fetched_hours == 3
+    whole = chunks.trails(db, start, start + timedelta(hours=2))
+    assert [len(t["coordinates"]) for t in whole] == [120, 40, 10]
+    assert chunks.trails(db, start + timedelta(hours=1), start) == []
+
+    db.close()
+    os.unlink(path)
+
+
+def test_coverage_chunks_do_not_cache_unsettled_hours():
+    db, path = make_db()
+    now = datetime.now(timezone.utc)
+    db.upsert_vehicles(
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
+    )
+    _poll(db, now - timedelta(minutes=5), {"v1": [0, 30, 60]})
+    chunks = CoverageChunks()
+    since = now - timedelta(minutes=10)
+    assert len(chunks.trails(db, since, now)) == 1
+    _poll(db, now - timedelta(minutes=5), {"v1": [90]})
+    trails = chunks.trails(db, since, now)
+    assert len(trails[0]["coordinates"]) == 4
+    assert len(chunks.lru) == 0
+
+    db.close()
+    os.unlink(path)
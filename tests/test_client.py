@@ -1,64 +1,39 @@
+import json
 from datetime import datetime, timezone
 
-from where_the_plow.client import parse_avl_response
-
-
-SAMPLE_RESPONSE = {
-    "features": [
-        {
-            "attributes": {
-                "ID": "281474984421544",
-                "Description": "2222 SA PLOW TRUCK",
-                "VehicleType": "SA PLOW TRUCK",
-                "LocationDateTime": 1771491812000,
-                "Bearing": 135,
-                "Speed": "13.4",
-                "isDriving": "maybe",
-            },
-            "geometry": {"x": -52.731, "y": 47.564},
-        },
-        {
-            "attributes": {
-                "ID": "281474992393189",
-                "Description": "2037 LOADER",
-                "VehicleType": "LOADER",
-                "LocationDateTime": 1771492204000,
-                "Bearing": 0,
-                "Speed": "0.0",
-                "isDriving": "no",
-            },
-            "geometry": {"x": -52.726, "y": 47.595},
-        },
-    ]
-}
-
-
-def test_parse_avl_response():
-    vehicles, positions = parse_avl_response(SAMPLE_RESPONSE)
-    assert len(vehicles) == 2
-    assert len(positions) == 2
-
-    assert vehicles[0]["vehicle_id"] == "281474984421544"
-    assert vehicles[0]["description"] == "2222 SA PLOW TRUCK"
-    assert vehicles[0]["vehicle_type"] == "SA PLOW TRUCK"
-
-    assert positions[0]["vehicle_id"] == "281474984421544"
-    assert positions[0]["longitude"] == -52.731
-    assert positions[0]["latitude"] == 47.564
-    assert positions[0]["bearing"] == 135
-    assert positions[0]["speed"] == 13.4
-    assert positions[0]["is_driving"] == "maybe"
-    assert positions[0]["timestamp"].year == 2026
+import httpx
+
+from where_the_plow import client as client_module
+from where_the_plow.batch import from_epoch_us
+from where_the_plow.client import (
+    PayloadFingerprint,
+    fetch_mt_pearl_vehicles,
+    fetch_vehicles,
+    parse_avl_batch,
+    parse_mt_pearl_batch,
+)
+
+
+def test_parse_avl_batch(avl_response):
+    batch = parse_avl_batch(avl_response)
+    assert len(batch) == 2
+
+    assert batch.vehicle_id[0] == "281474984421544"
+    assert batch.description[0] == "2222 SA PLOW TRUCK"
+    assert batch.vehicle_type[0] == "SA PLOW TRUCK"
+    assert batch.longitude[0] == -52.731
+    assert batch.latitude[0] == 47.564
+    assert batch.bearing[0] == 135
+    assert batch.speed[0] == 13.4
+    assert batch.is_driving[0] == "maybe"
     # Epoch 1771491812000 is NST local time; after +3:30 correction → 12:33:32 UTC
-    assert positions[0]["timestamp"] == datetime(
+    assert from_epoch_us(batch.timestamp_us(0)) == datetime(
         2026, 2, 19, 12, 33, 32, tzinfo=timezone.utc
     )
 
 
 def test_parse_empty_response():
-    vehicles, positions = parse_avl_response({"features": []})
-    assert vehicles == []
-    assert positions == []
+    assert len(parse_avl_batch({"features": []})) == 0
 
 
 def test_parse_speed_conversion():
@@ -71,7 +46,7 @@ def test_parse_speed_conversion():
                     "Description": "test",
                     "VehicleType": "LOADER",
                     "LocationDateTime": 1771491812000,
-                    "Bearing": 0,
+                    "Bearing": None,
                     "Speed": "25.7",
                     "isDriving": "maybe",
                 },
@@ -79,5 +54,89 @@ def test_parse_speed_conversion():
             }
         ]
     }
-    _, positions = parse_avl_response(resp)
-    assert positions[0]["speed"] == 25.7
+    batch = parse_avl_batch(resp)
+    assert batch.speed[0] == 25.7
+    assert batch.bearing[0] == 0
+
+
+def test_parse_mt_pearl_batch(mt_pearl_response):
+    batch = parse_mt_pearl_batch(mt_pearl_response)
+    assert batch.vehicle_id == ["17", "18"]
+    assert batch.description == ["Plow 17", "Plow 18"]
+    assert list(batch.bearing) == [270, 90]
+    assert batch.speed is None
+    assert from_epoch_us(batch.timestamp_us(1)) == datetime(
+        2026, 2, 19, 12, 0, 5, tzinfo=timezone.utc
+    )
+
+
+async def test_fetch_vehicles_skips_identical_payload(monkeypatch, avl_response):
+    monkeypatch.setattr(client_module.settings, "avl_format", "json")
+    body = json.dumps(avl_response).encode()
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+    fingerprint = PayloadFingerprint()
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        assert await fetch_vehicles(client, fingerprint) == avl_response
+        assert await fetch_vehicles(client, fingerprint) is None
+
+        fingerprint.forget()
+        assert await fetch_vehicles(client, fingerprint) == avl_response
+
+
+async def test_fetch_mt_pearl_honours_etag():
+    seen_headers = []
+
+    def handler(request):
+        seen_headers.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=[], headers={"ETag": '"v1"'})
+
+    fingerprint = PayloadFingerprint()
+    transport = httpx.MockTransport(handler)
+    async with httpx.AsyncClient(transport=transport) as client:
+        assert await fetch_mt_pearl_vehicles(client, fingerprint) == []
+        assert await fetch_mt_pearl_vehicles(client, fingerprint) is None
+
+    assert seen_headers == [None, '"v1"']
+
+
+async def test_fetch_without_fingerprint_always_returns_payload():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=[]))
+    async with httpx.AsyncClient(transport=transport) as client:
+        assert await fetch_mt_pearl_vehicles(client) == []
+        assert await fetch_mt_pearl_vehicles(client) == []
+
+
+async def test_fetch_vehicles_pbf(monkeypatch, avl_pbf, avl_response):
+    monkeypatch.setattr(client_module.settings, "avl_format", "pbf")
+    monkeypatch.setattr(client_module, "_pbf_unavailable", False)
+    formats = []
+
+    def handler(request):
+        formats.append(request.url.params["f"])
+        return httpx.Response(200, content=avl_pbf)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        data = await fetch_vehicles(client)
+
+    assert formats == ["pbf"]
+    assert data == avl_response
+
+
+async def test_fetch_vehicles_falls_back_to_json(monkeypatch, avl_response):
+    monkeypatch.setattr(client_module.settings, "avl_format", "pbf")
+    monkeypatch.setattr(client_module, "_pbf_unavailable", False)
+    formats = []
+
+    def handler(request):
+        formats.append(request.url.params["f"])
+        return httpx.Response(200, json=avl_response)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        assert await fetch_vehicles(client) == avl_response
+        assert await fetch_vehicles(client) == avl_response
+
+    # After the first failed decode, JSON is requested directly
+    assert formats == ["pbf", "json", "json"]
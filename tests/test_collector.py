@@ -2,8 +2,17 @@
 import os
 import tempfile
 
+import httpx
+
+from where_the_plow.client import PayloadFingerprint
 from where_the_plow.db import Database
-from where_the_plow.collector import process_poll_st_johns
+from where_the_plow.collector import (
+    poll_mt_pearl,
+    process_poll_mt_pearl,
+    process_poll_st_johns,
+)
+from where_the_plow.dedup import DedupIndex
+from where_the_plow.writer import IngestWriter
 
 
 SAMPLE_RESPONSE = {
@@ -63,3 +72,70 @@ def test_process_poll_deduplicates():
 
     db.close()
     os.unlink(path)
+
+
+def test_process_poll_skips_indexed_positions():
+    db, path = make_db()
+    index = DedupIndex.from_db(db)
+
+    assert process_poll_st_johns(db, SAMPLE_RESPONSE, index) == 1
+    assert index.misses == 1
+
+    assert process_poll_st_johns(db, SAMPLE_RESPONSE, index) == 0
+    assert index.hits == 1
+
+    db.close()
+    os.unlink(path)
+
+
+def test_process_poll_mt_pearl_stores_columns(mt_pearl_response):
+    db, path = make_db()
+
+    assert process_poll_mt_pearl(db, mt_pearl_response) == 2
+
+    rows = db.conn.execute(
+        "SELECT vehicle_id, bearing, speed, is_driving, city, epoch(timestamp) "
+        "FROM positions ORDER BY vehicle_id"
+    ).fetchall()
+    assert rows[0] == ("17", 270, None, "maybe", "mt_pearl", 1771502400)
+    assert rows[1][0] == "18"
+
+    row = db.conn.execute(
+        "SELECT vehicle_type, city FROM vehicles WHERE vehicle_id='17'"
+    ).fetchone()
+    assert row == ("Plow Truck", "mt_pearl")
+
+    db.close()
+    os.unlink(path)
+
+
+async def test_unchanged_poll_still_refreshes_last_seen(mt_pearl_response):
+    db, path = make_db()
+    writer = IngestWriter()
+    writer.start()
+    fingerprint = PayloadFingerprint()
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, json=mt_pearl_response)
+    )
+
+    def last_seen():
+        return db.conn.execute(
+            "SELECT vehicle_id, last_seen FROM vehicles ORDER BY vehicle_id"
+        ).fetchall()
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        first = await poll_mt_pearl(client, db, writer, None, fingerprint)
+        assert not first.unchanged
+        before = last_seen()
+
+        second = await poll_mt_pearl(client, db, writer, None, fingerprint)
+        assert second.unchanged
+
+    after = last_seen()
+    assert [vid for vid, _ in after] == ["17", "18"]
+    assert all(a[1] > b[1] for a, b in zip(after, before))
+    assert db.conn.execute("SELECT count(*) FROM positions").fetchone()[0] == 2
+
+    await writer.drain()
+    db.close()
+    os.unlink(path)
@@ -5,7 +5,10 @@ def test_default_settings():
     settings = Settings()
     assert settings.db_path == "/data/plow.db"
     assert settings.poll_interval == 6
+    assert settings.poll_interval_max == 30
+    assert settings.poll_interval_idle == 120
     assert settings.log_level == "INFO"
+    assert settings.coverage_max_points == 250_000
     assert "MapServer" in settings.avl_api_url
 
 
@@ -13,7 +16,9 @@ def test_settings_from_env(monkeypatch):
     monkeypatch.setenv("DB_PATH", "/tmp/test.db")
     monkeypatch.setenv("POLL_INTERVAL", "10")
     monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+    monkeypatch.setenv("COVERAGE_MAX_POINTS", "1000")
     settings = Settings()
     assert settings.db_path == "/tmp/test.db"
     assert settings.poll_interval == 10
     assert settings.log_level == "DEBUG"
+    assert settings.coverage_max_points == 1000
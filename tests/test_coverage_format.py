@@ -0,0 +1,92 @@
+# tests/test_coverage_format.py
+import json
+
+import pytest
+
+from where_the_plow.coverage_format import (
+    BINARY,
+    GEOJSON,
+    POLYLINE,
+    encode_binary,
+    encode_polyline,
+    negotiate,
+)
+
+T0_US = 1_771_502_400 * 1_000_000  # 2026-02-19T12:00:00Z
+
+
+def make_trails():
+    return [
+        {
+            "vehicle_id": "v1",
+            "description": "2222 SA PLOW TRUCK",
+            "vehicle_type": "SA PLOW TRUCK",
+            "coordinates": [
+                [-52.731234, 47.561234],
+                [-52.730001, 47.562],
+                [-52.7, 47.5],
+            ],
+            "timestamps": ["a", "b", "c"],
+            "times_us": [T0_US + 30_000_000, T0_US + 60_000_000, T0_US + 95_500_000],
+            "city": "st_johns",
+        },
+        {
+            "vehicle_id": "mp1",
+            "description": "Plow – Mount Pearl",
+            "vehicle_type": "Plow",
+            "coordinates": [[-52.81, 47.52], [-52.8101, 47.5202]],
+            "timestamps": ["a", "b"],
+            "times_us": [T0_US, T0_US + 30_000_000],
+            "city": "mt_pearl",
+        },
+    ]
+
+
+@pytest.mark.parametrize(
+    "encode,decode",
+    [(encode_polyline, "decode_polyline"), (encode_binary, "decode_binary")],
+)
+def test_round_trip_quantises_to_precision(request, encode, decode):
+    decode = request.getfixturevalue(decode)
+    trails = make_trails()
+    for precision in (5, 6):
+        decoded = decode(encode(trails, precision))
+        assert [t["vehicle_id"] for t in decoded] == ["v1", "mp1"]
+        assert decoded[1]["description"] == "Plow – Mount Pearl"
+        assert decoded[1]["city"] == "mt_pearl"
+        for original, got in zip(trails, decoded):
+            assert got["seconds"] == [t // 1_000_000 for t in original["times_us"]]
+            assert len(got["coordinates"]) == len(original["coordinates"])
+            for (lng, lat), (dlng, dlat) in zip(
+                original["coordinates"], got["coordinates"]
+            ):
+                assert abs(lng - dlng) <= 0.5 / 10**precision + 1e-12
+                assert abs(lat - dlat) <= 0.5 / 10**precision + 1e-12
+
+
+def test_polyline_matches_reference_encoding():
+    # Example from the encoded polyline algorithm documentation.
+    trail = {
+        "vehicle_id": "v",
+        "description": "",
+        "vehicle_type": "",
+        "coordinates": [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]],
+        "times_us": [0, 0, 0],
+    }
+    body = json.loads(encode_polyline([trail]))
+    assert body["trails"][0]["line"] == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert body["t0"] == 0
+
+
+def test_binary_is_aligned_and_empty_is_valid(decode_binary, decode_polyline):
+    body = encode_binary(make_trails())
+    assert body[:4] == b"PLWC"
+    assert len(body) % 4 == 0
+    assert decode_binary(encode_binary([])) == []
+    assert decode_polyline(encode_polyline([])) == []
+
+
+def test_negotiate():
+    assert negotiate(None, "") == GEOJSON
+    assert negotiate(None, "application/x-plow-coverage") == BINARY
+    assert negotiate(POLYLINE, "application/x-plow-coverage") == POLYLINE
@@ -1,7 +1,9 @@
 # tests/test_db.py
 import os
 import tempfile
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+
+import pytest
 
 from where_the_plow.db import Database
 
@@ -24,6 +26,9 @@ def test_init_creates_tables():
     assert "vehicles" in table_names
     assert "positions" in table_names
     assert "viewports" in table_names
+    assert "vehicle_latest" in table_names
+    assert "coverage_points" in table_names
+    assert "heatmap_cells" in table_names
     db.close()
     os.unlink(path)
 
@@ -57,6 +62,7 @@ def test_get_coverage_trails_gap_splitting():
     db.upsert_vehicles(
         [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
         now,
+        "st_johns",
     )
     # Two clusters of positions separated by a 5-minute gap
     positions = [
@@ -118,7 +124,7 @@ def test_get_coverage_trails_gap_splitting():
             "is_driving": "maybe",
         },
     ]
-    db.insert_positions(positions, now)
+    db.insert_positions(positions, now, "st_johns")
 
     since = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
     until = datetime(2026, 2, 19, 12, 7, 0, tzinfo=timezone.utc)
@@ -151,11 +157,11 @@ def test_insert_positions_dedup():
         },
     ]
 
-    inserted = db.insert_positions(positions, now)
+    inserted = db.insert_positions(positions, now, "st_johns")
     assert inserted == 1
 
     # Same data again — should be deduped
-    inserted = db.insert_positions(positions, now)
+    inserted = db.insert_positions(positions, now, "st_johns")
     assert inserted == 0
 
     total = db.conn.execute("SELECT count(*) FROM positions").fetchone()[0]
@@ -199,7 +205,7 @@ def test_insert_positions_populates_geom():
             "is_driving": "maybe",
         },
     ]
-    db.insert_positions(positions, now)
+    db.insert_positions(positions, now, "st_johns")
     row = db.conn.execute(
         "SELECT ST_X(geom), ST_Y(geom) FROM positions WHERE vehicle_id='v1'"
     ).fetchone()
@@ -209,6 +215,88 @@ def test_insert_positions_populates_geom():
     os.unlink(path)
 
 
+def test_insert_positions_bulk_batch():
+    """A whole poll is inserted at once and only genuinely new rows are counted."""
+    db, path = make_db()
+    now = datetime.now(timezone.utc)
+    ts1 = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    ts2 = datetime(2026, 2, 19, 12, 0, 6, tzinfo=timezone.utc)
+
+    def pos(vid, ts, speed=10.0):
+        return {
+            "vehicle_id": vid,
+            "timestamp": ts,
+            "longitude": -52.73,
+            "latitude": 47.56,
+            "bearing": 90,
+            "speed": speed,
+            "is_driving": "maybe",
+        }
+
+    inserted = db.insert_positions(
+        [pos("v1", ts1), pos("v2", ts1, None)], now, "st_johns"
+    )
+    assert inserted == 2
+
+    # One repeat, one new report, and an in-batch duplicate
+    inserted = db.insert_positions(
+        [pos("v1", ts1), pos("v1", ts2), pos("v1", ts2)], now, "st_johns"
+    )
+    assert inserted == 1
+
+    rows = db.conn.execute(
+        "SELECT vehicle_id, speed, ST_X(geom) FROM positions "
+        "ORDER BY vehicle_id, timestamp"
+    ).fetchall()
+    assert rows == [
+        ("v1", 10.0, -52.73),
+        ("v1", 10.0, -52.73),
+        ("v2", None, -52.73),
+    ]
+
+    db.close()
+    os.unlink(path)
+
+
+def test_upsert_vehicles_writes_only_changes():
+    """Unchanged vehicles are skipped until last_seen falls behind."""
+    db, path = make_db()
+    t0 = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    fleet = [
+        {"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"},
+        {"vehicle_id": "v2", "description": "Plow 2", "vehicle_type": "LOADER"},
+    ]
+
+    assert db.upsert_vehicles(fleet, t0, "st_johns") == 2
+    # Nothing new at the same time
+    assert db.upsert_vehicles(fleet, t0, "st_johns") == 0
+
+    # Steady state: the changed row is upserted, the rest only get last_seen
+    renamed = [fleet[0], {**fleet[1], "description": "Plow 2B"}]
+    assert db.upsert_vehicles(renamed, t0 + timedelta(seconds=6), "st_johns") == 2
+    row = db.conn.execute(
+        "SELECT description FROM vehicles WHERE vehicle_id='v2'"
+    ).fetchone()
+    assert row[0] == "Plow 2B"
+
+    # Every poll refreshes last_seen for the whole fleet
+    later = t0 + timedelta(seconds=12)
+    assert db.upsert_vehicles(renamed, later, "st_johns") == 2
+    rows = db.conn.execute(
+        "SELECT first_seen, last_seen FROM vehicles ORDER BY vehicle_id"
+    ).fetchall()
+    assert all(r[0] == t0 and r[1] == later for r in rows)
+
+    # A fresh Database seeds the dimension from the table
+    db.close()
+    db = Database(path)
+    db.init()
+    assert db.upsert_vehicles(renamed, later, "st_johns") == 0
+
+    db.close()
+    os.unlink(path)
+
+
 def test_get_stats_empty():
     db, path = make_db()
     stats = db.get_stats()
@@ -236,6 +324,7 @@ def test_get_latest_positions():
             },
         ],
         now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -268,6 +357,7 @@ def test_get_latest_positions():
             },
         ],
         now,
+        "st_johns",
     )
 
     features = db.get_latest_positions(limit=200)
@@ -289,6 +379,7 @@ def test_get_latest_positions_pagination():
             {"vehicle_id": "v2", "description": "Plow 2", "vehicle_type": "LOADER"},
         ],
         now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -312,6 +403,7 @@ def test_get_latest_positions_pagination():
             },
         ],
         now,
+        "st_johns",
     )
 
     page1 = db.get_latest_positions(limit=1)
@@ -331,6 +423,7 @@ def test_get_nearby_vehicles():
             {"vehicle_id": "v2", "description": "Far", "vehicle_type": "LOADER"},
         ],
         now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -354,6 +447,7 @@ def test_get_nearby_vehicles():
             },
         ],
         now,
+        "st_johns",
     )
 
     results = db.get_nearby_vehicles(lat=47.56, lng=-52.73, radius_m=1000, limit=200)
@@ -364,6 +458,109 @@ def test_get_nearby_vehicles():
     os.unlink(path)
 
 
+def _position(vehicle_id: str, ts: datetime, lng: float, lat: float) -> dict:
+    return {
+        "vehicle_id": vehicle_id,
+        "timestamp": ts,
+        "longitude": lng,
+        "latitude": lat,
+        "bearing": 0,
+        "speed": 0.0,
+        "is_driving": "maybe",
+    }
+
+
+def test_insert_positions_drops_non_finite_values():
+    db, path = make_db()
+    now = datetime.now(timezone.utc)
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    bad_speed = {**_position("v1", ts, -52.73, 47.56), "speed": float("nan")}
+    bad_lng = _position("v2", ts, float("inf"), 47.56)
+    assert db.insert_positions([bad_speed, bad_lng], now, "st_johns") == 1
+    row = db.conn.execute("SELECT vehicle_id, speed FROM positions").fetchall()
+    assert row == [("v1", None)]
+
+    db.close()
+    os.unlink(path)
+
+
+def test_vehicle_latest_tracks_newest_position():
+    db, path = make_db()
+    now = datetime.now(timezone.utc)
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    db.upsert_vehicles(
+        [{"vehicle_id": "v1", "description": "Plow", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
+    )
+
+    db.insert_positions(
+        [
+            _position("v1", ts, -52.73, 47.56),
+            _position("v1", ts + timedelta(seconds=6), -52.74, 47.57),
+        ],
+        now,
+        "st_johns",
+    )
+    # A late report for an older timestamp must not move the vehicle back
+    db.insert_positions(
+        [_position("v1", ts - timedelta(seconds=6), -53.0, 47.0)], now, "st_johns"
+    )
+
+    rows = db.conn.execute(
+        "SELECT vehicle_id, city, timestamp, longitude FROM vehicle_latest"
+    ).fetchall()
+    assert len(rows) == 1
+    assert rows[0][:2] == ("v1", "st_johns")
+    assert rows[0][2] == ts + timedelta(seconds=6)
+    assert rows[0][3] == -52.74
+    assert db.get_latest_positions()[0]["longitude"] == -52.74
+
+    # Only the latest position is considered for proximity
+    assert db.get_nearby_vehicles(lat=47.56, lng=-52.73, radius_m=100) == []
+    assert len(db.get_nearby_vehicles(lat=47.57, lng=-52.74, radius_m=100)) == 1
+    assert (
+        db.get_nearby_vehicles(lat=47.57, lng=-52.74, radius_m=100, city="mt_pearl")
+        == []
+    )
+
+    db.close()
+    os.unlink(path)
+
+
+def test_init_backfills_vehicle_latest():
+    db, path = make_db()
+    now = datetime.now(timezone.utc)
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    db.upsert_vehicles(
+        [{"vehicle_id": "v1", "description": "Plow", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
+    )
+    db.insert_positions(
+        [
+            _position("v1", ts, -52.73, 47.56),
+            _position("v1", ts + timedelta(seconds=6), -52.74, 47.57),
+        ],
+        now,
+        "st_johns",
+    )
+    db.conn.execute("DROP TABLE vehicle_latest")
+    db.close()
+
+    db = Database(path)
+    db.init()
+    assert db.get_last_timestamps() == {
+        ("v1", "st_johns"): db.conn.execute(
+            "SELECT epoch_us(max(timestamp)) FROM positions"
+        ).fetchone()[0]
+    }
+    assert db.get_latest_positions()[0]["latitude"] == 47.57
+
+    db.close()
+    os.unlink(path)
+
+
 def test_get_vehicle_history():
     db, path = make_db()
     now = datetime.now(timezone.utc)
@@ -372,7 +569,9 @@ def test_get_vehicle_history():
     ts3 = datetime(2026, 2, 19, 12, 0, 12, tzinfo=timezone.utc)
 
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -405,6 +604,7 @@ def test_get_vehicle_history():
             },
         ],
         now,
+        "st_johns",
     )
 
     history = db.get_vehicle_history("v1", since=ts1, until=ts3, limit=200)
@@ -427,6 +627,7 @@ def test_get_coverage():
             {"vehicle_id": "v2", "description": "Plow 2", "vehicle_type": "LOADER"},
         ],
         now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -450,6 +651,7 @@ def test_get_coverage():
             },
         ],
         now,
+        "st_johns",
     )
 
     coverage = db.get_coverage(since=ts1, until=ts2, limit=200)
@@ -476,6 +678,7 @@ def test_get_coverage_trails():
             {"vehicle_id": "v2", "description": "Plow 2", "vehicle_type": "LOADER"},
         ],
         now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -518,6 +721,7 @@ def test_get_coverage_trails():
             },
         ],
         now,
+        "st_johns",
     )
 
     trails = db.get_coverage_trails(since=ts1, until=ts3)
@@ -543,6 +747,7 @@ def test_get_coverage_trails_downsampling():
     db.upsert_vehicles(
         [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
         now,
+        "st_johns",
     )
     # Insert 10 positions 6s apart (total 54s span)
     positions = []
@@ -559,7 +764,7 @@ def test_get_coverage_trails_downsampling():
                 "is_driving": "maybe",
             }
         )
-    db.insert_positions(positions, now)
+    db.insert_positions(positions, now, "st_johns")
 
     since = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
     until = datetime(2026, 2, 19, 12, 0, 54, tzinfo=timezone.utc)
@@ -574,329 +779,178 @@ def test_get_coverage_trails_downsampling():
     os.unlink(path)
 
 
-def test_get_latest_positions_with_trails_basic():
-    """Each vehicle gets a trail array of [lng, lat] pairs, current position is the latest."""
+def test_coverage_points_extend_across_polls():
+    """The rollup continues each vehicle's open segment from poll to poll."""
     db, path = make_db()
     now = datetime.now(timezone.utc)
-    ts1 = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
-    ts2 = datetime(2026, 2, 19, 12, 0, 6, tzinfo=timezone.utc)
-    ts3 = datetime(2026, 2, 19, 12, 0, 12, tzinfo=timezone.utc)
-
-    db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
-    )
-    db.insert_positions(
-        [
-            {
-                "vehicle_id": "v1",
-                "timestamp": ts1,
-                "longitude": -52.73,
-                "latitude": 47.56,
-                "bearing": 0,
-                "speed": 5.0,
-                "is_driving": "maybe",
-            },
-            {
-                "vehicle_id": "v1",
-                "timestamp": ts2,
-                "longitude": -52.74,
-                "latitude": 47.57,
-                "bearing": 90,
-                "speed": 10.0,
-                "is_driving": "maybe",
-            },
-            {
-                "vehicle_id": "v1",
-                "timestamp": ts3,
-                "longitude": -52.75,
-                "latitude": 47.58,
-                "bearing": 180,
-                "speed": 15.0,
-                "is_driving": "maybe",
-            },
-        ],
-        now,
-    )
-
-    results = db.get_latest_positions_with_trails(trail_points=6)
-    assert len(results) == 1
-
-    v1 = results[0]
-    # Current position should be the latest
-    assert abs(v1["longitude"] - (-52.75)) < 0.001
-    assert abs(v1["latitude"] - 47.58) < 0.001
-    assert v1["bearing"] == 180
-    assert v1["speed"] == 15.0
-
-    # Trail should contain all 3 positions in chronological order
-    assert len(v1["trail"]) == 3
-    assert v1["trail"][0] == [-52.73, 47.56]
-    assert v1["trail"][1] == [-52.74, 47.57]
-    assert v1["trail"][2] == [-52.75, 47.58]
-
-    db.close()
-    os.unlink(path)
-
-
-def test_get_latest_positions_with_trails_multiple_vehicles():
-    """Multiple vehicles each get their own independent trail."""
-    db, path = make_db()
-    now = datetime.now(timezone.utc)
-    ts1 = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
-    ts2 = datetime(2026, 2, 19, 12, 0, 6, tzinfo=timezone.utc)
-
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
     db.upsert_vehicles(
         [
             {"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"},
-            {
-                "vehicle_id": "v2",
-                "description": "Plow 2",
-                "vehicle_type": "SA PLOW TRUCK",
-            },
+            {"vehicle_id": "v2", "description": "Plow 2", "vehicle_type": "LOADER"},
         ],
         now,
+        "st_johns",
     )
+    # One poll every 6s for 3 minutes, then nothing from v1 for 5 minutes
+    for s in range(0, 540, 6):
+        t = ts + timedelta(seconds=s)
+        polled = [_position("v2", t, -52.80, 47.50 + s * 1e-5)]
+        if s < 180 or s >= 480:
+            polled.append(_position("v1", t, -52.73 + s * 1e-5, 47.56))
+        db.insert_positions(polled, now, "st_johns")
+    # A late, out-of-order report is stored but not rolled up
     db.insert_positions(
-        [
-            {
-                "vehicle_id": "v1",
-                "timestamp": ts1,
-                "longitude": -52.73,
-                "latitude": 47.56,
-                "bearing": 0,
-                "speed": 5.0,
-                "is_driving": "maybe",
-            },
-            {
-                "vehicle_id": "v1",
-                "timestamp": ts2,
-                "longitude": -52.74,
-                "latitude": 47.57,
-                "bearing": 90,
-                "speed": 10.0,
-                "is_driving": "maybe",
-            },
-            {
-                "vehicle_id": "v2",
-                "timestamp": ts1,
-                "longitude": -52.80,
-                "latitude": 47.50,
-                "bearing": 180,
-                "speed": 0.0,
-                "is_driving": "no",
-            },
-            {
-                "vehicle_id": "v2",
-                "timestamp": ts2,
-                "longitude": -52.81,
-                "latitude": 47.51,
-                "bearing": 270,
-                "speed": 8.0,
-                "is_driving": "maybe",
-            },
-        ],
-        now,
+        [_position("v1", ts + timedelta(seconds=3), 0.0, 0.0)], now, "st_johns"
     )
 
-    results = db.get_latest_positions_with_trails(trail_points=6)
-    assert len(results) == 2
+    trails = db.get_coverage_trails(since=ts, until=ts + timedelta(hours=1))
+    assert [t["vehicle_id"] for t in trails] == ["v1", "v1", "v2"]
+    # 0-174s in 30s buckets, 480-534s in 30s buckets, and v2 throughout
+    assert [len(t["coordinates"]) for t in trails] == [6, 2, 18]
+    assert trails[1]["timestamps"][0] == (ts + timedelta(seconds=480)).isoformat()
+    assert all(t["city"] == "st_johns" for t in trails)
 
-    v1 = next(r for r in results if r["vehicle_id"] == "v1")
-    v2 = next(r for r in results if r["vehicle_id"] == "v2")
-
-    assert len(v1["trail"]) == 2
-    assert len(v2["trail"]) == 2
-    assert v1["trail"][0] == [-52.73, 47.56]
-    assert v2["trail"][1] == [-52.81, 47.51]
+    rollup = (
+        "SELECT vehicle_id, city, segment_id, timestamp, longitude, latitude "
+        "FROM coverage_points ORDER BY ALL"
+    )
+    incremental = db.conn.execute(rollup).fetchall()
+    db.conn.execute("DELETE FROM positions WHERE longitude = 0.0")
+    db.conn.execute("DROP TABLE coverage_points")
+    db.close()
 
-    # Current position fields should reflect the latest position
-    assert v1["vehicle_type"] == "LOADER"
-    assert v2["vehicle_type"] == "SA PLOW TRUCK"
+    # Backfilling from positions yields the same rollup
+    db = Database(path)
+    db.init()
+    backfilled = db.conn.execute(rollup).fetchall()
+    assert backfilled == incremental
+    assert db.conn.execute(
+        "SELECT vehicle_id, segment_id FROM vehicle_latest ORDER BY vehicle_id"
+    ).fetchall() == [("v1", 2), ("v2", 1)]
 
     db.close()
     os.unlink(path)
 
 
-def test_get_latest_positions_with_trails_capped():
-    """Trail is capped to trail_points most recent positions."""
+def test_coverage_levels():
     db, path = make_db()
     now = datetime.now(timezone.utc)
-
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
     )
-    # Insert 10 positions
-    positions = []
-    for i in range(10):
-        positions.append(
-            {
-                "vehicle_id": "v1",
-                "timestamp": datetime(2026, 2, 19, 12, 0, i * 6, tzinfo=timezone.utc),
-                "longitude": -52.73 + i * 0.01,
-                "latitude": 47.56,
-                "bearing": 0,
-                "speed": 10.0,
-                "is_driving": "maybe",
-            }
+    # 70 minutes of reports every 6s, ingested ten minutes at a time
+    for start in range(0, 4200, 600):
+        db.insert_positions(
+            [
+                _position("v1", ts + timedelta(seconds=s), -52.73 + s * 1e-5, 47.56)
+                for s in range(start, start + 600, 6)
+            ],
+            now,
+            "st_johns",
         )
-    db.insert_positions(positions, now)
-
-    results = db.get_latest_positions_with_trails(trail_points=4)
-    assert len(results) == 1
-    v1 = results[0]
-
-    # Should only have 4 trail points (the 4 most recent)
-    assert len(v1["trail"]) == 4
-    # Current position is the last inserted (i=9)
-    assert abs(v1["longitude"] - (-52.73 + 9 * 0.01)) < 0.001
-    # Trail should start from position i=6 (10 - 4 = 6th oldest)
-    assert abs(v1["trail"][0][0] - (-52.73 + 6 * 0.01)) < 0.001
+    until = ts + timedelta(hours=2)
+    counts = {30: 140, 120: 35, 600: 7, 3600: 2}
+    assert db.count_coverage_levels(ts, until) == counts
+    [trail] = db.get_coverage_trails(ts, until, resolution=600)
+    assert trail["timestamps"] == [
+        (ts + timedelta(minutes=m)).isoformat() for m in range(0, 70, 10)
+    ]
+    assert db.pick_coverage_resolution(ts, until, budget=1000) == (30, 140)
+    assert db.pick_coverage_resolution(ts, until, budget=40) == (120, 35)
+    assert db.pick_coverage_resolution(ts, until, budget=40, finest=300) == (600, 7)
+    assert db.pick_coverage_resolution(ts, until, budget=1) == (3600, 2)
+    assert db.count_coverage_levels(ts, until, city="mt_pearl")[30] == 0
+
+    # A database from before levels gets them backfilled
+    db.conn.execute("ALTER TABLE coverage_points DROP COLUMN level")
+    db.close()
+    db = Database(path)
+    db.init()
+    assert db.count_coverage_levels(ts, until) == counts
 
     db.close()
     os.unlink(path)
 
 
-def test_get_latest_positions_with_trails_single_position():
-    """A vehicle with only 1 position still gets a trail with 1 entry."""
+def test_get_coverage_trails_city_filter():
     db, path = make_db()
     now = datetime.now(timezone.utc)
     ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
-
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "mp1", "description": "Plow", "vehicle_type": "LOADER"}],
+        now,
+        "mt_pearl",
     )
     db.insert_positions(
         [
-            {
-                "vehicle_id": "v1",
-                "timestamp": ts,
-                "longitude": -52.73,
-                "latitude": 47.56,
-                "bearing": 45,
-                "speed": 0.0,
-                "is_driving": "no",
-            },
+            _position("mp1", ts, -52.81, 47.52),
+            _position("mp1", ts + timedelta(seconds=30), -52.82, 47.52),
         ],
         now,
+        "mt_pearl",
     )
-
-    results = db.get_latest_positions_with_trails(trail_points=6)
-    assert len(results) == 1
-    v1 = results[0]
-    assert len(v1["trail"]) == 1
-    assert v1["trail"][0] == [-52.73, 47.56]
-    assert v1["bearing"] == 45
+    until = ts + timedelta(minutes=1)
+    assert db.get_coverage_trails(since=ts, until=until, city="st_johns") == []
+    trails = db.get_coverage_trails(since=ts, until=until, city="mt_pearl")
+    assert len(trails) == 1
+    assert trails[0]["city"] == "mt_pearl"
 
     db.close()
     os.unlink(path)
 
 
-def test_get_latest_positions_with_trails_gap_filtering():
-    """Gaps > 120s in the trail should truncate to only the contiguous recent segment."""
+def test_heatmap_rollup_matches_points():
+    """Hourly cells plus partial edge hours count every coverage point."""
     db, path = make_db()
     now = datetime.now(timezone.utc)
-
+    ts = datetime(2026, 2, 19, 11, 40, 0, tzinfo=timezone.utc)
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
     )
-    # 5 positions: first two are close together, then a 5-minute gap, then three more
-    positions = [
-        {
-            "vehicle_id": "v1",
-            "timestamp": datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc),
-            "longitude": -52.73,
-            "latitude": 47.56,
-            "bearing": 0,
-            "speed": 10.0,
-            "is_driving": "maybe",
-        },
-        {
-            "vehicle_id": "v1",
-            "timestamp": datetime(2026, 2, 19, 12, 0, 30, tzinfo=timezone.utc),
-            "longitude": -52.74,
-            "latitude": 47.57,
-            "bearing": 0,
-            "speed": 10.0,
-            "is_driving": "maybe",
-        },
-        # 5-minute gap here (300s > 120s threshold)
-        {
-            "vehicle_id": "v1",
-            "timestamp": datetime(2026, 2, 19, 12, 5, 30, tzinfo=timezone.utc),
-            "longitude": -52.80,
-            "latitude": 47.50,
-            "bearing": 90,
-            "speed": 15.0,
-            "is_driving": "maybe",
-        },
-        {
-            "vehicle_id": "v1",
-            "timestamp": datetime(2026, 2, 19, 12, 6, 0, tzinfo=timezone.utc),
-            "longitude": -52.81,
-            "latitude": 47.51,
-            "bearing": 90,
-            "speed": 15.0,
-            "is_driving": "maybe",
-        },
-        {
-            "vehicle_id": "v1",
-            "timestamp": datetime(2026, 2, 19, 12, 6, 30, tzinfo=timezone.utc),
-            "longitude": -52.82,
-            "latitude": 47.52,
-            "bearing": 90,
-            "speed": 15.0,
-            "is_driving": "maybe",
-        },
-    ]
-    db.insert_positions(positions, now)
-
-    results = db.get_latest_positions_with_trails(trail_points=10)
-    assert len(results) == 1
-    v1 = results[0]
-
-    # Should only have the 3 positions after the gap (contiguous recent segment)
-    assert len(v1["trail"]) == 3
-    assert v1["trail"][0] == [-52.80, 47.50]
-    assert v1["trail"][1] == [-52.81, 47.51]
-    assert v1["trail"][2] == [-52.82, 47.52]
-
-    # Current position should be the most recent
-    assert abs(v1["longitude"] - (-52.82)) < 0.001
-
-    db.close()
-    os.unlink(path)
-
-
-def test_get_latest_positions_with_trails_no_gap():
-    """When all positions are within the gap threshold, the full trail is returned."""
-    db, path = make_db()
-    now = datetime.now(timezone.utc)
-
+    # Two hours driving east at ~5 m/s, one poll a minute, across 3 hours.
+    for m in range(0, 120):
+        t = ts + timedelta(minutes=m)
+        db.insert_positions(
+            [_position("v1", t, -52.75 + m * 4e-4, 47.56)], now, "st_johns"
+        )
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "mp1", "description": "Plow", "vehicle_type": "LOADER"}],
+        now,
+        "mt_pearl",
     )
-    # 4 positions all 30s apart (well within 120s threshold)
-    from datetime import timedelta
-
-    base = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
-    positions = [
-        {
-            "vehicle_id": "v1",
-            "timestamp": base + timedelta(seconds=i * 30),
-            "longitude": -52.73 + i * 0.01,
-            "latitude": 47.56,
-            "bearing": 0,
-            "speed": 10.0,
-            "is_driving": "maybe",
-        }
-        for i in range(4)
-    ]
-    db.insert_positions(positions, now)
+    db.insert_positions([_position("mp1", ts, -52.81, 47.52)], now, "mt_pearl")
+
+    hours = db.conn.execute("SELECT count(DISTINCT hour) FROM heatmap_cells")
+    assert hours.fetchone()[0] == 3
+    since = ts + timedelta(minutes=7, seconds=30)
+    until = ts + timedelta(minutes=95)
+    cells = db.get_heatmap(since, until, city="st_johns")
+    # Points 8..95 inclusive, i.e. 88 of them, each about 30 m apart.
+    assert sum(c[2] for c in cells) == 88
+    assert cells[-1][3] == until.isoformat()
+    assert all(c[1] == pytest.approx(47.56, abs=db.HEATMAP_CELL_LAT) for c in cells)
+    coarse = db.get_heatmap(since, until, city="st_johns", scale=4)
+    assert sum(c[2] for c in coarse) == 88
+    assert len(coarse) < len(cells)
+    both = db.get_heatmap(ts, until)
+    assert len(both) == len(db.get_heatmap(ts, until, "st_johns")) + 1
+
+    rollup = "SELECT * FROM heatmap_cells ORDER BY ALL"
+    incremental = db.conn.execute(rollup).fetchall()
+    db.conn.execute("DROP TABLE heatmap_cells")
+    db.close()
 
-    results = db.get_latest_positions_with_trails(trail_points=10)
-    assert len(results) == 1
-    # All 4 positions should be in the trail (no gaps to truncate)
-    assert len(results[0]["trail"]) == 4
+    # Backfilling from coverage_points yields the same rollup
+    db = Database(path)
+    db.init()
+    backfilled = db.conn.execute(rollup).fetchall()
+    assert backfilled == incremental
 
     db.close()
     os.unlink(path)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from where_the_plow.db import Database
+from where_the_plow.dedup import DedupIndex
+
+
+def make_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    db = Database(path)
+    db.init()
+    return db, path
+
+
+def make_position(vid, ts):
+    return {
+        "vehicle_id": vid,
+        "timestamp": ts,
+        "longitude": -52.73,
+        "latitude": 47.56,
+        "bearing": 0,
+        "speed": 0.0,
+        "is_driving": "no",
+    }
+
+
+def test_filter_drops_repeated_timestamps():
+    ts1 = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    ts2 = datetime(2026, 2, 19, 12, 0, 6, tzinfo=timezone.utc)
+    index = DedupIndex()
+
+    fresh = index.filter([make_position("v1", ts1)], "st_johns")
+    assert len(fresh) == 1
+    index.record(fresh, "st_johns")
+
+    fresh = index.filter(
+        [make_position("v1", ts1), make_position("v2", ts1)], "st_johns"
+    )
+    assert [p["vehicle_id"] for p in fresh] == ["v2"]
+
+    # Same vehicle id in another city is tracked separately
+    assert len(index.filter([make_position("v1", ts1)], "mt_pearl")) == 1
+    assert len(index.filter([make_position("v1", ts2)], "st_johns")) == 1
+
+    assert index.hits == 1
+    assert index.misses == 4
+    assert index.stats()["new_ratio"] == 0.8
+
+
+def test_unrecorded_positions_are_not_dropped():
+    """Positions are only considered stored after record()."""
+    ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    index = DedupIndex()
+    index.filter([make_position("v1", ts)], "st_johns")
+    assert len(index.filter([make_position("v1", ts)], "st_johns")) == 1
+
+
+def test_from_db_seeds_latest_timestamps():
+    db, path = make_db()
+    now = datetime.now(timezone.utc)
+    ts1 = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+    ts2 = datetime(2026, 2, 19, 12, 0, 6, tzinfo=timezone.utc)
+    db.insert_positions(
+        [make_position("v1", ts1), make_position("v1", ts2)], now, "st_johns"
+    )
+
+    index = DedupIndex.from_db(db)
+    assert len(index) == 1
+    assert index.filter([make_position("v1", ts2)], "st_johns") == []
+    assert index.hits == 1
+
+    db.close()
+    os.unlink(path)
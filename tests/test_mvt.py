@@ -0,0 +1,93 @@
+# tests/test_mvt.py
+import math
+import random
+
+from where_the_plow.mvt import TrailIndex, clip_line, encode_tile, tile_bounds
+
+
+def test_clip_line_splits_where_the_line_leaves_and_reenters():
+    points = [(100.0, 100.0), (200.0, 100.0), (5000.0, 100.0), (200.0, 300.0)]
+    parts = clip_line(points, 0, 4096)
+    assert parts == [
+        [(100, 100), (200, 100), (4096, 100)],
+        [(4096, 138), (200, 300)],
+    ]
+
+
+def test_clip_line_drops_segments_outside_and_repeated_cells():
+    points = [(-500.0, -500.0), (-400.0, -500.0), (-10.0, 5000.0)]
+    assert clip_line(points, 0, 4096) == []
+    assert clip_line([(1.0, 1.0), (1.2, 1.1), (3.0, 3.0)], 0, 4096) == [
+        [(1, 1), (3, 3)]
+    ]
+
+
+def test_tile_bounds():
+    west, south, east, north = tile_bounds(0, 0, 0)
+    assert (west, east) == (-180, 180)
+    assert math.isclose(north, 85.0511, abs_tol=1e-4)
+    assert math.isclose(south, -85.0511, abs_tol=1e-4)
+
+
+def test_encode_tile_layers_and_properties(tile_for, decode_tile):
+    trail = {
+        "vehicle_id": "v1",
+        "description": "2222 SA PLOW TRUCK",
+        "vehicle_type": "SA PLOW TRUCK",
+        "coordinates": [[-52.73, 47.56], [-52.74, 47.57], [-52.75, 47.58]],
+        "times_us": [1_000_000, 31_000_000, 61_000_000],
+        "city": "st_johns",
+    }
+    far = {**trail, "vehicle_id": "far", "coordinates": [[10.0, 10.0], [10.1, 10.1]]}
+    x, y = tile_for(-52.74, 47.57, 10)
+    layers = decode_tile(encode_tile([trail, far], 10, x, y))
+    [(geom_type, props, parts)] = layers["coverage"]
+    assert geom_type == 2
+    assert props == {
+        "vehicle_id": "v1",
+        "vehicle_type": "SA PLOW TRUCK",
+        "description": "2222 SA PLOW TRUCK",
+        "city": "st_johns",
+        "start": 1,
+        "end": 61,
+    }
+    assert len(parts) == 1 and len(parts[0]) == 3
+    # Moving north-west: x decreases, y decreases.
+    assert parts[0][0][0] > parts[0][2][0] and parts[0][0][1] > parts[0][2][1]
+    [(geom_type, props, points)] = layers["heatmap"]
+    assert geom_type == 1
+    assert props == {"vehicle_type": "SA PLOW TRUCK"}
+    assert [p for part in points for p in part] == parts[0]
+
+
+def test_encode_tile_empty():
+    assert encode_tile([], 0, 0, 0) == b""
+
+
+def test_trail_index_matches_encode_tile(tile_for):
+    rng = random.Random(4)
+    trails = []
+    for v in range(40):
+        lng, lat = rng.uniform(-52.9, -52.6), rng.uniform(47.4, 47.7)
+        coords = []
+        for _ in range(rng.randrange(2, 60)):
+            lng += rng.gauss(0, 0.003)
+            lat += rng.gauss(0, 0.002)
+            coords.append([lng, lat])
+        trails.append(
+            {
+                "vehicle_id": f"v{v}",
+                "description": "",
+                "vehicle_type": "LOADER",
+                "coordinates": coords,
+                "times_us": [i * 30_000_000 for i in range(len(coords))],
+                "city": "st_johns",
+            }
+        )
+    index = TrailIndex(trails)
+    for z in (8, 11, 12, 14):
+        x0, y0 = tile_for(-52.95, 47.75, z)
+        x1, y1 = tile_for(-52.55, 47.35, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                assert index.encode_tile(z, x, y) == encode_tile(trails, z, x, y)
@@ -0,0 +1,37 @@
+import pytest
+
+from where_the_plow.client import parse_avl_batch
+from where_the_plow.pbf import PbfDecodeError, decode_feature_collection
+
+
+def test_decode_matches_json(avl_pbf, avl_response):
+    decoded = decode_feature_collection(avl_pbf)
+    assert decoded == avl_response
+    assert parse_avl_batch(decoded).to_json() == parse_avl_batch(avl_response).to_json()
+
+
+def test_decode_empty_collection():
+    # version "11.5", queryResult { featureResult {} }
+    assert decode_feature_collection(b"\n\x0411.5\x12\x02\n\x00") == {"features": []}
+
+
+def test_decode_rejects_json():
+    with pytest.raises(PbfDecodeError):
+        decode_feature_collection(b'{"error": {"code": 400}}')
+
+
+@pytest.mark.parametrize("cut", [1, 7, 100, 400])
+def test_decode_rejects_truncated(avl_pbf, cut):
+    with pytest.raises(PbfDecodeError):
+        decode_feature_collection(avl_pbf[:cut])
+
+
+def test_decode_rejects_wrong_value_wire_type(avl_pbf):
+    # The first attribute's string_value (field 1, LEN) re-tagged as
+    # double_value (field 3), which must be a fixed64.
+    string_value = b"\n\x0f281474984421544"
+    assert avl_pbf.count(string_value) == 1
+    with pytest.raises(PbfDecodeError):
+        decode_feature_collection(
+            avl_pbf.replace(string_value, b"\x1a\x0f281474984421544")
+        )
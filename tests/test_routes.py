@@ -17,7 +17,7 @@ def test_client():
     with patch.dict(os.environ, {"DB_PATH": path}):
         with patch("where_the_plow.collector.run", new_callable=AsyncMock) as mock_run:
 
-            async def hang_forever(db, store):
+            async def hang_forever(db, store, writer):
                 import asyncio
 
                 await asyncio.Event().wait()
@@ -127,6 +127,90 @@ def test_get_vehicles(test_client):
     assert "vehicle_id" in f["properties"]
 
 
+def test_get_vehicles_realtime_etag(test_client):
+    import where_the_plow.main
+    from where_the_plow.snapshot import RealtimeSnapshots, TrailBuffer
+
+    db = where_the_plow.main.app.state.db
+    realtime = RealtimeSnapshots()
+    realtime.publish("st_johns", TrailBuffer.from_db(db).snapshot("st_johns"))
+    where_the_plow.main.app.state.store["realtime"] = realtime
+
+    resp = test_client.get("/vehicles", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["etag"] == realtime.get().gzip_etag
+    assert len(resp.json()["features"]) == 2
+
+    resp = test_client.get(
+        "/vehicles",
+        params={"city": "st_johns"},
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert resp.status_code == 200
+    assert "content-encoding" not in resp.headers
+    assert resp.content == realtime.get("st_johns").body
+
+    for refused in ("gzip;q=0", "br, gzip; q=0.0", "*;q=0", "deflate, *;q=0"):
+        resp = test_client.get("/vehicles", headers={"Accept-Encoding": refused})
+        assert "content-encoding" not in resp.headers, refused
+        assert resp.headers["etag"] == realtime.get().etag
+    for accepted in ("gzip;q=0.5, identity", "*", "br;q=1, *;q=0.1"):
+        resp = test_client.get("/vehicles", headers={"Accept-Encoding": accepted})
+        assert resp.headers["content-encoding"] == "gzip", accepted
+
+    resp = test_client.get(
+        "/vehicles",
+        params={"city": "st_johns"},
+        headers={"If-None-Match": resp.headers["etag"]},
+    )
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    resp = test_client.get("/vehicles", params={"city": "mt_pearl"})
+    assert resp.json()["features"] == []
+
+
+def test_get_vehicle_changes(test_client):
+    import where_the_plow.main
+    from where_the_plow.snapshot import RealtimeSnapshots, TrailBuffer
+
+    resp = test_client.get("/vehicles/changes", params={"since_version": "x.0"})
+    assert resp.status_code == 503
+
+    db = where_the_plow.main.app.state.db
+    realtime = RealtimeSnapshots()
+    realtime.publish("st_johns", TrailBuffer.from_db(db).snapshot("st_johns"))
+    where_the_plow.main.app.state.store["realtime"] = realtime
+
+    version = test_client.get("/vehicles").headers["x-snapshot-version"]
+    assert version == f"{realtime.epoch}.1"
+
+    resp = test_client.get("/vehicles/changes", params={"since_version": version})
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "version": version,
+        "full": False,
+        "features": [],
+        "removed": [],
+    }
+
+    since = f"{realtime.epoch}.0"
+    resp = test_client.get("/vehicles/changes", params={"since_version": since})
+    assert not resp.json()["full"]
+    assert len(resp.json()["features"]) == 2
+
+    # A restarted server counts versions from 0 again under a new epoch;
+    # the client's old version id must not be read as one of the new ones.
+    restarted = RealtimeSnapshots()
+    restarted.publish("st_johns", TrailBuffer.from_db(db).snapshot("st_johns"))
+    where_the_plow.main.app.state.store["realtime"] = restarted
+    resp = test_client.get("/vehicles/changes", params={"since_version": since})
+    assert resp.headers["x-snapshot-version"] == f"{restarted.epoch}.1"
+    assert resp.json()["full"]
+    assert len(resp.json()["features"]) == 2
+
+
 def test_get_vehicles_pagination(test_client):
     resp = test_client.get("/vehicles?limit=1")
     data = resp.json()
@@ -146,6 +230,20 @@ def test_get_vehicles_nearby(test_client):
     assert data["features"][0]["properties"]["vehicle_id"] == "v1"
 
 
+def test_get_vehicles_nearest(test_client):
+    resp = test_client.get("/vehicles/nearest?lat=47.58&lng=-52.75&k=5")
+    assert resp.status_code == 200
+    features = resp.json()["features"]
+    assert [f["properties"]["vehicle_id"] for f in features] == ["v1", "v2"]
+    assert features[0]["properties"]["distance_m"] == 0.0
+    assert features[1]["properties"]["distance_m"] > 8000
+
+    resp = test_client.get("/vehicles/nearest?lat=47.58&lng=-52.75&k=1")
+    assert len(resp.json()["features"]) == 1
+    resp = test_client.get("/vehicles/nearest?lat=47.58&lng=-52.75&k=0")
+    assert resp.status_code == 422
+
+
 def test_get_vehicle_history(test_client):
     resp = test_client.get(
         "/vehicles/v1/history?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
@@ -174,6 +272,130 @@ def test_get_coverage(test_client):
     assert len(f["properties"]["timestamps"]) == len(f["geometry"]["coordinates"])
 
 
+def test_get_coverage_cached_per_city(test_client, isolated_cache):
+    from where_the_plow import cache
+
+    url = "/coverage?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
+    first = test_client.get(url)
+    db = test_client.app.state.db
+    with patch.object(db, "count_coverage_levels", side_effect=AssertionError):
+        assert test_client.get(url).content == first.content
+    assert cache.memory.hits == 1
+    assert cache.levels.hits == 1
+    resp = test_client.get(url + "&city=mt_pearl")
+    assert resp.json()["features"] == []
+
+
+def test_get_coverage_compact_formats(test_client, decode_polyline, decode_binary):
+    url = "/coverage?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
+    geojson = test_client.get(url).json()["features"][0]
+    resp = test_client.get(url + "&format=polyline&precision=6")
+    assert resp.headers["content-type"] == "application/json"
+    [trail] = decode_polyline(resp.content)
+    assert trail["coordinates"] == geojson["geometry"]["coordinates"]
+    resp = test_client.get(url, headers={"Accept": "application/x-plow-coverage"})
+    assert resp.headers["content-type"] == "application/x-plow-coverage"
+    assert resp.headers["vary"] == "Accept"
+    [trail] = decode_binary(resp.content)
+    assert trail["vehicle_id"] == "v1"
+    assert len(trail["seconds"]) == len(geojson["properties"]["timestamps"])
+    assert test_client.get(url + "&format=xml").status_code == 422
+    assert test_client.get(url + "&format=binary&precision=8").status_code == 422
+
+
+def test_get_coverage_simplified(test_client):
+    url = "/coverage?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
+    full = test_client.get(url).json()["features"][0]
+    # v1's three positions lie on a straight line
+    for params in ("&tolerance=5", "&zoom=12"):
+        f = test_client.get(url + params).json()["features"][0]
+        coords = f["geometry"]["coordinates"]
+        assert coords == [full["geometry"]["coordinates"][i] for i in (0, -1)]
+        ts = full["properties"]["timestamps"]
+        assert f["properties"]["timestamps"] == [ts[0], ts[-1]]
+    assert test_client.get(url + "&tolerance=-1").status_code == 422
+    assert test_client.get(url + "&zoom=23").status_code == 422
+
+
+def test_get_coverage_resolution(test_client, isolated_cache):
+    url = "/coverage?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
+    resp = test_client.get(url)
+    assert resp.headers["x-coverage-resolution"] == "30"
+    assert resp.json()["resolution_s"] == 30
+    # v1's three positions are 30 s apart, all within one 2-minute bucket
+    resp = test_client.get(url + "&resolution=100")
+    assert resp.headers["x-coverage-resolution"] == "120"
+    assert resp.json()["features"] == []
+    resp = test_client.get(url + "&resolution=7200&format=binary")
+    assert resp.headers["x-coverage-resolution"] == "3600"
+
+
+def test_get_coverage_point_budget(test_client, isolated_cache, monkeypatch):
+    url = "/coverage?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
+    state = test_client.app.state
+    # Four points at 30 s; v1's first point and v2's open every coarser bucket
+    monkeypatch.setattr(state, "coverage_max_points", 2)
+    resp = test_client.get(url)
+    assert resp.headers["x-coverage-resolution"] == "120"
+    monkeypatch.setattr(state, "coverage_max_points", 1)
+    resp = test_client.get(url)
+    assert resp.status_code == 413
+    assert resp.json()["points"] == 2
+    assert resp.json()["max_points"] == 1
+    assert test_client.get(url + "&format=binary").status_code == 413
+    tile = "/coverage/tiles/10/0/0.mvt?since=2026-02-19T00:00:00Z"
+    assert test_client.get(tile).status_code == 413
+
+
+def test_get_coverage_tile(test_client, isolated_cache, tile_for, decode_tile):
+    from where_the_plow import cache
+
+    x, y = tile_for(-52.74, 47.57, 10)
+    url = (
+        f"/coverage/tiles/10/{x}/{y}.mvt"
+        "?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
+    )
+    resp = test_client.get(url)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    assert resp.headers["cache-control"] == "public, max-age=86400"
+    [(_, props, _)] = decode_tile(resp.content)["coverage"]
+    assert props["vehicle_id"] == "v1"
+    assert test_client.get(url).content == resp.content
+    assert cache.memory.hits == 1
+    assert list(isolated_cache.iterdir()) == []
+    assert test_client.get(url + "&vehicle_type=LOADER").content == b""
+    typed = test_client.get(url + "&vehicle_type=SA%20PLOW%20TRUCK")
+    assert typed.content == resp.content
+    assert test_client.get(url.replace(f"/{x}/", "/0/")).content == b""
+    # Tiles of one window share its trail index, one per vehicle_type filter.
+    assert len(test_client.app.state.store["coverage_tiles"]) == 3
+    assert test_client.get("/coverage/tiles/1/2/0.mvt").status_code == 404
+
+
+def test_get_coverage_heatmap(test_client):
+    url = "/coverage/heatmap?since=2026-02-19T00:00:00Z&until=2026-02-20T00:00:00Z"
+    data = test_client.get(url).json()
+    assert data["type"] == "FeatureCollection"
+    assert data["cell_size_m"] == 100.2
+    # v1's three positions and v2's one, each in its own cell
+    assert sum(f["properties"]["count"] for f in data["features"]) == 4
+    assert len(data["features"]) == 4
+    coarse = test_client.get(url + "&cell=64").json()
+    assert sum(f["properties"]["count"] for f in coarse["features"]) == 4
+    assert len(coarse["features"]) < 4
+    mt_pearl = test_client.get(url + "&city=mt_pearl").json()
+    assert mt_pearl["features"] == []
+
+
+def test_get_coverage_live_window(test_client):
+    resp = test_client.get("/coverage")
+    assert resp.status_code == 200
+    assert resp.json()["features"] == []
+    live = test_client.get("/health").json()["coverage_cache"]["live"]
+    assert live["served"] == 1
+
+
 def test_get_stats(test_client):
     resp = test_client.get("/stats")
     assert resp.status_code == 200
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from where_the_plow.scheduler import AdaptiveInterval, Ticker
+
+
+def make_schedule():
+    return AdaptiveInterval(min_interval=6, max_interval=30, idle_interval=120)
+
+
+def test_starts_at_min_interval():
+    assert make_schedule().interval == 6
+
+
+def test_relaxes_when_nothing_changes():
+    s = make_schedule()
+    s.observe(5, 10, now=0)
+    intervals = [s.observe(0, 10, now=t) for t in range(6, 400, 6)]
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == 30
+
+
+def test_relaxation_capped_by_observed_update_period():
+    s = make_schedule()
+    # New data every 12s
+    for t in range(0, 120, 12):
+        s.observe(3, 10, now=t)
+    assert s.update_period == pytest.approx(12)
+    # Shortly after a change, don't wait longer than the observed period
+    s.interval = 20
+    assert s.observe(0, 10, now=114) == pytest.approx(12)
+
+
+def test_tightens_quickly_when_data_arrives():
+    s = make_schedule()
+    s.interval = 30
+    assert s.observe(4, 10, now=0) == 15
+    assert s.observe(4, 10, now=15) == 7.5
+    assert s.observe(4, 10, now=22.5) == 6
+
+
+def test_backs_off_hard_with_no_active_vehicles():
+    s = make_schedule()
+    assert s.observe(0, 0, now=0) == 120
+    # Activity resumes: drop to the max interval and keep tightening
+    assert s.observe(2, 3, now=120) == 15
+
+
+def test_stats_track_change_rate():
+    s = make_schedule()
+    s.observe(1, 1, now=0)
+    s.observe(0, 1, now=6)
+    stats = s.stats()
+    assert 0 < stats["change_rate"] < 1
+    assert stats["interval_s"] >= 6
+
+
+async def test_ticker_keeps_fixed_rate():
+    """Work time inside a tick does not push later ticks back."""
+    ticker = Ticker(AdaptiveInterval(0.05, 0.05, 0.05))
+    first = await ticker.wait()
+    ticks = [first]
+    for _ in range(3):
+        await asyncio.sleep(0.02)  # simulated poll
+        ticks.append(await ticker.wait())
+    assert ticks == pytest.approx([first + i * 0.05 for i in range(4)])
+    assert ticker.skipped == 0
+    assert ticker.ticks == 4
+
+
+async def test_ticker_skips_overrun_ticks():
+    ticker = Ticker(AdaptiveInterval(0.05, 0.05, 0.05))
+    first = await ticker.wait()
+    await asyncio.sleep(0.12)  # overruns two ticks
+    tick = await ticker.wait()
+    assert ticker.skipped == 2
+    assert tick == pytest.approx(first + 0.15)
+    assert ticker.stats()["max_lag_s"] < 0.05
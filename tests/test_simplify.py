@@ -0,0 +1,64 @@
+# tests/test_simplify.py
+from where_the_plow.simplify import (
+    simplify_indices,
+    simplify_trails,
+    zoom_tolerance_m,
+)
+
+# About 7.5 m of longitude at 47.5°N
+STEP = 0.0001
+
+
+def test_simplify_drops_collinear_and_idle_points():
+    line = [[-52.7 + i * STEP, 47.5] for i in range(10)]
+    # A truck idling at the end, jittering by well under a metre
+    idle = [[-52.7 + 9 * STEP + (i % 2) * 1e-6, 47.5] for i in range(20)]
+    assert simplify_indices(line + idle, 1.0) == [0, 29]
+
+
+def test_simplify_keeps_corners_and_turnarounds():
+    corner = [[-52.7 + i * STEP, 47.5] for i in range(5)] + [
+        [-52.7 + 4 * STEP, 47.5 + i * STEP] for i in range(1, 5)
+    ]
+    assert simplify_indices(corner, 1.0) == [0, 4, 8]
+    # Out and back along the same street: the far end is off the segment
+    # between the ends, not off the line through them.
+    back = [[-52.7 + i * STEP, 47.5] for i in (0, 1, 2, 3, 2, 1)]
+    assert simplify_indices(back, 1.0) == [0, 3, 5]
+
+
+def test_simplify_tolerance():
+    wiggle = [[-52.7 + i * STEP, 47.5 + (i % 2) * 0.00003] for i in range(6)]
+    # The wiggle is ~3.3 m off the straight line
+    assert simplify_indices(wiggle, 2.0) == list(range(6))
+    assert simplify_indices(wiggle, 5.0) == [0, 5]
+    assert simplify_indices(wiggle, 0) == list(range(6))
+    assert simplify_indices(wiggle[:2], 100.0) == [0, 1]
+
+
+def test_simplify_trails_keeps_timestamps_aligned():
+    corner = [[-52.7 + i * STEP, 47.5] for i in range(3)] + [
+        [-52.7 + 2 * STEP, 47.5 + STEP]
+    ]
+    trail = {
+        "vehicle_id": "v1",
+        "description": "2222 SA PLOW TRUCK",
+        "vehicle_type": "SA PLOW TRUCK",
+        "coordinates": corner,
+        "timestamps": ["t0", "t1", "t2", "t3"],
+        "times_us": [0, 1, 2, 3],
+        "city": "st_johns",
+    }
+    [out] = simplify_trails([trail], 1.0)
+    assert out["coordinates"] == [corner[0], corner[2], corner[3]]
+    assert out["timestamps"] == ["t0", "t2", "t3"]
+    assert out["times_us"] == [0, 2, 3]
+    assert out["vehicle_id"] == "v1"
+    assert len(trail["coordinates"]) == 4
+    assert simplify_trails([trail], 0) == [trail]
+
+
+def test_zoom_tolerance():
+    # One 256 px pixel at zoom 0 is ~105.6 km at 47.5°N; it halves per zoom.
+    assert round(zoom_tolerance_m(0) / 1000, 1) == 105.6
+    assert zoom_tolerance_m(12) == zoom_tolerance_m(0) / 4096
@@ -1,10 +1,17 @@
 # tests/test_snapshot.py
+import gzip
+import json
 import os
 import tempfile
 from datetime import datetime, timezone
 
+from where_the_plow.collector import process_poll_st_johns
 from where_the_plow.db import Database
-from where_the_plow.snapshot import build_realtime_snapshot
+from where_the_plow.snapshot import (
+    RealtimeSnapshots,
+    TrailBuffer,
+    build_realtime_snapshot,
+)
 
 
 def make_db():
@@ -23,7 +30,9 @@ def test_snapshot_returns_feature_collection():
     ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
 
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -38,6 +47,7 @@ def test_snapshot_returns_feature_collection():
             },
         ],
         now,
+        "st_johns",
     )
 
     result = build_realtime_snapshot(db)
@@ -71,7 +81,9 @@ def test_snapshot_includes_trail():
     ts3 = datetime(2026, 2, 19, 12, 0, 12, tzinfo=timezone.utc)
 
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -104,6 +116,7 @@ def test_snapshot_includes_trail():
             },
         ],
         now,
+        "st_johns",
     )
 
     result = build_realtime_snapshot(db)
@@ -140,7 +153,9 @@ def test_snapshot_timestamp_serialized():
     ts = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
 
     db.upsert_vehicles(
-        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}], now
+        [{"vehicle_id": "v1", "description": "Plow 1", "vehicle_type": "LOADER"}],
+        now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -155,6 +170,7 @@ def test_snapshot_timestamp_serialized():
             },
         ],
         now,
+        "st_johns",
     )
 
     result = build_realtime_snapshot(db)
@@ -191,6 +207,7 @@ def test_snapshot_multiple_vehicles():
             },
         ],
         now,
+        "st_johns",
     )
     db.insert_positions(
         [
@@ -223,6 +240,7 @@ def test_snapshot_multiple_vehicles():
             },
         ],
         now,
+        "st_johns",
     )
 
     result = build_realtime_snapshot(db)
@@ -239,3 +257,179 @@ def test_snapshot_multiple_vehicles():
 
     db.close()
     os.unlink(path)
+
+
+def test_trail_buffer_matches_db_snapshot(avl_response):
+    """A buffer fed on ingest gives the same snapshot as one seeded from the DB."""
+    db, path = make_db()
+    trails = TrailBuffer()
+
+    process_poll_st_johns(db, avl_response, trails=trails)
+
+    assert trails.snapshot() == build_realtime_snapshot(db)
+    assert trails.snapshot("st_johns") == build_realtime_snapshot(db, "st_johns")
+    assert trails.snapshot("mt_pearl")["features"] == []
+
+    db.close()
+    os.unlink(path)
+
+
+def test_trail_buffer_keeps_last_points(make_batch):
+    trails = TrailBuffer(points=3)
+    trails.record_batch(make_batch("v1", [0, 6, 12, 18, 24]), "st_johns")
+
+    props = trails.snapshot()["features"][0]["properties"]
+    assert props["trail"] == [[12.0, 47.5], [18.0, 47.5], [24.0, 47.5]]
+    assert props["speed"] is None
+    assert props["timestamp"] == "2026-02-19T12:00:24+00:00"
+
+
+def test_trail_buffer_truncates_at_gap(make_batch):
+    trails = TrailBuffer(max_gap_s=10)
+    trails.record_batch(make_batch("v1", [0, 30, 36]), "st_johns")
+
+    assert trails.snapshot()["features"][0]["properties"]["trail"] == [
+        [30.0, 47.5],
+        [36.0, 47.5],
+    ]
+
+
+def test_trail_buffer_orders_late_reports(make_batch):
+    trails = TrailBuffer(points=3)
+    trails.record_batch(make_batch("v1", [0, 12, 18]), "st_johns")
+    trails.record_batch(make_batch("v1", [6, 12]), "st_johns")
+
+    feature = trails.snapshot()["features"][0]
+    assert feature["properties"]["trail"] == [
+        [6.0, 47.5],
+        [12.0, 47.5],
+        [18.0, 47.5],
+    ]
+    assert feature["geometry"]["coordinates"] == [18.0, 47.5]
+
+
+def test_realtime_snapshots_publish_artifacts(make_batch):
+    realtime = RealtimeSnapshots()
+    trails = TrailBuffer()
+    trails.record_batch(make_batch("v1", [0]), "st_johns")
+    trails.record_batch(make_batch("v2", [0]), "mt_pearl")
+
+    empty = realtime.get("st_johns")
+    assert json.loads(empty.body) == {"type": "FeatureCollection", "features": []}
+    assert realtime.publish("st_johns", trails.snapshot("st_johns"))
+    assert realtime.publish("mt_pearl", trails.snapshot("mt_pearl"))
+    assert realtime.version == 2
+
+    st_johns = realtime.get("st_johns")
+    assert json.loads(st_johns.body) == trails.snapshot("st_johns")
+    assert gzip.decompress(st_johns.gzip_body) == st_johns.body
+    assert st_johns.etag != st_johns.gzip_etag
+
+    combined = json.loads(realtime.get().body)
+    assert [f["properties"]["vehicle_id"] for f in combined["features"]] == [
+        "v1",
+        "v2",
+    ]
+    assert realtime.get().version == 2
+
+
+def test_realtime_snapshots_skip_unchanged(make_batch):
+    realtime = RealtimeSnapshots()
+    trails = TrailBuffer()
+    trails.record_batch(make_batch("v1", [0]), "st_johns")
+
+    realtime.publish("st_johns", trails.snapshot("st_johns"))
+    before = realtime.get("st_johns")
+    assert not realtime.publish("st_johns", trails.snapshot("st_johns"))
+    assert realtime.get("st_johns") is before
+
+    trails.record_batch(make_batch("v1", [6]), "st_johns")
+    assert realtime.publish("st_johns", trails.snapshot("st_johns"))
+    assert realtime.get("st_johns").etag != before.etag
+
+
+def test_realtime_snapshots_changes_since_version(make_batch):
+    realtime = RealtimeSnapshots()
+    trails = TrailBuffer()
+    trails.record_batch(make_batch("v1", [0]), "st_johns")
+    trails.record_batch(make_batch("v2", [0]), "st_johns")
+    realtime.publish("st_johns", trails.snapshot("st_johns"))
+
+    trails.record_batch(make_batch("v2", [6]), "st_johns")
+    realtime.publish("st_johns", trails.snapshot("st_johns"))
+    trails.record_batch(make_batch("v3", [0]), "mt_pearl")
+    realtime.publish("mt_pearl", trails.snapshot("mt_pearl"))
+
+    changes = json.loads(realtime.changes(1).body)
+    assert changes["version"] == realtime.version_id
+    assert not changes["full"]
+    assert [_vid(f) for f in changes["features"]] == ["v2", "v3"]
+    assert changes["features"][0]["properties"]["trail"] == [
+        [0.0, 47.5],
+        [6.0, 47.5],
+    ]
+    assert changes["removed"] == []
+
+    st_johns = json.loads(realtime.changes(1, "st_johns").body)
+    assert [_vid(f) for f in st_johns["features"]] == ["v2"]
+    assert json.loads(realtime.changes(3).body)["features"] == []
+    assert realtime.changes(2) is realtime.changes(2)
+
+    from_start = json.loads(realtime.changes(0).body)
+    assert [_vid(f) for f in from_start["features"]] == ["v1", "v2", "v3"]
+
+
+def test_realtime_snapshots_changes_fall_back_to_full(make_batch):
+    realtime = RealtimeSnapshots(history=2)
+    trails = TrailBuffer()
+    for second in (0, 6, 12):
+        trails.record_batch(make_batch("v1", [second]), "st_johns")
+        realtime.publish("st_johns", trails.snapshot("st_johns"))
+
+    assert not json.loads(realtime.changes(1).body)["full"]
+    for stale in (0, 4):
+        full = json.loads(realtime.changes(stale).body)
+        assert full["full"]
+        assert full["version"] == realtime.version_id
+        assert [_vid(f) for f in full["features"]] == ["v1"]
+    # Every out-of-range version shares one cached full artifact.
+    assert all(realtime.changes(v) is realtime.changes(0) for v in (-7, 4, 10**9))
+
+
+def test_realtime_snapshots_version_ids_do_not_survive_restart(make_batch):
+    trails = TrailBuffer()
+    trails.record_batch(make_batch("v1", [0]), "st_johns")
+    before = RealtimeSnapshots()
+    before.publish("st_johns", trails.snapshot("st_johns"))
+    held = before.version_id
+
+    # After a restart the same version numbers come round again.
+    after = RealtimeSnapshots()
+    after.publish("st_johns", trails.snapshot("st_johns"))
+    trails.record_batch(make_batch("v2", [0]), "st_johns")
+    after.publish("st_johns", trails.snapshot("st_johns"))
+    assert after.epoch != before.epoch
+    assert after.parse_version(held) == -1
+    assert after.parse_version(after.version_id) == 2
+    for stale in (held, "1", "", None, f"{after.epoch}.x"):
+        assert after.parse_version(stale) == -1
+    full = json.loads(after.changes(after.parse_version(held)).body)
+    assert full["full"]
+    assert [_vid(f) for f in full["features"]] == ["v1", "v2"]
+
+
+def test_realtime_snapshots_changes_report_removed(make_batch):
+    realtime = RealtimeSnapshots()
+    trails = TrailBuffer()
+    trails.record_batch(make_batch("v1", [0]), "st_johns")
+    realtime.publish("st_johns", trails.snapshot("st_johns"))
+    realtime.publish("st_johns", {"type": "FeatureCollection", "features": []})
+
+    changes = json.loads(realtime.changes(1).body)
+    assert changes["features"] == []
+    assert changes["removed"] == ["v1"]
+    assert json.loads(realtime.changes(0).body)["removed"] == ["v1"]
+
+
+def _vid(feature: dict) -> str:
+    return feature["properties"]["vehicle_id"]
@@ -0,0 +1,94 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from where_the_plow.spatial import VehicleIndex, haversine_m
+
+TS = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def make_rows(n: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "vehicle_id": f"v{i}",
+            "timestamp": TS + timedelta(seconds=i),
+            "longitude": -52.8 + rng.random() * 0.2,
+            "latitude": 47.45 + rng.random() * 0.15,
+            "bearing": 0,
+            "speed": 0.0,
+            "is_driving": "maybe",
+            "description": f"Plow {i}",
+            "vehicle_type": "LOADER",
+            "city": "st_johns" if i % 3 else "mt_pearl",
+        }
+        for i in range(n)
+    ]
+
+
+def brute_force(rows, lat, lng, city=None):
+    return sorted(
+        (haversine_m(lat, lng, r["latitude"], r["longitude"]), r["vehicle_id"])
+        for r in rows
+        if not city or r["city"] == city
+    )
+
+
+def test_haversine_m():
+    # One degree of longitude at 47.5°N is about 75 km, not 111 km
+    assert math.isclose(haversine_m(47.5, -52.0, 47.5, -53.0), 75_130, rel_tol=1e-3)
+    assert math.isclose(haversine_m(47.0, -52.7, 48.0, -52.7), 111_195, rel_tol=1e-3)
+
+
+def test_within_matches_brute_force():
+    rows = make_rows(300)
+    index = VehicleIndex(rows)
+    queries = [(47.52, -52.7, 1500), (47.5, -52.75, 300), (47.6, -52.6, 5000)]
+    for lat, lng, radius in queries:
+        for city in (None, "mt_pearl"):
+            expected = [
+                (d, vid) for d, vid in brute_force(rows, lat, lng, city) if d <= radius
+            ]
+            found = index.within(lat, lng, radius, city)
+            assert [(d, r["vehicle_id"]) for d, r in found] == expected
+
+
+def test_within_is_metric_east_west():
+    rows = make_rows(1)
+    rows[0].update(latitude=47.56, longitude=-52.7)
+    index = VehicleIndex(rows)
+    # ~1000 m due east of the vehicle
+    lng = -52.7 + 1000 / haversine_m(47.56, -52.7, 47.56, -51.7)
+    assert len(index.within(47.56, lng, 1010)) == 1
+    assert index.within(47.56, lng, 990) == []
+
+
+def test_nearest_matches_brute_force():
+    rows = make_rows(300)
+    index = VehicleIndex(rows)
+    rng = random.Random(7)
+    for _ in range(50):
+        lat = 47.4 + rng.random() * 0.25
+        lng = -52.85 + rng.random() * 0.3
+        k = rng.randint(1, 20)
+        got = [(d, r["vehicle_id"]) for d, r in index.nearest(lat, lng, k)]
+        assert got == brute_force(rows, lat, lng)[:k]
+
+
+def test_nearest_far_away_and_filtered():
+    rows = make_rows(50)
+    index = VehicleIndex(rows)
+    got = [r["vehicle_id"] for _, r in index.nearest(0.0, 0.0, 3, city="mt_pearl")]
+    assert got == [vid for _, vid in brute_force(rows, 0.0, 0.0, "mt_pearl")[:3]]
+    assert VehicleIndex([]).nearest(47.5, -52.7, 3) == []
+    assert len(index.nearest(47.5, -52.7, 500)) == 50
+
+
+def test_nearby_pages_oldest_first():
+    rows = make_rows(100)
+    index = VehicleIndex(rows)
+    first = index.nearby(47.52, -52.7, 5000, limit=5)
+    assert [r["timestamp"] for r in first] == sorted(r["timestamp"] for r in first)
+    after = first[-1]["timestamp"].replace(tzinfo=None)
+    second = index.nearby(47.52, -52.7, 5000, limit=5, after=after)
+    assert second[0]["timestamp"] > first[-1]["timestamp"]
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import pytest
+
+from where_the_plow.writer import IngestWriter
+
+
+async def test_submit_runs_on_writer_thread():
+    writer = IngestWriter()
+    writer.start()
+
+    name = await writer.submit(lambda: threading.current_thread().name)
+    assert name == "ingest-writer"
+    assert await writer.submit(lambda a, b: a + b, 2, 3) == 5
+
+    await writer.drain()
+    assert writer.completed == 2
+
+
+async def test_submit_propagates_errors():
+    writer = IngestWriter()
+    writer.start()
+
+    def boom():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        await writer.submit(boom)
+    assert writer.failed == 1
+
+    await writer.drain()
+
+
+async def test_unexpected_errors_are_logged_and_propagated(caplog):
+    writer = IngestWriter()
+    writer.start()
+
+    def bug():
+        return None + 1
+
+    with pytest.raises(TypeError):
+        await writer.submit(bug)
+    assert writer.failed == 1
+    [record] = caplog.records
+    assert record.levelname == "ERROR"
+    assert record.exc_info[0] is TypeError
+    assert await writer.submit(lambda: "still running") == "still running"
+
+    await writer.drain()
+
+
+async def test_full_writer_applies_backpressure():
+    writer = IngestWriter(maxsize=1)
+    writer.start()
+    release = threading.Event()
+
+    first = asyncio.create_task(writer.submit(release.wait, 5))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(writer.submit(lambda: "second"))
+    await asyncio.sleep(0.05)
+
+    assert writer.full_waits == 1
+    assert writer.pending == 1
+    assert not second.done()
+
+    release.set()
+    assert await first is True
+    assert await second == "second"
+
+    await writer.drain()
+
+
+async def test_drain_finishes_queued_jobs():
+    writer = IngestWriter()
+    writer.start()
+    done = []
+
+    def job(i):
+        threading.Event().wait(0.01)
+        done.append(i)
+
+    tasks = [asyncio.create_task(writer.submit(job, i)) for i in range(5)]
+    await asyncio.sleep(0)
+    for t in tasks:
+        t.cancel()
+
+    await writer.drain()
+    assert done == [0, 1, 2, 3, 4]